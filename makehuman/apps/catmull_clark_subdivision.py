@@ -42,7 +42,7 @@ __docformat__ = 'restructuredtext'
 
 import numpy as np
 
-from module3d import Object3D
+from module3d import Object3D, invertIndexMap, fillPaddedMap
 from progress import Progress
 import log
 
@@ -495,16 +495,8 @@ class SubdivisionObject(Object3D):
 def _reverse_n_to_m_map(input, output, offset=0):
     # Using same algorithm as module3d._update_faces to construct inverse 
     # mapping with variable number of valid columns
-    map_ = np.argsort(input.flat)
-    vi = input.flat[map_]
-    fi = np.mgrid[:input.shape[0],:input.shape[1]][0].flat[map_].astype(np.uint32)
-    del map_
-    ix, first = np.unique(vi, return_index=True)
-    n = first[1:] - first[:-1]
-    n_last = len(vi) - first[-1]
-    n = np.hstack((n, np.array([n_last])))
-    for i in range(len(ix)):
-        output[ix[i], :n[i]] = offset + fi[first[i]:][:n[i]]
+    offsets, rows = invertIndexMap(input, len(output))
+    fillPaddedMap(offsets, rows, output, offset)
 
 
 def createSubdivisionObject(object, staticFaceMask=None):
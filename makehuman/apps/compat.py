@@ -41,6 +41,7 @@ import progress
 import csv
 import getpath
 import io
+import re
 
 def _parse_version(version_str):
     version_str = version_str.lower().strip()
@@ -311,18 +312,43 @@ class MHM10Loader(object):
     def getAcceptedVersion(self):
         return (1, 0)
 
+def getMHMVersion(lines):
+    """
+    The version string of an MHM file, from its lines, or None if it
+    specifies no version.
+    """
+    try:
+        for line in lines:
+            lineData = line.split()
+            if lineData and lineData[0] == 'version':
+                return lineData[1]
+    except:
+        return None
+    return None
+
+def isCurrentVersion(mhm_version):
+    """
+    Returns True if the major and minor version of an MHM file match those of
+    this MakeHuman release (the patch number is ignored), in which case it
+    can be loaded without backward compatibility loader.
+    """
+    from makehuman import getShortVersion
+    match1 = re.match(r"v(\d)\.(\d)", mhm_version)
+    match2 = re.match(r"v(\d)\.(\d)", getShortVersion(noSub=True))
+    return match1.groups() == match2.groups()
+
 def getMHMLoader(version):
     for loader in mhm_loaders:
         if all([(i < len(version) and v == version[i]) for i, v in enumerate(loader.getAcceptedVersion())]):
             return loader
     raise RuntimeError("No suitable MHM backward compatibility loader found for version %s" % (version, ))
 
-def loadMHM(version, lines, default_load_callback, strict=False):
+def loadMHM(version, lines, default_load_callback, strict=False, progressCallback=True):
     version_ = _parse_version(version)
     if version_ is None:
         raise RuntimeError("Failed to parse version %s" % version)
 
-    fprog = progress.Progress(len(lines))
+    fprog = progress.Progress(len(lines), progressCallback)
     loader = getMHMLoader(version_)
     for lineData in lines:
         lineData = lineData.strip().split()
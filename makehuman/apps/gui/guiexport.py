@@ -110,6 +110,8 @@ class ExportTaskView(gui3d.TaskView):
                     os.path.exists(os.path.join(dir, name + '.' + exporter.fileExtension)):
                     if not gui3d.app.prompt("File exists", "The file already exists. Overwrite?", "Yes", "No"):
                         break;
+                # Exporters need exact targets, not the low-rank approximation
+                gui3d.app.selectedHuman.applyExactTargets()
                 exporter.export(gui3d.app.selectedHuman, filename)
                 gui3d.app.status(['The mesh has been exported to',' %s.'], dir)
                 self.showOverwriteWarning = False
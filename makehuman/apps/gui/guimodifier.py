@@ -43,6 +43,7 @@ import gui3d
 import humanmodifier
 import modifierslider
 import getpath
+import targetprefetch
 from core import G
 import log
 from collections import OrderedDict
@@ -115,6 +116,11 @@ class ModifierTaskView(gui3d.TaskView):
 
         self.syncSliders()
 
+        # Load the targets of the sliders in this view in the background,
+        # before they are dragged
+        groups = sorted(set(m.groupName for m in self.modifiers.values()))
+        targetprefetch.getPrefetcher().prefetchGroups(G.app.selectedHuman.meshData, groups)
+
     def syncSliders(self):
         for slider in self.sliders:
             slider.update()
@@ -53,6 +53,10 @@ from makehuman import getBasemeshVersion, getShortVersion, getVersionStr, getVer
 
 class Human(guicommon.Object, animation.AnimatedMesh):
 
+    # Number of incremental applyAllTargets calls after which a full rebuild is
+    # forced, to avoid accumulating floating point errors in the mesh
+    MAX_INCREMENTAL_UPDATES = 50
+
     def __init__(self, mesh):
         guicommon.Object.__init__(self, mesh)
 
@@ -75,6 +79,14 @@ class Human(guicommon.Object, animation.AnimatedMesh):
         self.targetsDetailStack = {}  # All details targets applied, with their values
         self.symmetryModeEnabled = False
 
+        self._targetBasis = None      # Sparse target matrix used by applyAllTargets, if enabled
+        self._lowRankBases = []       # Low-rank target bases used by applyAllTargets for approximate blending
+        self._approximated = False    # Whether the last applyAllTargets used a low-rank basis
+
+        self._appliedDetailStack = None  # Weight and target object of all targets applied by the last applyAllTargets
+        self._appliedCoords = None       # Rest coordinates resulting from the last applyAllTargets
+        self._incrementalUpdates = 0     # Number of incremental updates since the last full rebuild
+
         self.setDefaultValues()
 
         self.bodyZones = ['l-eye','r-eye', 'jaw', 'nose', 'mouth', 'head', 'neck', 'torso', 'hip', 'pelvis', 'r-upperarm', 'l-upperarm', 'r-lowerarm', 'l-lowerarm', 'l-hand',
@@ -91,6 +103,8 @@ class Human(guicommon.Object, animation.AnimatedMesh):
         self._modifier_dependencyMapping = dict()       # Maps a macro variable to all the modifiers that depend on it
         self._modifier_groups = dict()
         self._modifier_type_cache = dict()
+        self._modifier_dependencyOrder = None          # Compiled topological order of modifier groups (see getModifierDependencyOrder())
+        self._dirtyModifierGroups = set()               # Modifier groups whose targets are outdated after a change to a macro variable they depend on
 
         self.blockEthnicUpdates = False                 # When set to True, changes to race are not normalized automatically
 
@@ -289,8 +303,9 @@ class Human(guicommon.Object, animation.AnimatedMesh):
                 stars = " "
             if all or path[0:4] != "data":
                 log.debug("  %s%s:%s %d" % (stars, path, target, vertsToList))
+                data = target.getData()
                 for n,vn in enumerate(target.verts[0:vertsToList]):
-                    log.debug("   %d : %s %s" % (vn, target.data[n], self.mesh.coord[vn]))
+                    log.debug("   %d : %s %s" % (vn, data[n], self.mesh.coord[vn]))
 
     # Proxy and object getters.
     # Returns only existing proxies
@@ -866,10 +881,16 @@ class Human(guicommon.Object, animation.AnimatedMesh):
 
     def updateMacroModifiers(self):
         """Update the targetsDetailStack for this human
-        determined by the macromodifier target combinations."""
+        determined by the macromodifier target combinations.
+        Every modifier group that depends on the macro variables is updated
+        once afterwards."""
+        updated = set()
         for modifier in self.modifiers:
             if modifier.isMacro():
-                modifier.setValue(modifier.getValue())
+                modifier.setValue(modifier.getValue(), skipDependencies=True)
+                updated.add(modifier.groupName)
+                self.markModifierVariableDirty(modifier.macroVariable)
+        self.updateDirtyModifiers(exclude = updated)
 
     @property
     def modifiers(self):
@@ -940,6 +961,7 @@ class Human(guicommon.Object, animation.AnimatedMesh):
             raise RuntimeError("Modifier with name %s is already attached to human." % modifier.fullName)
 
         self._modifier_type_cache = dict()
+        self._modifier_dependencyOrder = None
 
         self._modifiers[modifier.fullName] = modifier
 
@@ -979,8 +1001,8 @@ class Human(guicommon.Object, animation.AnimatedMesh):
             if modifier.groupName not in self._modifier_dependencyMapping[dep]:
                 self._modifier_dependencyMapping[dep].append(modifier.groupName)
 
-            if modifier.isMacro():
-                self.updateMacroModifiers()
+        if modifier.isMacro() and modifier.macroDependencies:
+            self.updateMacroModifiers()
 
     def getModifierDependencies(self, modifier, filter = None):
         """
@@ -1018,6 +1040,88 @@ class Human(guicommon.Object, animation.AnimatedMesh):
         else:
             return [e for e in result if e in filter]
 
+    def getModifierDependencyOrder(self):
+        """
+        All modifier groups, topologically sorted on the dependency mapping:
+        a group comes after the groups that control the macro variables it
+        depends on. The order is compiled on first use, and again on the first
+        use after modifiers were added or removed.
+        """
+        if self._modifier_dependencyOrder is not None:
+            return self._modifier_dependencyOrder
+
+        # Edges from the group controlling a variable to the groups depending on it
+        dependents = dict((group, set()) for group in self._modifier_groups)
+        inDegree = dict((group, 0) for group in self._modifier_groups)
+        for var, affectedGroups in self._modifier_dependencyMapping.items():
+            source = self._modifier_varMapping.get(var)
+            if source not in dependents:
+                continue
+            for group in affectedGroups:
+                if group in inDegree and group != source and group not in dependents[source]:
+                    dependents[source].add(group)
+                    inDegree[group] += 1
+
+        order = []
+        ready = sorted(group for group, degree in inDegree.items() if degree == 0)
+        while ready:
+            group = ready.pop(0)
+            order.append(group)
+            for dependent in sorted(dependents[group]):
+                inDegree[dependent] -= 1
+                if inDegree[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) < len(inDegree):
+            remaining = sorted(set(inDegree.keys()).difference(order))
+            log.error("Modifier dependency cycle between groups %s", remaining)
+            order.extend(remaining)
+
+        self._modifier_dependencyOrder = order
+        return order
+
+    def markModifierVariableDirty(self, variable):
+        """
+        Mark all modifier groups that depend on the specified macro variable
+        as outdated, they are recomputed by the next updateDirtyModifiers().
+        Recomputing a group does not change any macro variable, so groups
+        that depend on an outdated group do not need to be marked.
+        """
+        if not variable:
+            return
+        self._dirtyModifierGroups.update(self._modifier_dependencyMapping.get(variable, []))
+
+    def updateDirtyModifiers(self, realtime = False, filter = None, exclude = None):
+        """
+        Recompute the targets of every outdated modifier group exactly once,
+        in dependency order, after which no group is marked as outdated.
+        Only the groups in filter are updated if filter is specified, others
+        are left as they are. Groups in exclude are considered up to date.
+        With realtime, groups are updated with updateValue, so that the
+        changes are directly applied to the mesh (used while dragging a
+        slider).
+        """
+        if exclude:
+            self._dirtyModifierGroups.difference_update(exclude)
+        if not self._dirtyModifierGroups:
+            return
+
+        for group in self.getModifierDependencyOrder():
+            if group not in self._dirtyModifierGroups:
+                continue
+            if filter is not None and group not in filter:
+                continue
+
+            # Only updating one modifier in a group should suffice to update the
+            # targets affected by the entire group.
+            m = self.getModifiersByGroup(group)[0]
+            if realtime:
+                m.updateValue(m.getValue(), skipUpdate = True)
+            else:
+                m.setValue(m.getValue(), skipDependencies = True)
+
+        self._dirtyModifierGroups.clear()
+
     def removeModifier(self, modifier):
         try:
             del self._modifiers[modifier.fullName]
@@ -1049,6 +1153,7 @@ class Human(guicommon.Object, animation.AnimatedMesh):
                     self.setDetail(t[0], None)
 
             self._modifier_type_cache = dict()
+            self._modifier_dependencyOrder = None
         except:
             log.debug('Failed to remove modifier %s from human.', modifier.fullName, exc_info=True)
             pass
@@ -1084,25 +1189,73 @@ class Human(guicommon.Object, animation.AnimatedMesh):
         """
         return [ fg_name for fg_name in self.meshData.getFaceGroups() if fg_name.startswith('joint-') ]
 
-    def applyAllTargets(self, update=True):
+    def applyAllTargets(self, update=True, incremental=False, exact=False):
         """
         This method applies all targets, in function of age and sex
 
-        **Parameters:** None.
+        Parameters
+        ----------
+
+        update:
+            *bool*. Whether to update the mesh buffers after applying targets.
+
+        incremental:
+            *bool*. If True, only the weight differences with the targets
+            applied by the previous call are applied on top of the rest
+            coordinates resulting from that call, instead of resetting the
+            mesh and applying every target again. A full rebuild is still
+            done every MAX_INCREMENTAL_UPDATES calls to limit drift.
+
+        exact:
+            *bool*. Apply all targets exactly, even if low-rank morphing is
+            enabled (see setLowRankMorphing()), for example before exporting.
         """
         progress = Progress()
 
         progress(0.0, 0.5)
 
+        lowRankBases = [] if exact else self._lowRankBases
+
         # First call progress callback (which often processes events) before resetting mesh
         # so that mesh is not drawn in its reset state
-        algos3d.resetObj(self.meshData)  # Reset mesh is in rest pose
-
-        # Apply targets to seedmesh coordinates
-        itprog = Progress(len(self.targetsDetailStack))
-        for (targetPath, morphFactor) in self.targetsDetailStack.items():
-            algos3d.loadTranslationTarget(self.meshData, targetPath, morphFactor, None, 0, 0)
-            itprog.step()
+        if incremental and self._canApplyIncremental() and not (exact and self._approximated):
+            appliedTargets = self._applyTargetsIncremental(lowRankBases)
+            self._incrementalUpdates += 1
+        else:
+            algos3d.resetObj(self.meshData)  # Reset mesh is in rest pose
+
+            # Approximate the targets contained in a low-rank basis
+            appliedTargets = {}
+            detailStack = self.targetsDetailStack
+            for basis in lowRankBases:
+                remaining = basis.apply(self.meshData, detailStack)
+                for path in detailStack:
+                    if path not in remaining:
+                        appliedTargets[path] = basis
+                detailStack = remaining
+
+            # Apply targets to seedmesh coordinates
+            if self._targetBasis is not None:
+                basis = self._targetBasis
+                basis.apply(self.meshData, detailStack)
+                appliedTargets.update((path, basis.targets[basis.columns[path]])
+                                      for path in detailStack)
+            else:
+                itprog = Progress(len(detailStack))
+                for (targetPath, morphFactor) in detailStack.items():
+                    appliedTargets[targetPath] = algos3d.loadTranslationTarget(self.meshData, targetPath, morphFactor, None, 0, 0)
+                    itprog.step()
+            self._incrementalUpdates = 0
+
+        self._approximated = any(isinstance(target, algos3d.LowRankTargetBasis)
+                                 for target in appliedTargets.values())
+
+        # Remember applied state for subsequent incremental updates. The
+        # applied target objects are kept, as the target buffer may have
+        # evicted or reloaded them in the meantime.
+        self._appliedDetailStack = dict((path, (morphFactor, appliedTargets.get(path)))
+                                        for (path, morphFactor) in self.targetsDetailStack.items())
+        self._appliedCoords = self.meshData.coord.copy()
 
         # Make sure self.getRestposeCoordinates is up-to-date directly (required for proxy fitting)
         self._updateOriginalMeshCoords(self.meshData.name, self.meshData.coord)
@@ -1148,6 +1301,142 @@ class Human(guicommon.Object, animation.AnimatedMesh):
 
         progress(1.0)
 
+    def _canApplyIncremental(self):
+        return self._appliedCoords is not None and \
+               len(self._appliedCoords) == self.meshData.getVertexCount() and \
+               self._incrementalUpdates < self.MAX_INCREMENTAL_UPDATES
+
+    def _applyTargetsIncremental(self, lowRankBases=()):
+        """
+        Restore the rest coordinates of the last applyAllTargets call, and
+        apply only the difference between the targets applied then and the
+        current targets detail stack.
+        A target that was reloaded since (eg. a recompiled warp target or a
+        refreshed custom target) is removed with its old data and applied
+        again with the new data.
+        Targets contained in one of the specified low-rank bases are applied
+        through that basis, in one product per basis.
+        Returns a dict with the target object (or low-rank basis) applied for
+        each path.
+        """
+        mesh = self.meshData
+        mesh.changeCoords(self._appliedCoords)
+
+        # Weight differences to apply per low-rank basis
+        lowRankUpdates = dict((basis, {}) for basis in lowRankBases)
+
+        def getLowRankBasis(targetPath):
+            for basis in lowRankBases:
+                if targetPath in basis:
+                    return basis
+            return None
+
+        appliedTargets = {}
+        for (targetPath, (oldFactor, oldTarget)) in self._appliedDetailStack.items():
+            morphFactor = self.targetsDetailStack.get(targetPath, 0.0)
+            if isinstance(oldTarget, algos3d.LowRankTargetBasis):
+                if oldTarget in lowRankBases:
+                    if morphFactor != oldFactor:
+                        lowRankUpdates[oldTarget][targetPath] = morphFactor - oldFactor
+                    appliedTargets[targetPath] = oldTarget
+                    continue
+                # Low-rank basis no longer used, remove its approximation
+                lowRankUpdates.setdefault(oldTarget, {})[targetPath] = -oldFactor
+                oldTarget, oldFactor = None, 0.0
+            elif oldTarget is None or getLowRankBasis(targetPath) is not None:
+                # Not applied exactly yet
+                basis = getLowRankBasis(targetPath)
+                if basis is not None:
+                    if oldTarget is not None:
+                        oldTarget.apply(mesh, -oldFactor, update=False, calcNormals=False)
+                    if morphFactor:
+                        lowRankUpdates[basis][targetPath] = morphFactor
+                    appliedTargets[targetPath] = basis
+                    continue
+            if oldTarget is not None and morphFactor == oldFactor and \
+               algos3d._targetBuffer.get(targetPath) in (oldTarget, None):
+                # Unchanged (or only evicted from the target buffer since)
+                appliedTargets[targetPath] = oldTarget
+                continue
+            target = algos3d.getTarget(mesh, targetPath)
+            if target is not oldTarget:
+                if oldTarget is not None:
+                    oldTarget.apply(mesh, -oldFactor, update=False, calcNormals=False)
+                oldFactor = 0.0
+            if morphFactor != oldFactor:
+                target.apply(mesh, morphFactor - oldFactor, update=False, calcNormals=False)
+            # Record the total weight, not the applied difference
+            target.morphFactor = morphFactor
+            appliedTargets[targetPath] = target
+
+        for (targetPath, morphFactor) in self.targetsDetailStack.items():
+            if targetPath not in self._appliedDetailStack:
+                basis = getLowRankBasis(targetPath)
+                if basis is not None:
+                    lowRankUpdates[basis][targetPath] = morphFactor
+                    appliedTargets[targetPath] = basis
+                else:
+                    appliedTargets[targetPath] = algos3d.loadTranslationTarget(mesh, targetPath, morphFactor, None, 0, 0)
+
+        for (basis, weights) in lowRankUpdates.items():
+            if weights:
+                basis.apply(mesh, weights)
+
+        return appliedTargets
+
+    def setSparseMorphing(self, enabled):
+        """
+        Enable or disable the sparse matrix morph engine. When enabled,
+        applyAllTargets packs all targets on the detail stack into one sparse
+        basis matrix (see algos3d.TargetBasis) and applies them with a single
+        matrix-vector product, instead of applying the targets one by one.
+        This pays off when many targets are applied and the mesh is rebuilt
+        often, such as in batch runs.
+        """
+        if enabled:
+            if self._targetBasis is None:
+                self._targetBasis = algos3d.TargetBasis(self.meshData)
+        else:
+            self._targetBasis = None
+
+    def isSparseMorphing(self):
+        return self._targetBasis is not None
+
+    def setLowRankMorphing(self, bases):
+        """
+        Approximate the targets contained in the specified low-rank target
+        bases (see algos3d.LowRankTargetBasis, compiled by compile_lowrank.py)
+        when applying targets, which blends a group of many targets with a
+        few dense components. Pass None or an empty list to disable.
+        The mesh is only approximated: call applyExactTargets() before using
+        the mesh for export.
+        """
+        if bases is None:
+            bases = []
+        elif isinstance(bases, algos3d.LowRankTargetBasis):
+            bases = [bases]
+        for basis in bases:
+            if basis.nverts != self.meshData.getVertexCount():
+                raise RuntimeError('Low-rank target basis %s does not match the mesh of the human' % basis)
+        self._lowRankBases = list(bases)
+
+    def isLowRankMorphing(self):
+        return len(self._lowRankBases) > 0
+
+    def isApproximated(self):
+        """
+        Whether the current mesh was built with approximated (low-rank)
+        targets.
+        """
+        return self._approximated
+
+    def applyExactTargets(self, update=True):
+        """
+        Rebuild the mesh with exact targets if it was approximated.
+        """
+        if self._approximated:
+            self.applyAllTargets(update, exact=True)
+
     def getPartNameForGroupName(self, groupName):
         # TODO is this still used anywhere?
         for k in self.bodyZones:
@@ -1395,25 +1684,6 @@ class Human(guicommon.Object, animation.AnimatedMesh):
     def load(self, filename, update=True, strict=False):
         import io
 
-        def _compare_versions(mhmVersion,pgmVersion):
-            """ Return true if major+minor matches, false if they do not. Ignore patch number. """
-            import re
-            match1 = re.match("v(\d)\.(\d)",mhmVersion)
-            match2 = re.match("v(\d)\.(\d)",pgmVersion)
-            return match1.groups(1) == match2.groups(1) and match1.groups(2) == match2.groups(2)
-
-        def _get_version(lineData):
-            try:
-                for l in lineData:
-                    if not l:
-                        continue
-                    l = l.split()
-                    if l[0] == 'version':
-                        return l[1]
-            except:
-                return None
-            return None
-
         log.message("Loading human from MHM file %s.", filename)
         progress = Progress()(0.0, 0.8)
         event = events3d.HumanEvent(self, 'load')
@@ -1478,10 +1748,10 @@ class Human(guicommon.Object, animation.AnimatedMesh):
                     else:
                         log.warning('Unknown property in MHM file: %s', lineData)
 
-        version = _get_version(lines)
-        if not _compare_versions(version, getShortVersion(noSub=True)):
+        import compat
+        version = compat.getMHMVersion(lines)
+        if not compat.isCurrentVersion(version):
             log.message("MHM file is of version %s, attempting to load with backward compatibility")
-            import compat
             compat.loadMHM(version, lines, _load_property, strict)
         else:
             fprog = Progress(len(lines))
@@ -1509,7 +1779,7 @@ class Human(guicommon.Object, animation.AnimatedMesh):
 
         if update:
             progress(0.8, 0.9)
-            self.applyAllTargets()
+            self.applyAllTargets(incremental=True)
 
         progress(0.9, 0.99)
         if hasattr(self, '_mhm_do_subdivide'):
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Headless batch generation of humans
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           MakeHuman Team
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Generate the (rest pose) mesh coordinates of many humans at once from a
+matrix of modifier values, for example to build datasets. This does not
+require the GUI: no G.app, Qt or OpenGL is used.
+
+Per sample, only the modifier values are evaluated to target weights, using
+the regular modifiers (so macro dependencies and ethnic normalization behave
+as when loading an MHM file). Human.applyAllTargets, events, proxies and
+progress callbacks are skipped, and the detail stack is built directly on
+target paths that are canonicalized once, instead of through
+Human.setDetail(). The targets of a batch of samples are then blended
+together with dense matrix products.
+
+Example::
+
+    generator = BatchGenerator(['macrodetails/Gender', 'macrodetails/Age'])
+    coords = generator.generate([[0.0, 0.5], [1.0, 0.5], [1.0, 0.9]])
+    # coords.shape == (3, nverts, 3)
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+import algos3d
+import files3d
+import human
+import humanmodifier
+from getpath import getSysDataPath, canonicalPath
+
+BASE_MESH = '3dobjs/base.obj'
+MODIFIER_FILES = ['modifiers/modeling_modifiers.json',
+                  'modifiers/measurement_modifiers.json']
+
+
+def createHeadlessHuman(modifierFiles=None):
+    """
+    Create a human with the base mesh and the modifiers defined in the
+    specified modifier definition files (paths relative to the system data
+    folder), without registering it with the application.
+    """
+    if modifierFiles is None:
+        modifierFiles = MODIFIER_FILES
+    mesh = files3d.loadMesh(getSysDataPath(BASE_MESH), maxFaces = 5)
+    result = human.Human(mesh)
+    for filename in modifierFiles:
+        humanmodifier.loadModifiers(getSysDataPath(filename), result)
+    return result
+
+
+def parseMHMModifiers(text):
+    """
+    Extract the modifier values from the text of an MHM file, as an ordered
+    dict of modifier name and value. All other properties are ignored.
+    Like Human.load(), files saved by older MakeHuman versions are passed
+    through the backward compatibility loader, which maps their modifier
+    names and values to the current modifiers.
+    """
+    import compat
+
+    result = OrderedDict()
+    def _loadProperty(lineData):
+        if len(lineData) >= 3 and lineData[0] == 'modifier':
+            result[lineData[1]] = float(lineData[2])
+
+    lines = text.splitlines()
+    version = compat.getMHMVersion(lines)
+    if version is None or compat.isCurrentVersion(version):
+        for line in lines:
+            _loadProperty(line.strip().split())
+    else:
+        compat.loadMHM(version, lines, _loadProperty, progressCallback=None)
+    return result
+
+
+class BatchGenerator(object):
+    """
+    Generates mesh coordinates for rows of modifier values.
+    The human that is used to evaluate modifiers has its macro variables
+    overwritten, so it should not be a human that is shown in the GUI. By
+    default a separate headless human is created.
+    """
+
+    # Number of targets blended in one dense block (limits memory use)
+    TARGET_BLOCK_SIZE = 64
+
+    def __init__(self, modifierNames, human=None, modifierFiles=None, batchSize=64):
+        """
+        modifierNames lists the modifiers (as 'group/name') that correspond
+        to the columns of the value matrices passed to this generator. All
+        other modifiers keep their default value.
+        """
+        if human is None:
+            human = createHeadlessHuman(modifierFiles)
+        self.human = human
+        self.mesh = human.meshData
+        self.modifiers = [human.getModifier(name) for name in modifierNames]
+        self.batchSize = batchSize
+
+        # Canonical path of every target, the keys of the detail stack
+        self._keys = {}
+        for modifier in human.modifiers:
+            for (tpath, tfactors) in modifier.targets:
+                if tpath not in self._keys:
+                    self._keys[tpath] = canonicalPath(tpath)
+
+        # The modifiers that Human.updateMacroModifiers() recomputes: all macro
+        # modifiers, then the first modifier of every group that depends on a
+        # macro variable, in dependency order
+        self._macroModifiers = [m for m in human.modifiers if m.isMacro()]
+        macroGroups = set(m.groupName for m in self._macroModifiers)
+        dependentGroups = set()
+        for modifier in self._macroModifiers:
+            dependentGroups.update(human.getModifiersAffectedBy(modifier))
+        self._dependentModifiers = [human.getModifiersByGroup(group)[0]
+                                    for group in human.getModifierDependencyOrder()
+                                    if group in dependentGroups and group not in macroGroups]
+
+    @property
+    def modifierNames(self):
+        return [m.fullName for m in self.modifiers]
+
+    def getDetailStack(self, values, modifiers=None):
+        """
+        Evaluate one row of modifier values to the targets detail stack
+        (dict of target path and weight) of the resulting human.
+        The values correspond to the modifiers of this generator, unless
+        another list of modifiers is specified.
+        """
+        if modifiers is None:
+            modifiers = self.modifiers
+        h = self.human
+        h.setDefaultValues()
+        stack = {}
+
+        # Same as setting the modifiers with skipDependencies
+        h.blockEthnicUpdates = True
+        try:
+            for modifier, value in zip(modifiers, values):
+                value = modifier.clampValue(float(value))
+                if modifier.isMacro():
+                    # Macro targets are recomputed below
+                    getattr(h, modifier.setter)(value, updateModifier=False)
+                else:
+                    self._setWeights(stack, modifier, value)
+        finally:
+            h.blockEthnicUpdates = False
+        h._setEthnicVals()
+
+        # Update macro targets and the modifiers that depend on them
+        for modifier in self._macroModifiers:
+            value = modifier.clampValue(modifier.getValue())
+            getattr(h, modifier.setter)(value, updateModifier=False)
+            self._setWeights(stack, modifier, value)
+        for modifier in self._dependentModifiers:
+            self._setWeights(stack, modifier, modifier.clampValue(self._getValue(stack, modifier)))
+        return stack
+
+    def _setWeights(self, stack, modifier, value):
+        """
+        Set the target weights of modifier with specified value in the detail
+        stack, like Human.setDetail() does.
+        """
+        for (tpath, weight) in modifier.getValueWeights(value).items():
+            key = self._keys[tpath]
+            if weight:
+                stack[key] = weight
+            elif key in stack:
+                del stack[key]
+
+    def _getValue(self, stack, modifier):
+        """
+        Same as modifier.getValue(), for the target weights in stack.
+        """
+        def _sum(targets):
+            return sum(stack.get(self._keys[tpath], 0.0) for (tpath, tfactors) in targets)
+
+        if modifier.isMacro():
+            return modifier.getValue()
+        if isinstance(modifier, humanmodifier.UniversalModifier):
+            right = _sum(modifier.r_targets)
+            if right:
+                return right
+            return -_sum(modifier.l_targets)
+        return _sum(modifier.targets)
+
+    def getWeightMatrix(self, values):
+        """
+        Evaluate a (N, M) matrix of modifier values to target weights.
+        Returns the list of target paths used and a (N, len(paths)) matrix
+        with the weight of each target for each sample.
+        """
+        stacks = [self.getDetailStack(row) for row in values]
+        paths = sorted(set(path for stack in stacks for path in stack))
+        columns = dict((path, col) for (col, path) in enumerate(paths))
+        weights = np.zeros((len(stacks), len(paths)), dtype=np.float32)
+        for (row, stack) in enumerate(stacks):
+            for (path, weight) in stack.items():
+                weights[row, columns[path]] = weight
+        return paths, weights
+
+    def blend(self, paths, weights):
+        """
+        Blend targets with a (N, len(paths)) weight matrix onto the rest
+        coordinates of the base mesh. Returns a (N, nverts, 3) array.
+        """
+        nverts = self.mesh.getVertexCount()
+        weights = np.asarray(weights, dtype=np.float32)
+        result = np.empty((len(weights), nverts*3), dtype=np.float32)
+        result[:] = self.mesh.orig_coord.reshape(-1)
+
+        blockSize = self.TARGET_BLOCK_SIZE
+        for start in range(0, len(paths), blockSize):
+            blockPaths = paths[start:start+blockSize]
+            basis = np.zeros((len(blockPaths), nverts, 3), dtype=np.float32)
+            for (i, path) in enumerate(blockPaths):
+                target = algos3d.getTarget(self.mesh, path)
+                if len(target.verts):
+                    basis[i, target.verts] = target.getData()
+            result += np.dot(weights[:, start:start+blockSize], basis.reshape((len(blockPaths), -1)))
+
+        return result.reshape((len(weights), nverts, 3))
+
+    def generate(self, values):
+        """
+        Generate the rest coordinates of the humans described by a (N, M)
+        matrix of modifier values, as one (N, nverts, 3) array.
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        result = np.empty((len(values), self.mesh.getVertexCount(), 3), dtype=np.float32)
+        for start in range(0, len(values), self.batchSize):
+            paths, weights = self.getWeightMatrix(values[start:start+self.batchSize])
+            result[start:start+len(weights)] = self.blend(paths, weights)
+        return result
+
+    def generateFromModifiers(self, modifierValues):
+        """
+        Generate the rest coordinates of one human from a dict of modifier
+        names and values (any modifier of the human, not only those of this
+        generator), as a (nverts, 3) array.
+        """
+        modifiers = [self.human.getModifier(name) for name in modifierValues.keys()]
+        stack = self.getDetailStack(list(modifierValues.values()), modifiers)
+        paths = sorted(stack.keys())
+        weights = np.asarray([[stack[path] for path in paths]], dtype=np.float32)
+        return self.blend(paths, weights)[0]
+
+    def iterGenerate(self, values):
+        """
+        Generate the rest coordinates of the humans described by rows of
+        modifier values, yielding one (nverts, 3) array per sample. Samples
+        are computed in batches of batchSize, values can be any iterable of
+        rows (such as a generator), so that only one batch is held in memory.
+        """
+        batch = []
+        for row in values:
+            batch.append(row)
+            if len(batch) == self.batchSize:
+                for coords in self.blend(*self.getWeightMatrix(batch)):
+                    yield coords
+                batch = []
+        if batch:
+            for coords in self.blend(*self.getWeightMatrix(batch)):
+                yield coords
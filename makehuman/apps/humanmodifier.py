@@ -129,7 +129,7 @@ class ModifierAction(guicommon.Action):
             else:
                 opposite.setValue( self.modifier.getValue() )
 
-        self.human.applyAllTargets()
+        self.human.applyAllTargets(incremental=True)
         self.postAction()
         return True
 
@@ -146,7 +146,7 @@ class ModifierAction(guicommon.Action):
                 opposite = self.human.getModifier( self.modifier.getSymmetricOpposite() )
                 opposite.setValue( self.modifier.getValue() )
 
-        self.human.applyAllTargets()
+        self.human.applyAllTargets(incremental=True)
         self.postAction()
         return True
 
@@ -170,6 +170,7 @@ class Modifier(object):
         self.eventType = 'modifier'
         self.targets = []
         self.description = ""
+        self._compiledTargets = None
 
         # Macro variable controlled by this modifier
         self.macroVariable = None
@@ -194,11 +195,27 @@ class Modifier(object):
     def getMax(self):
         return 1.0
 
+    def getTargetWeights(self, factors, value = 1.0):
+        """
+        Weights of the targets of this modifier for the specified factor
+        values, evaluated with a factor index matrix that is compiled once
+        (and again when the targets list is replaced).
+        """
+        if self._compiledTargets is None or self._compiledTargets.targets is not self.targets:
+            self._compiledTargets = CompiledTargetWeights(self.targets)
+        return self._compiledTargets.getWeights(factors, value)
+
+    def getValueWeights(self, value):
+        """
+        Weights of the targets of this modifier when it is set to the
+        specified (clamped) value, as dict of target path and weight.
+        """
+        return self.getTargetWeights(self.getFactors(value), value)
+
     def setValue(self, value, skipDependencies=False):
         value = self.clampValue(value)
-        factors = self.getFactors(value)
 
-        tWeights = getTargetWeights(self.targets, factors, value)
+        tWeights = self.getValueWeights(value)
         for tpath, tWeight in tWeights.items():
             self.human.setDetail(tpath, tWeight)
 
@@ -222,14 +239,10 @@ class Modifier(object):
         else:
             f = None
 
-        for dependentModifierGroup in self.human.getModifiersAffectedBy(self, filter = f):
-            # Only updating one modifier in a group should suffice to update the
-            # targets affected by the entire group.
-            m = self.human.getModifiersByGroup(dependentModifierGroup)[0]
-            if realtime:
-                m.updateValue(m.getValue(), skipUpdate = True)
-            else:
-                m.setValue(m.getValue(), skipDependencies = True)
+        # Each dependent group is recomputed once, groups that are not updated
+        # in realtime are updated by the final (non-realtime) update
+        self.human.markModifierVariableDirty(self.macroVariable)
+        self.human.updateDirtyModifiers(realtime, filter = f)
 
     def clampValue(self, value):
         raise NotImplementedError()
@@ -350,7 +363,7 @@ class SimpleModifier(Modifier):
 
     def __init__(self, groupName, basepath, targetpath):  #template):
         import os
-        name = targetpath.replace('.target', '')
+        name = targetpath.replace('.target', '').replace('.mhpack', '')
         name = name.replace('/', '-')
         name = name.replace('\\', '-')
         super(SimpleModifier, self).__init__(groupName, name)
@@ -459,19 +472,9 @@ class ManagedTargetModifier(Modifier):
             value = max( 0.0, value)
         return value
 
-    def setValue(self, value, skipDependencies=False):
-        value = self.clampValue(value)
-        factors = self.getFactors(value)
-
-        tWeights = getTargetWeights(self.targets, factors)
-        for tpath, tWeight in tWeights.items():
-            self.human.setDetail(tpath, tWeight)
-
-        if skipDependencies:
-            return
-
-        # Update dependent modifiers
-        self.propagateUpdate(realtime = False)
+    def getValueWeights(self, value):
+        # The value is included in the factors
+        return self.getTargetWeights(self.getFactors(value))
 
     def getValue(self):
         right = sum([self.human.getDetail(target[0]) for target in self.r_targets])
@@ -642,6 +645,44 @@ class EthnicModifier(MacroModifier):
         self.human.blockEthnicUpdates = _tmp
         return oldVals
 
+class CompiledTargetWeights(object):
+    """
+    The targets of a modifier, as (targetpath, factordependencies) tuples,
+    compiled into a factor index matrix with one row per target and one
+    column per factor dependency (padded with a constant factor 1.0). The
+    weights of all targets are then evaluated with a single gather and
+    product over the vector of factor values.
+    """
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.paths = [tpath for (tpath, tfactors) in targets]
+        self.factorNames = sorted(set(factor for (tpath, tfactors) in targets for factor in tfactors))
+
+        slots = dict((name, idx) for (idx, name) in enumerate(self.factorNames))
+        width = max([len(tfactors) for (tpath, tfactors) in targets] + [1])
+        # Unused entries refer to the constant 1.0 appended to the factor vector
+        self.factorIndex = np.full((len(targets), width), len(self.factorNames), dtype=np.intp)
+        for row, (tpath, tfactors) in enumerate(targets):
+            self.factorIndex[row,:len(tfactors)] = [slots[factor] for factor in tfactors]
+
+    def getFactorVector(self, factors, ignoreNotfound = False):
+        if ignoreNotfound:
+            values = [factors.get(name, 1.0) for name in self.factorNames]
+        else:
+            values = [factors[name] for name in self.factorNames]
+        values.append(1.0)
+        return np.asarray(values, dtype=np.float64)
+
+    def getWeights(self, factors, value = 1.0, ignoreNotfound = False):
+        """
+        Evaluate the target weights for the specified factor values, same as
+        getTargetWeights().
+        """
+        factorVector = self.getFactorVector(factors, ignoreNotfound)
+        weights = value * np.prod(factorVector[self.factorIndex], axis=1)
+        return dict(zip(self.paths, weights.tolist()))
+
 def getTargetWeights(targets, factors, value = 1.0, ignoreNotfound = False):
     result = dict()
     if ignoreNotfound:
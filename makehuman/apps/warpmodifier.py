@@ -42,8 +42,11 @@ import numpy as np
 from operator import mul
 from getpath import getPath, getSysDataPath, canonicalPath, localPath
 import os
+import io
+import hashlib
 
 import algos3d
+import targetpack
 import humanmodifier
 import targets
 import log
@@ -70,13 +73,117 @@ class WarpTarget(algos3d.Target):
 
         self.faces = self.human.meshData.getFacesForVertices(self.verts)
 
-    def apply(self, obj, morphFactor, faceGroupToUpdateName=None, update=1, calcNorm=1, scale=[1.0,1.0,1.0]):
-        super(WarpTarget, self).apply(obj, morphFactor, faceGroupToUpdateName, update, calcNorm, scale)
+    def apply(self, obj, morphFactor, update=True, calcNormals=True, faceGroupToUpdateName=None, scale=(1.0,1.0,1.0), animatedMesh=None):
+        return super(WarpTarget, self).apply(obj, morphFactor, update, calcNormals, faceGroupToUpdateName, scale, animatedMesh)
 
     def __repr__(self):
         return ( "<WarpTarget %s>" % (self.name) )
 
 
+#----------------------------------------------------------
+#   class WarpTargetCache
+#----------------------------------------------------------
+
+class WarpTargetCache(object):
+    """
+    Disk cache of compiled warp targets, before scaling to the keypoints of
+    the current human. Entries are keyed by warp target name, reference
+    variables, the macro factors that determine the source targets, and the
+    modification time and size of the source target files and of the target
+    pack (so that modified targets invalidate the entry). They are stored as
+    npz files in the user cache folder. When the total size of
+    the entries exceeds maxSize bytes, the least recently used entries are
+    removed.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path=None, maxSize=64*1024*1024):
+        if path is None:
+            path = getPath(os.path.join('cache', 'warptargets'))
+        self.path = path
+        self.maxSize = maxSize
+
+    def getKey(self, targetName, referenceVariables, factors, topology=None, sourcePaths=()):
+        h = hashlib.sha1()
+        h.update(('%s\n%s\n' % (self.VERSION, targetName)).encode('utf-8'))
+        h.update(repr(sorted(referenceVariables.items())).encode('utf-8'))
+        h.update(repr(sorted((name, '%.6f' % value) for name, value in factors.items())).encode('utf-8'))
+        if topology:
+            h.update(topology.encode('utf-8'))
+        for path in [getSysDataPath(targetpack.PACK_FILENAME)] + sorted(sourcePaths):
+            h.update(('%s\n%s\n' % (path, _getFileStamp(path))).encode('utf-8'))
+        return h.hexdigest()
+
+    def _getFilename(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def load(self, key):
+        """
+        Retrieve the arrays stored for key as a dict, or None if not cached.
+        """
+        filename = self._getFilename(key)
+        try:
+            with io.open(filename, 'rb') as f:
+                data = np.load(f)
+                result = dict((name, data[name]) for name in data.files)
+        except Exception:
+            return None
+        try:
+            os.utime(filename, None)    # Mark as recently used
+        except OSError:
+            pass
+        return result
+
+    def store(self, key, **arrays):
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            filename = self._getFilename(key)
+            tmpname = filename + '.tmp'
+            with io.open(tmpname, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmpname, filename)
+            self._evict()
+        except Exception as e:
+            log.warning('Could not store warp target in cache (%s)', e)
+
+    def _evict(self):
+        entries = []
+        for filename in os.listdir(self.path):
+            if filename.endswith('.npz'):
+                st = os.stat(os.path.join(self.path, filename))
+                entries.append((st.st_mtime, st.st_size, filename))
+        size = sum(entry[1] for entry in entries)
+        for mtime, fsize, filename in sorted(entries):
+            if size <= self.maxSize:
+                break
+            os.remove(os.path.join(self.path, filename))
+            size -= fsize
+
+    def clear(self):
+        if os.path.isdir(self.path):
+            for filename in os.listdir(self.path):
+                if filename.endswith('.npz'):
+                    os.remove(os.path.join(self.path, filename))
+
+
+def _getFileStamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return 'missing'
+    return '%r %d' % (st.st_mtime, st.st_size)
+
+_warpTargetCache = None
+
+def getWarpTargetCache():
+    global _warpTargetCache
+    if _warpTargetCache is None:
+        _warpTargetCache = WarpTargetCache()
+    return _warpTargetCache
+
+
 #----------------------------------------------------------
 #   class WarpModifier
 #----------------------------------------------------------
@@ -182,6 +289,8 @@ class WarpModifier (humanmodifier.UniversalModifier):
         #    return
 
         target = self.compileWarpTarget()
+        # Warp targets are not stored on disk, evicting them would lose them
+        algos3d.pinTarget(self.fullName)
         algos3d._targetBuffer[canonicalPath(self.fullName)] = target    # TODO remove direct use of the target buffer?
         self.human.hasWarpTargets = True
 
@@ -192,16 +301,25 @@ class WarpModifier (humanmodifier.UniversalModifier):
 
     def compileWarpTarget(self):
         log.message("Compile warp target %s", self)
-        srcTargetCoord, srcPoints, trgPoints = self.getReferences()
-        if srcTargetCoord is not None:
-            #shape = srcTargetCoord
-            warpData = self._scaleTarget(srcTargetCoord, srcPoints, trgPoints)
+        # Calculate the fully applied warp target (weight = 1.0)
+        factors = self.toReferenceFactors(self.getFactors(1.0))
+
+        # The unscaled warp target only depends on the macro factors
+        cache = getWarpTargetCache()
+        key = cache.getKey(self.fullName, self.referenceVariables, factors, self.human.meshData.getTopologyHash(),
+                           self.getSourceTargetPaths(factors))
+        cached = cache.load(key)
+        if cached is not None:
+            verts, data, srcPoints = cached['verts'], cached['data'], cached['srcPoints']
         else:
-            warpData = np.asarray([])
+            srcTargetCoord = self.getSourceTargetCoord(factors)
+            # Maintain vertices with non-zero offset in warp target
+            verts = np.unique(np.argwhere(srcTargetCoord)[...,0])
+            data = srcTargetCoord[verts]
+            srcPoints = self.getSourceKeypoints(factors)
+            cache.store(key, verts=verts, data=data, srcPoints=srcPoints)
 
-        # Maintain vertices with non-zero offset in warp target
-        verts = np.unique(np.argwhere(warpData)[...,0])
-        data = warpData[verts]
+        data = self._scaleTarget(data, srcPoints, self.getTargetKeypoints())
 
         target = WarpTarget(self.targetName, verts, data, self, self.human)
         return target
@@ -247,21 +365,13 @@ class WarpModifier (humanmodifier.UniversalModifier):
             keypoints += self.BodySizes[self.bodypart][n][0:2]
         return keypoints
 
-    def getReferences(self):
+    def getTargetKeypoints(self):
         """
-        Building source and target characters from scratch.
-        The source character is the sum of reference characters.
-        The target character is the sum of all non-warp targets.
-        Cannot use human.getSeedMesh() which returns sum of all targets.
+        Keypoints of the target character: the sum of all non-warp targets on
+        the detail stack.
         """
-        srcCharCoord = self.human.meshData.orig_coord.copy()
-        trgCharCoord = srcCharCoord.copy()
-        srcTargetCoord = np.zeros(srcCharCoord.shape, dtype=np.float32)
-
         keypoints = self.getKeypoints()
-        trgPoints = np.zeros(6, float)
-        srcPoints = np.zeros(6, float)
-
+        trgPoints = self.human.meshData.orig_coord[keypoints].astype(np.float32)
 
         # Traverse targets on stack
         for charpath,value in self.human.targetsDetailStack.items():
@@ -277,39 +387,48 @@ class WarpModifier (humanmodifier.UniversalModifier):
             if isinstance(trgChar, WarpTarget):
                 continue
 
-            # TODO This is very wasteful, because we only need trgCharCoord and
-            # srcCharCoord at the six keypoints
+            addKeypointOffsets(trgPoints, keypoints, value, trgChar)
+        return trgPoints
 
-            srcVerts = np.s_[...]
-            dstVerts = trgChar.verts[srcVerts]
-            trgCharCoord[dstVerts] += value * trgChar.data[srcVerts]    # TODO replace with getting whole stack
-        del charpath
-        del value
-
-
-        # The reference target (from reference variables)
-        factors = self.getFactors(1.0)  # Calculate the fully applied warp target (weight = 1.0)
-        factors = self.toReferenceFactors(factors)
+    def getSourceKeypoints(self, factors):
+        """
+        Keypoints of the source character: the sum of the reference targets
+        (from reference variables) for the specified reference factors.
+        """
+        keypoints = self.getKeypoints()
+        srcPoints = self.human.meshData.orig_coord[keypoints].astype(np.float32)
 
         refTargets = self.referenceTargets
         tWeights = humanmodifier.getTargetWeights(refTargets, factors, ignoreNotfound = True)
         for tpath, tweight in tWeights.items():
             srcChar = algos3d.getTarget(self.human.meshData, tpath)
-            dstVerts = srcChar.verts[srcVerts]
-            srcCharCoord[dstVerts] += tweight * srcChar.data[srcVerts]
+            addKeypointOffsets(srcPoints, keypoints, tweight, srcChar)
+        return srcPoints
 
+    def getSourceTargetPaths(self, factors):
+        """
+        Paths of the warp and reference targets that the unscaled warp target
+        and the source keypoints are computed from, for the specified
+        reference factors.
+        """
+        paths = set()
+        for targetList in [self.targets, self.referenceTargets]:
+            paths.update(humanmodifier.getTargetWeights(targetList, factors, ignoreNotfound = True).keys())
+        return paths
+
+    def getSourceTargetCoord(self, factors):
+        """
+        The (unscaled) warp target for the specified reference factors, as
+        offsets for all vertices of the mesh.
+        """
+        srcTargetCoord = np.zeros(self.human.meshData.orig_coord.shape, dtype=np.float32)
 
-        # The warp target
         warpTargets = self.targets
         tWeights = humanmodifier.getTargetWeights(warpTargets, factors, ignoreNotfound = True)
         for tpath, tweight in tWeights.items():
             srcTrg = readTarget(tpath)
             addTargetVerts(srcTargetCoord, tweight, srcTrg)
-
-        # Aggregate the keypoints differences
-        trgPoints = trgCharCoord[keypoints]
-        srcPoints = srcCharCoord[keypoints]
-        return srcTargetCoord, srcPoints, trgPoints
+        return srcTargetCoord
 
     def toReferenceFactors(self, factors):
         vars_per_cat = dict()
@@ -364,7 +483,19 @@ def compileWarpTarget(groupName, targetName, human, bodypart, referenceVariables
 
 def addTargetVerts(targetVerts, value, target):
     dstVerts = target.verts[:]
-    targetVerts[dstVerts] += value * target.data[:]
+    targetVerts[dstVerts] += value * target.getData()
+
+def addKeypointOffsets(points, keypoints, value, target):
+    """
+    Add the offsets of target at the specified keypoints (vertex indices)
+    to points, without applying the target to the whole mesh.
+    """
+    if not len(target.verts):
+        return
+    for (i, vIdx) in enumerate(keypoints):
+        tIdx = np.flatnonzero(target.verts == vIdx)
+        if len(tIdx):
+            points[i] += value * target._getScaledData(tIdx, np.ones(3, dtype=np.float32)).sum(axis=0)
 
 #----------------------------------------------------------
 #   Read target
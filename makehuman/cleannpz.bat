@@ -10,6 +10,26 @@ for /r %%i in (*) do (
    )
 )
 
+:: Clean up compiled target packs
+
+set filetype=.mhpack
+
+for /r %%i in (*) do (
+   if %%~xi==%filetype% (
+      del %%i
+   )
+)
+
+:: Clean up compiled (memory-mapped) meshes
+
+set filetype=.mhmesh
+
+for /r %%i in (*) do (
+   if %%~xi==%filetype% (
+      del %%i
+   )
+)
+
 :: Clean up .bin files as well
 
 set filetype=.bin
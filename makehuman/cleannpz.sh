@@ -6,6 +6,14 @@
 
 find . -type f -iname \*.npz -exec rm -rf {} \;
 
+# And compiled target packs
+
+find . -type f -iname \*.mhpack -exec rm -rf {} \;
+
+# And compiled (memory-mapped) meshes
+
+find . -type f -iname \*.mhmesh -exec rm -rf {} \;
+
 # And mhpxy files
 
 find . -type f -iname \*.mhpxy -exec rm -rf {} \;
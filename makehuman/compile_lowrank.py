@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           MakeHuman Team
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Standalone script to compile the targets of a target group (such as the macro
+targets in data/targets/macrodetails) into a low-rank basis (see
+algos3d.LowRankTargetBasis), stored next to the group folder as
+<group>.lowrank.npz. Human.setLowRankMorphing() uses such a basis to blend the
+targets of the group approximately, with a few dense components.
+
+The tolerance is the largest absolute error, in mesh units, allowed for the
+offset of any vertex of any single target. It does not bound the error of a
+blend of several targets: that is bounded by the sum of abs(weight) times the
+error of each blended target (LowRankTargetBasis.getErrorBound()), so choose a
+tolerance accordingly smaller than the error acceptable for a full model.
+"""
+
+import sys
+sys.path = [".", "./core", "./lib", "./shared"] + sys.path
+import algos3d
+import files3d
+import os
+import fnmatch
+import argparse
+
+BASE_MESH_PATH = 'data/3dobjs/base.obj'
+
+def getGroupTargets(group):
+    result = []
+    for root, dirnames, filenames in os.walk(os.path.join('data', 'targets', group)):
+        for filename in fnmatch.filter(filenames, '*.target'):
+            result.append(os.path.join(root, filename))
+    return sorted(result)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compile target groups into low-rank target bases.")
+    parser.add_argument('groups', nargs='*', default=['macrodetails'],
+                        help="Target groups (folders in data/targets) to compile (default: macrodetails)")
+    parser.add_argument('--tolerance', type=float, default=0.001,
+                        help="Largest absolute error allowed for the offsets of any single target (default: 0.001)")
+    parser.add_argument('--max-rank', type=int, default=None,
+                        help="Maximum number of components (overrides the tolerance)")
+    args = parser.parse_args()
+
+    obj = files3d.loadMesh(BASE_MESH_PATH, maxFaces = 5)
+    for group in args.groups:
+        targets = getGroupTargets(group)
+        if not targets:
+            print("No targets found for group %s" % group)
+            continue
+        basis = algos3d.LowRankTargetBasis.factorize(obj, targets, args.tolerance, args.max_rank)
+        path = os.path.join('data', 'targets', group + algos3d.LOWRANK_EXTENSION)
+        basis.toFile(path)
+        print("Compiled %d targets of %s to rank %d (max error %.6f, %d vertices) in %s" % (len(targets), group, basis.rank, basis.error, len(basis.verts), path))
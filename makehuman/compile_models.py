@@ -33,8 +33,8 @@
 Abstract
 --------
 
-Standalone script to compile all obj mesh files into binary npz files for faster
-loading.
+Standalone script to compile all obj mesh files into binary npz files, and
+uncompressed memory-mappable mhmesh files, for faster loading.
 """
 
 import sys
@@ -78,6 +78,7 @@ def compileMesh(path):
             #traceback.print_exc(file=sys.stdout)
             return False
         files3d.saveBinaryMesh(obj, npzpath)
+        files3d.saveMappedMesh(obj, os.path.splitext(path)[0] + files3d.MAPPED_MESH_EXTENSION)
     except:
         print('Unable to save compiled mesh for file %s' % path)
         #import traceback
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           MakeHuman Team
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Standalone script to compile the vertex mirror map of the base mesh (from the
+MakeTarget symmetry map) into a binary npz file, used by the symmetry module.
+"""
+
+import sys
+sys.path = ["./core", "./lib", "./shared"] + sys.path
+import os
+import symmetry
+from getpath import getSysDataPath
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sourcePath = sys.argv[1]
+    else:
+        sourcePath = os.path.join(os.path.dirname(os.path.abspath(__file__)), symmetry.SYMMETRY_MAP_SOURCE)
+    mirrorMap = symmetry.buildMirrorMap(sourcePath)
+    path = getSysDataPath(symmetry.MIRROR_MAP_FILE)
+    mirrorMap.toFile(path)
+    print("Compiled mirror map of %d vertices (%d pairs, %d on the symmetry plane) to %s" % (mirrorMap.vertexCount, len(mirrorMap.left), len(mirrorMap.mid), path))
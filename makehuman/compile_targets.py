@@ -33,18 +33,33 @@
 Abstract
 --------
 
-TODO
+Standalone script to compile all .target files in the data folder into one
+memory-mappable target pack (see targetpack) for faster loading.
+
+Targets are parsed and encoded in parallel by a pool of worker processes.
+Each target entry in the pack records the modification time and hash of its
+source file. With --incremental, an existing pack is updated: only targets
+whose source changed are compiled again, the data of all other targets is
+copied over from the existing pack.
+
+The faces affected by each target are precomputed for the base mesh and
+stored in the pack as well, together with the topology hash of that base
+mesh (they are only used if the base mesh in use has the same topology).
 """
 
 import sys
-sys.path = [".", "./core", "./lib"] + sys.path
+sys.path = [".", "./core", "./lib", "./shared"] + sys.path
 import makehuman
 import algos3d
+import targetpack
+import files3d
 import numpy as np
 import os
-import zipfile
 import fnmatch
 import io
+import argparse
+import hashlib
+import multiprocessing
 
 def getAllFiles(rootPath, filterStrArr):
     result = [ None ]*len(filterStrArr)
@@ -61,36 +76,177 @@ def getFiles(root, filenames, filterStr):
         foundFiles.append(os.path.join(root, filename))
     return foundFiles
 
+def getFileHash(path):
+    with io.open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
 
-if __name__ == '__main__':
+def getSourceInfo(path, hash=None):
+    """
+    Manifest entry stored in the pack for the target compiled from path.
+    """
+    return {'mtime': os.path.getmtime(path),
+            'hash': hash or getFileHash(path)}
+
+def isUnchanged(path, source):
+    """
+    Compare a source file with its manifest entry, the file is only hashed
+    when its modification time differs.
+    """
+    if not source:
+        return False
+    if os.path.getmtime(path) == source.get('mtime'):
+        return True
+    return getFileHash(path) == source.get('hash')
+
+BASE_MESH_PATH = 'data/3dobjs/base.obj'
+
+_baseMesh = None
+
+def getBaseMesh():
+    """
+    Base mesh for which the faces of each target are precomputed, loaded
+    once per process.
+    """
+    global _baseMesh
+    if _baseMesh is None:
+        _baseMesh = files3d.loadMesh(BASE_MESH_PATH, maxFaces = 5)
+    return _baseMesh
+
+def getQuantizationError(data, vector, scale):
+    """
+    Upper bound and largest measured error per axis of quantized vectors,
+    computed in float64. The bound is half the quantization step plus the
+    float32 rounding of quantizing and dequantizing, so that it is never
+    smaller than the measured error.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    dequantized = (vector * scale[None,:]).astype(np.float64)
+    error = np.max(np.abs(dequantized - data), axis=0, initial=0)
+    rounding = 2 * np.finfo(np.float32).eps * np.max(np.abs(data), axis=0, initial=0)
+    usedAxes = np.any(vector != 0, axis=0)
+    errorBound = np.where(usedAxes, scale.astype(np.float64) / 2 + rounding, 0)
+    return errorBound, error
+
+def compileTarget(args):
+    """
+    Parse and encode one target file (run in a worker process).
+    Returns path, arrays, properties and quantization error of the target.
+    """
+    path, quantization = args
     obj = algos3d.Target(None, None)
+    obj._load_text(path)
+    properties = {'source': getSourceInfo(path)}
+    if hasattr(obj, '_license'):
+        properties['license'] = obj._license.asDict()
+    if quantization is not None:
+        vector, scale = algos3d.quantizeVectors(obj.data, quantization)
+        errorBound, error = getQuantizationError(obj.data, vector, scale)
+        properties['scale'] = scale.tolist()
+        arrays = {'index': algos3d.compactIndices(obj.verts),
+                  'vector': vector}
+    else:
+        errorBound = error = np.zeros(3, dtype=np.float64)
+        arrays = {'index': np.asarray(obj.verts, dtype=np.uint32),
+                  'vector': np.asarray(obj.data, dtype=np.float32)}
+    arrays['faces'] = np.asarray(getBaseMesh().getFacesForVertices(obj.verts), dtype=np.uint32)
+    return path, arrays, properties, (errorBound, error)
+
+def openExistingPack(packPath, quantization, topology):
+    """
+    Open the existing pack for an incremental update, returns None if there
+    is none or if it was compiled with different settings.
+    """
+    if not os.path.isfile(packPath):
+        print("No existing target pack, compiling all targets")
+        return None
+    try:
+        pack = targetpack.TargetPack(packPath)
+    except Exception as e:
+        print("Cannot read existing target pack (%s), compiling all targets" % e)
+        return None
+    if pack.header.get('quantization') != (quantization.name if quantization is not None else None):
+        print("Existing target pack uses different quantization, compiling all targets")
+        return None
+    if pack.header.get('topology') != topology:
+        print("Base mesh topology changed, compiling all targets")
+        return None
+    return pack
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compile all targets into a target pack.")
+    parser.add_argument('--quantize', choices=['int16', 'int8'], default=None,
+                        help="Store offset vectors as integers with a per-axis scale per target (compact, lossy)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only compile targets that changed since the existing target pack was written")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs)")
+    args = parser.parse_args()
+    quantization = np.dtype(args.quantize) if args.quantize else None
+
     allFiles = getAllFiles('data', ['*.target', '*.png'])
-    npzPath = 'data/targets.npz'
-    with zipfile.ZipFile(npzPath, mode='w', compression=zipfile.ZIP_DEFLATED) as zip:
-        npzdir = os.path.dirname(npzPath)
-        allTargets = allFiles[0]
-
-        # License for all official MH targets
-        lpath = 'data/targets/targets.license.npy'
-        np.save(lpath, makehuman.getAssetLicense().toNumpyString())
-        zip.write(lpath, os.path.relpath(lpath, npzdir))
-        os.remove(lpath)
-
-        for (i, path) in enumerate(allTargets):
-            try:
-                obj._load_text(path)
-                iname, vname, lname = obj._save_binary(path)
-                zip.write(iname, os.path.relpath(iname, npzdir))
-                zip.write(vname, os.path.relpath(vname, npzdir))
-                if lname:
-                    zip.write(lname, os.path.relpath(lname, npzdir))
-                    os.remove(lname)
-                os.remove(iname)
-                os.remove(vname)
-                print("[%.0f%% done] converted target %s" % (100*(float(i)/float(len(allTargets))), path))
-            except None as e:
-                raise e
-                print('error converting target %s' % path)
+    packPath = os.path.join('data', targetpack.PACK_FILENAME)
+    packdir = os.path.dirname(packPath)
+    allTargets = sorted(allFiles[0])
+
+    def getName(path):
+        return os.path.relpath(path, packdir).replace('\\', '/')
+
+    topology = getBaseMesh().getTopologyHash()
+    oldPack = openExistingPack(packPath, quantization, topology) if args.incremental else None
+
+    # License for all official MH targets
+    pack = targetpack.TargetPackWriter(license=makehuman.getAssetLicense().asDict(),
+                                       quantization=quantization.name if quantization is not None else None,
+                                       topology=topology)
+
+    # Determine which targets need compiling
+    compiled = {}
+    toCompile = []
+    for path in allTargets:
+        name = getName(path)
+        if oldPack is not None and name in oldPack and \
+           isUnchanged(path, oldPack.getProperties(name).get('source')):
+            properties = oldPack.getProperties(name)
+            properties['source'] = getSourceInfo(path, properties['source'].get('hash'))
+            # Copy the data, the existing pack is overwritten below
+            arrays = dict((key, np.array(array)) for key, array in oldPack.getArrays(name).items())
+            compiled[name] = (arrays, properties)
+        else:
+            toCompile.append(path)
+    if oldPack is not None:
+        print("%d of %d targets changed" % (len(toCompile), len(allTargets)))
+        # Unmap the existing pack, a mapped file cannot be replaced on Windows
+        oldPack.close()
+        oldPack = None
+
+    errorBound = np.zeros(3, dtype=np.float64)
+    maxError = np.zeros(3, dtype=np.float64)
+    if toCompile:
+        pool = multiprocessing.Pool(args.jobs)
+        try:
+            jobs = [(path, quantization) for path in toCompile]
+            for (i, (path, arrays, properties, errors)) in enumerate(pool.imap_unordered(compileTarget, jobs, chunksize=16)):
+                compiled[getName(path)] = (arrays, properties)
+                errorBound = np.maximum(errorBound, errors[0])
+                maxError = np.maximum(maxError, errors[1])
+                print("[%.0f%% done] converted target %s" % (100*(float(i)/float(len(toCompile))), path))
+        finally:
+            pool.close()
+            pool.join()
+
+    if quantization is not None and toCompile:
+        print("Quantized vectors to %s, error bound per axis: %s (largest error: %s)" % (quantization.name, errorBound, maxError))
+
+    # Add targets in a fixed order, so that the output does not depend on
+    # the order in which the workers finish
+    for path in allTargets:
+        name = getName(path)
+        arrays, properties = compiled[name]
+        pack.addTarget(name, arrays, **properties)
+
+    print("Writing target pack %s" % packPath)
+    pack.write(packPath)
 
     print("Writing images list")
     with io.open('data/images.list', 'w', encoding="utf-8") as f:
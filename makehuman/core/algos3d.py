@@ -61,8 +61,186 @@ import numpy as np
 import log
 from getpath import getSysDataPath, canonicalPath
 import io
+import re
+import mmap
+import threading
+import warnings
+from collections import OrderedDict
+import targetpack
 
-_targetBuffer = {}
+
+class TargetCache(object):
+    """
+    Cache of loaded targets, keyed on their canonical path.
+    Behaves as a dict, but holds at most budget bytes of target data (if a
+    budget is set). When the budget is exceeded the least recently requested
+    targets are evicted, except for pinned ones (such as the macro targets,
+    or warp targets that cannot be reloaded from disk).
+    Only requesting a target with [] counts as a use (and as a hit or miss in
+    the statistics), get() and "in" do not alter the order of eviction.
+    Data that is memory-mapped from a target pack does not count towards the
+    budget (see Target.nbytes).
+    """
+
+    def __init__(self, budget=None):
+        self._targets = OrderedDict()
+        self._sizes = {}
+        self._pinned = set()
+        self._lock = threading.RLock()
+        self.budget = budget
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, key):
+        with self._lock:
+            try:
+                target = self._targets[key]
+            except KeyError:
+                self.misses += 1
+                raise
+            self._targets.move_to_end(key)
+            self.hits += 1
+            return target
+
+    def __setitem__(self, key, target):
+        with self._lock:
+            if key in self._targets:
+                self._remove(key)
+            self._targets[key] = target
+            self._sizes[key] = getattr(target, 'nbytes', 0)
+            self.nbytes += self._sizes[key]
+            self._evict()
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key not in self._targets:
+                raise KeyError(key)
+            self._remove(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._targets
+
+    def __len__(self):
+        with self._lock:
+            return len(self._targets)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._targets.get(key, default)
+
+    def setdefault(self, key, target):
+        """
+        Store target under key, unless another thread stored a target for the
+        same key first. Returns the target that ends up in the cache.
+        """
+        with self._lock:
+            if key in self._targets:
+                return self._targets[key]
+            self[key] = target
+            return target
+
+    def updateSize(self, key):
+        """
+        Measure the target stored under key again, after the amount of data it
+        holds changed (such as data cached for posing), and evict other targets
+        if this exceeds the budget.
+        """
+        with self._lock:
+            if key not in self._targets:
+                return
+            size = getattr(self._targets[key], 'nbytes', 0)
+            self.nbytes += size - self._sizes[key]
+            self._sizes[key] = size
+            self._evict()
+
+    def keys(self):
+        with self._lock:
+            return list(self._targets.keys())
+
+    def values(self):
+        with self._lock:
+            return list(self._targets.values())
+
+    def items(self):
+        """
+        List of (path, target) tuples, from least to most recently used.
+        Returns a copy, so the cache can be modified while iterating.
+        """
+        with self._lock:
+            return list(self._targets.items())
+
+    def clear(self):
+        """
+        Remove all targets, and all pins.
+        """
+        with self._lock:
+            self._targets.clear()
+            self._sizes.clear()
+            self._pinned.clear()
+            self.nbytes = 0
+
+    def pin(self, key):
+        """
+        Never evict the target with specified path (it does not need to be
+        loaded yet). Pinned targets still count towards the budget.
+        """
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned.discard(key)
+
+    def isPinned(self, key):
+        with self._lock:
+            return key in self._pinned
+
+    def setBudget(self, budget):
+        """
+        Set the maximum number of bytes of target data to keep in memory, or
+        None for no limit.
+        """
+        with self._lock:
+            self.budget = budget
+            self._evict()
+
+    def getStatistics(self):
+        with self._lock:
+            return dict(targets = len(self._targets),
+                        bytes = self.nbytes,
+                        budget = self.budget,
+                        hits = self.hits,
+                        misses = self.misses,
+                        evictions = self.evictions)
+
+    def resetStatistics(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def _remove(self, key):
+        del self._targets[key]
+        self.nbytes -= self._sizes.pop(key)
+
+    def _evict(self):
+        if self.budget is None or self.nbytes <= self.budget:
+            return
+        # Never evict the most recently added target
+        for key in list(self._targets.keys())[:-1]:
+            if key in self._pinned:
+                continue
+            self._remove(key)
+            self.evictions += 1
+            if self.nbytes <= self.budget:
+                break
+
+
+_targetBuffer = TargetCache()
 
 
 class Target(object):
@@ -71,10 +249,26 @@ class Target(object):
     """
 
     dtype = [('index','u4'),('vector','(3,)f4')]
+    packfile = None
     npzfile = None
     npztime = None
     npzdir = None
 
+    # Integer type to which loaded targets are quantized, None to keep float32
+    # vectors (see setTargetQuantization())
+    quantization = None
+
+    _data = None
+    _qdata = None       # Quantized vectors (if target is quantized)
+    _qscale = None      # Per-axis scale to dequantize _qdata
+
+    faces = None
+    _facesTopology = None   # Topology hash of the mesh for which precomputed faces are valid
+
+    # Cached (compiled weights, pose state, weights of target verts, posed
+    # vectors) for applying the target to a posed mesh, see _getPosedData()
+    _posed = None
+
     def __init__(self, obj, name):
         """
         This method initializes an instance of the Target class.
@@ -106,15 +300,122 @@ class Target(object):
             self.verts = []
             return
 
-        self.faces = obj.getFacesForVertices(self.verts)
+        if Target.quantization is not None:
+            self.quantize(Target.quantization)
+
+        if self.faces is None or self._facesTopology != obj.getTopologyHash():
+            self.faces = obj.getFacesForVertices(self.verts)
 
     def __repr__(self):
         return ( "<Target %s>" % (os.path.basename(self.name)) )
 
+    def getData(self):
+        """
+        The offset vectors of this target as (n, 3) float array. For
+        quantized targets this dequantizes all vectors into a new array, so
+        callers should keep the result rather than call this repeatedly.
+        """
+        if self._qdata is not None:
+            return self._qdata * self._qscale[None,:]
+        return self._data
+
+    @property
+    def data(self):
+        """
+        The offset vectors of this target, see getData().
+        """
+        return self.getData()
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._qdata = None
+        self._qscale = None
+        self._posed = None
+
+    def isQuantized(self):
+        return self._qdata is not None
+
+    @property
+    def nbytes(self):
+        """
+        Memory occupied by the data of this target, in bytes, including its
+        precomputed faces and the data cached for posed application.
+        Arrays that are views on a memory-mapped file (such as targets loaded
+        from a target pack) are not counted, their pages are managed by the
+        OS and do not take up process memory.
+        """
+        arrays = [self.verts, self._data, self._qdata, self.faces]
+        if self._posed is not None:
+            arrays.extend(self._posed[1:])
+        return sum(array.nbytes for array in arrays
+                   if isinstance(array, np.ndarray) and not isMemoryMapped(array))
+
+    def quantize(self, dtype=np.int16):
+        """
+        Convert this target to a compact representation: integer offset
+        vectors with a per-axis scale, and the smallest index type that fits.
+        The vectors are dequantized on the fly when the target is applied.
+        Returns the maximum error introduced per axis.
+        """
+        if self._qdata is not None or not len(self.verts):
+            return np.zeros(3, dtype=np.float32)
+        data = self._data
+        qdata, qscale = quantizeVectors(data, dtype)
+        self.verts = compactIndices(self.verts)
+        self._setQuantized(qdata, qscale)
+        return np.max(np.abs(qdata * qscale[None,:] - data), axis=0)
+
+    def _setQuantized(self, qdata, qscale):
+        self._data = None
+        self._qdata = qdata
+        self._qscale = np.asarray(qscale, dtype=np.float32)
+        self._posed = None
+
+    def _getScaledData(self, indices, scale):
+        """
+        Offset vectors of the specified entries of this target multiplied by
+        the per-axis scale, dequantizing on the fly if needed.
+        """
+        if self._qdata is not None:
+            return self._qdata[indices] * (scale * self._qscale)[None,:]
+        return self._data[indices] * scale[None,:]
+
+    def _getPosedData(self, indices, scale, compiledWeights, poseData):
+        """
+        Offset vectors of the specified entries of this target multiplied by
+        the per-axis scale, and transformed to the pose described by the
+        skinning matrices in poseData, with compiledWeights the compiled
+        vertex bone weights of the whole mesh.
+        The weights gathered for the vertices of this target and the posed
+        (unscaled) vectors are kept until the weights or the pose change, so
+        that repeated applications for a static pose only need a multiply.
+        """
+        import animation
+
+        cache = self._posed
+        if cache is None or cache[0] is not compiledWeights:
+            cache = (compiledWeights, None, compiledWeights[self.verts], None)
+        if cache[1] is None or not np.array_equal(cache[1], poseData):
+            unscaled = self._getScaledData(np.s_[...], np.ones(3, dtype=np.float32))
+            posed = animation.skinMesh(unscaled, cache[2], poseData)
+            cache = (compiledWeights, np.array(poseData), cache[2], posed)
+            self._posed = cache
+            # The cached data counts towards the target buffer budget
+            if _targetBuffer.get(self.name) is self:
+                _targetBuffer.updateSize(self.name)
+
+        if scale[0] == scale[1] == scale[2]:
+            # Skinning is linear in the vectors
+            return cache[3][indices] * scale[0]
+        return animation.skinMesh(self._getScaledData(indices, scale), cache[2][indices], poseData)
+
     @property
     def license(self):
         if hasattr(self, '_license'):
             return self._license
+        elif Target.packfile and Target.packfile.license:
+            return defaultTargetLicense().fromDict(Target.packfile.license)
         elif Target.npzfile is not None and 'targets/targets.license' in Target.npzfile:
             license = defaultTargetLicense()
             return license.fromNumpyString(Target.npzfile['targets/targets.license'])
@@ -125,28 +426,53 @@ class Target(object):
         self._license = license
 
     def _load_text(self, name):
-        import makehuman
-        data = []
         license = defaultTargetLicense()
         with io.open(name, 'rU') as fd:
-            for line in fd:
-                line = line.strip()
-                if line.startswith('#'):
-                    license.updateFromComment(line)
-                    continue
-                translationData = line.split()
-                if len(translationData) != 4:
-                    continue
-                vertIndex = int(translationData[0])
-                translationVector = (float(translationData[1]), float(translationData[2]), float(translationData[3]))
-                data.append((vertIndex, translationVector))
-
-        raw = np.asarray(data, dtype=Target.dtype)
-        self.verts = raw['index']
-        self.data = raw['vector']
+            text = fd.read()
+
+        comments, body = splitTargetComments(text)
+        for line in comments:
+            license.updateFromComment(line)
+
+        self.verts, self.data = parseTargetData(body)
         if license.isCustomized():
             self.setLicense(license)
 
+    def _load_binary_pack(self, name, pack=None):
+        """
+        Load target from memory-mapped target pack (containing multiple targets).
+        The loaded arrays are views on the mapped pack file.
+        """
+        if pack is None:
+            pack = Target.packfile
+        path = os.path.join(pack.dirname, name)
+        name = name.replace('\\', '/')
+        if os.path.isfile(path) and pack.mtime < os.path.getmtime(path):
+            log.message('compiled file newer than pack: %s', name)
+            raise RuntimeError('compiled file newer than pack: %s' % name)
+        if name not in pack:
+            log.message('compiled target missing: %s', name)
+            raise RuntimeError('compiled target missing: %s' % name)
+        arrays = pack.getArrays(name)
+        entry = pack.getEntry(name)
+        self.verts = arrays['index']
+        if 'scale' in entry:
+            # Quantized vectors
+            self._setQuantized(arrays['vector'], entry['scale'])
+        else:
+            self.data = arrays['vector']
+        if 'faces' in arrays:
+            # Faces precomputed for the base mesh the pack was compiled with
+            self.faces = arrays['faces']
+            self._facesTopology = pack.header.get('topology')
+        license = entry.get('license')
+        if not license and pack is not Target.packfile:
+            # The license in the header of a separate pack file applies to
+            # its targets (that of the system pack is the default license)
+            license = pack.license
+        if license:
+            self._license = defaultTargetLicense().fromDict(license)
+
     def _load_binary_archive(self, name):
         """
         Load target from npz archive (containing multiple targets)
@@ -195,6 +521,18 @@ class Target(object):
         self.data = np.load(vname) * 1e-3
 
     def _load_binary(self, name):
+        if Target.packfile is None:
+            try:
+                Target.packfile = targetpack.TargetPack(getSysDataPath(targetpack.PACK_FILENAME))
+            except Exception:
+                log.message('no target pack found')
+                Target.packfile = False
+        if Target.packfile:
+            # Load target from memory-mapped pack
+            name = os.path.relpath(name, Target.packfile.dirname)
+            self._load_binary_pack(name)
+            return
+
         if Target.npzfile is None:
             try:
                 npzname = getSysDataPath('targets.npz')     # TODO duplicate path literal
@@ -231,13 +569,26 @@ class Target(object):
         except Exception as _:
             log.error('error saving %s', name)
 
+    def _load_pack_file(self, name):
+        """
+        Load target from a target pack file that contains only this target,
+        as written by saveTranslationTarget() in binary mode.
+        """
+        pack = targetpack.TargetPack(name)
+        if len(pack) != 1:
+            raise RuntimeError('Target pack %s contains %d targets, expected one' % (name, len(pack)))
+        self._load_binary_pack(pack.names()[0], pack)
+
     def _load(self, name):
         logger = log.getLogger('mh.load')
         logger.debug('loading target %s', name)
-        try:
-            self._load_binary(name)
-        except Exception as _:
-            self._load_text(name)
+        if os.path.splitext(name)[1].lower() == targetpack.PACK_EXTENSION:
+            self._load_pack_file(name)
+        else:
+            try:
+                self._load_binary(name)
+            except Exception as _:
+                self._load_text(name)
         logger.debug('loaded target %s', name)
 
     def apply(self, obj, morphFactor, update=True, calcNormals=True, faceGroupToUpdateName=None, scale=(1.0,1.0,1.0), animatedMesh=None):
@@ -270,7 +621,6 @@ class Target(object):
                 if animatedMesh is not None:
                     # Pose the direction in which the target is applied, for fast
                     # approximate modeling of a posed model
-                    import animation
                     vertBoneMapping = animatedMesh.getBoundMesh(obj.name)[1]
                     if not vertBoneMapping.isCompiled(4):
                         vertBoneMapping.compileData(animatedMesh.getBaseSkeleton(), 4)
@@ -278,11 +628,10 @@ class Target(object):
                     if not animationTrack.isBaked():
                         animationTrack.bake(animatedMesh.getBaseSkeleton())
                     poseData = animatedMesh.getPoseState()
-                    obj.coord[dstVerts] += animation.skinMesh( \
-                                  self.data[srcVerts] * scale[None,:], 
-                                  vertBoneMapping.compiled(4)[dstVerts], poseData )
+                    obj.coord[dstVerts] += self._getPosedData(srcVerts, scale,
+                                  vertBoneMapping.compiled(4), poseData)
                 else:
-                    obj.coord[dstVerts] += self.data[srcVerts] * scale[None,:]
+                    obj.coord[dstVerts] += self._getScaledData(srcVerts, scale)
                 obj.markCoords(dstVerts, coor=True)
 
             if calcNormals:
@@ -294,6 +643,128 @@ class Target(object):
 
         return False
 
+def splitTargetComments(text):
+    """
+    Separate the comment lines (license information) of a .target file from
+    its body. Returns the list of stripped comment lines and the body text.
+    Only the (few) comment characters are visited, not every line.
+    """
+    comments = []
+    parts = []
+    pos = 0
+    idx = text.find('#')
+    while idx != -1:
+        start = text.rfind('\n', 0, idx) + 1
+        end = text.find('\n', idx)
+        end = len(text) if end == -1 else end + 1
+        if not text[start:idx].strip():
+            comments.append(text[start:end].strip())
+            parts.append(text[pos:start])
+            pos = end
+        idx = text.find('#', end)
+    parts.append(text[pos:])
+    return comments, ''.join(parts)
+
+def countLineValues(text):
+    """
+    Number of whitespace separated values on every line of text.
+    """
+    chars = np.frombuffer(('\n%s\n' % text).encode('utf-8'), dtype=np.uint8)
+    space = chars <= 32
+    starts = np.flatnonzero(space[:-1] & ~space[1:])
+    return np.diff(np.searchsorted(starts, np.flatnonzero(chars == 10)))
+
+def parseTargetData(text):
+    """
+    Parse the body (without comments) of a .target file, every line of which
+    contains a vertex index and an offset vector. All values are parsed in
+    one go, lines that do not contain exactly four values are skipped.
+    Returns an index (uint32) and a (n, 3) vector (float32) array.
+    """
+    text = text.strip()
+    if '\n\n' in text:
+        text = re.sub(r'\n\s*\n', '\n', text)
+    nLines = text.count('\n') + 1 if text else 0
+
+    values = None
+    if np.all(countLineValues(text) == 4):
+        try:
+            with warnings.catch_warnings():
+                # Make numpy raise on unparseable data instead of stopping
+                warnings.simplefilter('error')
+                values = np.fromstring(text, dtype=np.float64, sep=' ')
+        except (ValueError, DeprecationWarning):
+            pass
+
+    if values is None or len(values) != 4 * nLines:
+        # Irregular lines, filter them out one by one
+        rows = [line.split() for line in text.splitlines()]
+        rows = [row for row in rows if len(row) == 4]
+        values = np.asarray(rows, dtype=np.float64)
+
+    values = values.reshape((-1, 4))
+    return values[:,0].astype(np.uint32), values[:,1:].astype(np.float32)
+
+def isMemoryMapped(array):
+    """
+    Returns True if the numpy array is a (view on a) memory-mapped file.
+    """
+    while isinstance(array, np.ndarray):
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return isinstance(array, mmap.mmap)
+
+def quantizeVectors(data, dtype=np.int16):
+    """
+    Quantize (n, 3) float offset vectors to integers of the specified type,
+    using a separate scale per axis so that the full integer range is used.
+    Returns the quantized vectors and the per-axis scale, dequantize with
+    qdata * scale. The quantization error is at most scale/2 per axis.
+    """
+    qmax = np.iinfo(dtype).max
+    data = np.asarray(data, dtype=np.float32).reshape((-1, 3))
+    if len(data):
+        scale = np.max(np.abs(data), axis=0) / qmax
+    else:
+        scale = np.zeros(3, dtype=np.float32)
+    scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+    qdata = np.round(data / scale[None,:]).astype(dtype)
+    return qdata, scale
+
+def compactIndices(indices):
+    """
+    Store vertex indices in the smallest unsigned integer type that fits.
+    """
+    indices = np.asarray(indices)
+    if len(indices) and indices.max() >= 2**16:
+        return indices.astype(np.uint32)
+    return indices.astype(np.uint16)
+
+def setTargetQuantization(dtype=np.int16):
+    """
+    Store all targets loaded from now on in compact, quantized form (int16 or
+    int8 vectors with a per-axis scale, and uint16 indices where possible).
+    This reduces the memory held by the target buffer 2 to 4 times, with an
+    error well below what is visible on the mesh. Pass None to disable.
+    Targets that are already loaded are not affected.
+    """
+    Target.quantization = dtype
+
+def setTargetCacheBudget(budget):
+    """
+    Limit the memory used by the target buffer to the specified number of
+    bytes, least recently used targets are evicted (and reloaded when they
+    are needed again). Pass None to keep all loaded targets in memory.
+    """
+    _targetBuffer.setBudget(budget)
+
+def pinTarget(targetPath):
+    """
+    Keep the specified target in the target buffer, regardless of its budget.
+    """
+    _targetBuffer.pin(canonicalPath(targetPath))
+
 def getTarget(obj, targetPath):
     """
     This function retrieves a set of translation vectors from a morphing
@@ -332,9 +803,8 @@ def getTarget(obj, targetPath):
     except KeyError:
         pass
 
-    target = Target(obj, targetPath)
-    _targetBuffer[targetPath] = target
-    return target
+    # Targets can be loaded concurrently by the prefetcher (see targetprefetch)
+    return _targetBuffer.setdefault(targetPath, Target(obj, targetPath))
 
 def refreshCachedTarget(targetPath):
     """
@@ -404,13 +874,295 @@ def loadTranslationTarget(obj, targetPath, morphFactor, faceGroupToUpdateName=No
     """
 
     if not (morphFactor or update):
-        return
+        return None
 
     target = getTarget(obj, targetPath)
 
     target.apply(obj, morphFactor, update, calcNorm, faceGroupToUpdateName, scale, animatedMesh)
+    return target
+
+class TargetBasis(object):
+    """
+    Sparse basis matrix that packs the offsets of many targets together, so
+    that a weighted combination of all of them can be applied in one go.
+
+    The matrix is stored in compressed sparse row (CSR) format, with one row
+    per vertex coordinate component (nverts * 3 rows) and one column per
+    target. Applying a full targets detail stack then boils down to a single
+    sparse matrix-vector product with the vector of target weights, instead
+    of indexing the mesh coordinates once for every target.
+    """
+
+    def __init__(self, obj):
+        self.nverts = obj.getVertexCount()
+
+        self.paths = []         # Target path per column
+        self.targets = []       # Target object per column (used to detect reloaded targets)
+        self.columns = {}       # Maps target path to column index
+
+        self.indptr = np.zeros(3*self.nverts + 1, dtype=np.uint32)
+        self.indices = np.zeros(0, dtype=np.uint32)
+        self.data = np.zeros(0, dtype=np.float32)
+        self._nnz = np.zeros(0, dtype=np.uint32)    # Number of stored entries per column
+        self._nonempty = np.zeros(0, dtype=np.intp) # Rows with stored entries
+
+    def __repr__(self):
+        return "<TargetBasis %d targets, %d entries>" % (len(self.paths), len(self.data))
+
+    def build(self, obj, targetPaths):
+        """
+        (Re)build the basis matrix from the specified targets.
+        """
+        self.paths = [canonicalPath(path) for path in targetPaths]
+        self.targets = [getTarget(obj, path) for path in self.paths]
+        self.columns = dict((path, col) for col, path in enumerate(self.paths))
+
+        nnz = [3 * len(target.verts) for target in self.targets]
+        self._nnz = np.asarray(nnz, dtype=np.uint32)
+        if sum(nnz) == 0:
+            self.indptr = np.zeros(3*self.nverts + 1, dtype=np.uint32)
+            self.indices = np.zeros(0, dtype=np.uint32)
+            self.data = np.zeros(0, dtype=np.float32)
+            self._nonempty = np.zeros(0, dtype=np.intp)
+            return
+
+        axes = np.arange(3, dtype=np.uint32)[None,:]
+        rows = np.concatenate([(3 * np.asarray(target.verts, dtype=np.uint32)[:,None] + axes).reshape(-1)
+                               for target in self.targets if len(target.verts)])
+        data = np.concatenate([np.asarray(target.getData(), dtype=np.float32).reshape(-1)
+                               for target in self.targets if len(target.verts)])
+        cols = np.repeat(np.arange(len(self.targets), dtype=np.uint32), self._nnz)
+
+        # Sort entries per row to obtain CSR layout
+        order = np.argsort(rows, kind='mergesort')
+        self.indices = cols[order]
+        self.data = data[order]
+        counts = np.bincount(rows, minlength=3*self.nverts)
+        self.indptr = np.zeros(3*self.nverts + 1, dtype=np.uint32)
+        np.cumsum(counts, out=self.indptr[1:])
+        self._nonempty = np.flatnonzero(counts)
+
+    def isCurrent(self, obj, targetPaths):
+        """
+        Returns True if all specified targets are contained in this basis, and
+        none of the buffered targets were reloaded since the basis was built.
+        """
+        if obj.getVertexCount() != self.nverts:
+            return False
+        for path in targetPaths:
+            col = self.columns.get(path)
+            if col is None or _targetBuffer.get(path) is not self.targets[col]:
+                return False
+        return True
+
+    def getWeights(self, detailStack):
+        """
+        Convert a targets detail stack (dict of target path and weight) to a
+        weight vector for the columns of this basis.
+        """
+        weights = np.zeros(len(self.paths), dtype=np.float32)
+        for path, weight in detailStack.items():
+            weights[self.columns[path]] = weight
+        return weights
+
+    def dot(self, weights):
+        """
+        Sparse matrix-vector product of this basis with the weight vector,
+        returns the combined vertex offsets as a (nverts, 3) array.
+        """
+        result = np.zeros(3*self.nverts, dtype=np.float32)
+        if len(self.data):
+            products = self.data * np.asarray(weights, dtype=np.float32)[self.indices]
+            # Sum the products of every (non-empty) row of the CSR matrix
+            result[self._nonempty] = np.add.reduceat(products, self.indptr[self._nonempty].astype(np.intp))
+        return result.reshape((self.nverts, 3))
+
+    def apply(self, obj, detailStack):
+        """
+        Add the combination of all targets in the detail stack to the
+        coordinates of obj. The basis is extended with any targets it does not
+        contain yet, and is compacted when the targets that are no longer used
+        make up the bulk of the matrix.
+        The keys of detailStack are expected to be canonical target paths, as
+        is the case for Human.targetsDetailStack.
+        """
+        paths = list(detailStack.keys())
+
+        if not self.isCurrent(obj, paths):
+            self.nverts = obj.getVertexCount()
+            self.build(obj, paths + [path for path in self.paths if path not in detailStack])
+
+        weights = self.getWeights(detailStack)
+        if self._nnz[weights == 0].sum() > self._nnz[weights != 0].sum():
+            # Drop unused targets from the matrix
+            self.build(obj, paths)
+            weights = self.getWeights(detailStack)
+
+        obj.coord += self.dot(weights)
+        obj.markCoords(coor=True)
+
+        # Record applied weights like Target.apply() does
+        for path, weight in detailStack.items():
+            self.targets[self.columns[path]].morphFactor = weight
+
+LOWRANK_EXTENSION = '.lowrank.npz'
+
+class LowRankTargetBasis(object):
+    """
+    Truncated low-rank factorization of a group of correlated targets (such
+    as the macro targets), for fast approximate blending.
+
+    The offsets of all targets, restricted to the vertices affected by any of
+    them, form a (3 * nverts, ntargets) matrix A that is approximated as the
+    product of k dense components C (3 * nverts, k) and coefficients
+    V (k, ntargets), with k chosen as the smallest rank for which no target
+    deviates more than a tolerance from its exact offsets. Blending any
+    number of targets of the group then costs a product with k components.
+    The result is approximate: use exact blending for export.
+
+    The tolerance only bounds the error of each single target. The error of a
+    blend is bounded by the sum of abs(weight) times the residual (largest
+    error) of each blended target, which can exceed the tolerance when
+    several targets are blended with large weights, see getErrorBound().
+    """
+
+    def __init__(self, paths, verts, components, coefficients, nverts, tolerance=None, error=None, residuals=None):
+        self.paths = [canonicalPath(path) for path in paths]
+        self.columns = dict((path, col) for col, path in enumerate(self.paths))
+        self.verts = np.asarray(verts, dtype=np.uint32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.coefficients = np.ascontiguousarray(coefficients, dtype=np.float32)
+        self.nverts = nverts
+        self.tolerance = tolerance
+        self.error = error      # Largest deviation of a single target
+        if residuals is None:
+            residuals = np.full(len(self.paths), error or 0, dtype=np.float32)
+        self.residuals = np.asarray(residuals, dtype=np.float32)    # Largest deviation per target
+
+    def __repr__(self):
+        return "<LowRankTargetBasis %d targets, rank %d>" % (len(self.paths), self.rank)
+
+    def __contains__(self, path):
+        return path in self.columns
+
+    @property
+    def rank(self):
+        return self.coefficients.shape[0]
 
-def saveTranslationTarget(obj, targetPath, groupToSave=None, epsilon=0.001):
+    @staticmethod
+    def factorize(obj, targetPaths, tolerance=0.001, maxRank=None):
+        """
+        Factorize the specified targets, with a tolerance on the largest
+        absolute error (in mesh units) of the offset of any target. If the
+        tolerance cannot be met within maxRank components, a basis of rank
+        maxRank is returned and a warning with the achieved error is logged.
+        """
+        targets = [Target(obj, path) for path in targetPaths]
+        verts = np.unique(np.concatenate([np.asarray(t.verts, dtype=np.uint32) for t in targets]))
+        rows = np.zeros(obj.getVertexCount(), dtype=np.uint32)
+        rows[verts] = np.arange(len(verts), dtype=np.uint32)
+
+        A = np.zeros((len(verts), 3, len(targets)), dtype=np.float32)
+        for col, target in enumerate(targets):
+            if len(target.verts):
+                A[rows[target.verts], :, col] = target.getData()
+        A = A.reshape((-1, len(targets)))
+
+        U, S, Vt = np.linalg.svd(A, full_matrices=False)
+        if maxRank is None:
+            maxRank = len(S)
+
+        # Smallest rank within tolerance (bisection, error decreases with rank)
+        def getError(k):
+            return np.max(np.abs(np.dot(U[:,:k] * S[:k], Vt[:k]) - A), initial=0)
+        lo, hi = 0, maxRank
+        if getError(hi) <= tolerance:
+            while lo < hi:
+                k = (lo + hi) // 2
+                if getError(k) <= tolerance:
+                    hi = k
+                else:
+                    lo = k + 1
+        k = hi
+        error = float(getError(k))
+        if error > tolerance:
+            log.warning('Low-rank basis of %d targets does not meet tolerance %g with %d components (largest error %g)',
+                        len(targets), tolerance, k, error)
+
+        residuals = np.max(np.abs(np.dot(U[:,:k] * S[:k], Vt[:k]) - A), axis=0, initial=0)
+        return LowRankTargetBasis(targetPaths, verts, U[:,:k] * S[:k], Vt[:k],
+                                  obj.getVertexCount(), tolerance, error, residuals)
+
+    @staticmethod
+    def fromFile(path):
+        from getpath import getSysPath
+        data = np.load(path)
+        paths = [canonicalPath(getSysPath(p)) for p in data['paths']]
+        residuals = data['residuals'] if 'residuals' in data else None
+        return LowRankTargetBasis(paths, data['verts'], data['components'], data['coefficients'],
+                                  int(data['nverts']), float(data['tolerance']), float(data['error']), residuals)
+
+    def toFile(self, path):
+        from getpath import localPath
+        np.savez(path, paths=np.asarray([localPath(p) for p in self.paths]), verts=self.verts,
+                 components=self.components, coefficients=self.coefficients,
+                 nverts=self.nverts, tolerance=self.tolerance, error=self.error, residuals=self.residuals)
+
+    def getWeights(self, detailStack):
+        """
+        Split a targets detail stack in a weight vector for the targets of
+        this basis, and a dict with the remaining targets.
+        """
+        weights = np.zeros(len(self.paths), dtype=np.float32)
+        remaining = {}
+        for path, weight in detailStack.items():
+            col = self.columns.get(path)
+            if col is None:
+                remaining[path] = weight
+            else:
+                weights[col] = weight
+        return weights, remaining
+
+    def getErrorBound(self, weights):
+        """
+        Upper bound of the absolute error (in mesh units) of the offset of any
+        vertex, when blending the targets with specified weight vector. This
+        is the truncation error of the factorization only: rounding errors of
+        accumulating the blend in float32 (in dot() as well as in exact
+        blending) come on top of it, and can dominate when the bound is tiny.
+        """
+        return float(np.dot(np.abs(weights), self.residuals))
+
+    def dot(self, weights):
+        """
+        The approximate combined offsets of the targets with specified weight
+        vector, as (len(verts), 3) array.
+        """
+        return np.dot(self.components, np.dot(self.coefficients, weights)).reshape((-1, 3))
+
+    def apply(self, obj, detailStack):
+        """
+        Add the approximate combination of the targets of this basis in the
+        detail stack to the coordinates of obj. Returns the dict with the
+        targets of the detail stack that are not in this basis.
+        """
+        if obj.getVertexCount() != self.nverts:
+            return dict(detailStack)
+        weights, remaining = self.getWeights(detailStack)
+        if np.any(weights):
+            obj.coord[self.verts] += self.dot(weights)
+            obj.markCoords(self.verts, coor=True)
+        return remaining
+
+def loadLowRankTargetBasis(group):
+    """
+    Load the compiled low-rank basis of the specified target group (a folder
+    in data/targets, such as 'macrodetails'), as written by
+    compile_lowrank.py.
+    """
+    return LowRankTargetBasis.fromFile(getSysDataPath(os.path.join('targets', group + LOWRANK_EXTENSION)))
+
+def saveTranslationTarget(obj, targetPath, groupToSave=None, epsilon=0.001, binary=False):
     """
     This function analyses an object to determine the differences between the current
     set of vertices and the vertices contained in the *originalVerts* list, writing the
@@ -438,40 +1190,119 @@ def saveTranslationTarget(obj, targetPath, groupToSave=None, epsilon=0.001):
         than the value of epsilon, the vertex is considered to have been modified and will be
         saved in the output file as a morph target.
 
+    binary:
+        *bool*. Write the target in compiled form, as a target pack file
+        containing only this target, instead of an ASCII .target file. Such
+        files should use the .mhpack extension to be loadable as target.
+
+    """
+    return saveTranslationTargets(obj, [obj.coord], [targetPath], groupToSave, epsilon, binary)
+
+def saveTranslationTargets(obj, coords, targetPaths, groupToSave=None, epsilon=0.001, binary=False, packPath=None):
     """
+    Save the differences between multiple sets of vertex coordinates (for
+    example one per animation frame) and the original coordinates of obj as
+    morphing targets, determining all moved vertices in one pass.
+
+    Parameters
+    ----------
+
+    obj:
+        *3d object*. The object whose original coordinates the targets are
+        relative to.
+
+    coords:
+        *array*. (N, nverts, 3) vertex coordinates, or a list of N
+        coordinate arrays of obj.
+
+    targetPaths:
+        *list*. N output paths, or target names inside the pack if packPath
+        is specified.
+
+    groupToSave, epsilon:
+        See saveTranslationTarget().
+
+    binary:
+        *bool*. Write each target as a target pack file instead of an ASCII
+        .target file.
+
+    packPath:
+        *string*. Write all targets to this one target pack file, with the
+        names in targetPaths. An empty pack is written if targetPaths is
+        empty.
+
+    """
+    if len(coords) != len(targetPaths):
+        raise ValueError('Got %d sets of coordinates for %d targets' % (len(coords), len(targetPaths)))
 
     if not groupToSave:
         vertsToSave = np.arange(len(obj.coord))
     else:
-        pass  # TODO verts from group
+        vertsToSave = obj.getVerticesForGroups([groupToSave])
 
     originalVerts = obj.orig_coord[vertsToSave]
-    targetVerts = obj.coord[vertsToSave]
+    targetVerts = np.asarray([c[vertsToSave,:3] for c in coords], dtype=np.float32).reshape(len(coords), len(vertsToSave), 3)
 
-    delta = targetVerts - originalVerts
+    delta = targetVerts - originalVerts[None,:,:3]
     dist2 = np.sum(delta ** 2, axis=-1)
     valid = dist2 > (epsilon ** 2)
     del dist2
-    delta = delta[valid]
-    vertsToSave = vertsToSave[valid]
-    nVertsExported = len(vertsToSave)
-
-    license_str = str(defaultTargetLicense()).split('\n')
-    license_str.append('basemesh hm08')
-    license_str = '\n'.join(['# ' + s for s in license_str])
 
-    try:
-        with io.open(targetPath, 'w') as fileDescriptor:
-            fileDescriptor.write('%s\n\n\n' % license_str)
-            for i in range(nVertsExported):
-                fileDescriptor.write('%d %f %f %f\n' % (vertsToSave[i], delta[i,0], delta[i,1], delta[i,2]))
+    if binary or packPath:
+        license = defaultTargetLicense().asDict()
+        topology = obj.getTopologyHash()
+        if packPath:
+            pack = targetpack.TargetPackWriter(license=license, topology=topology)
 
-        if nVertsExported == 0:
+    for (i, targetPath) in enumerate(targetPaths):
+        verts = vertsToSave[valid[i]]
+        data = delta[i][valid[i]]
+        if len(verts) == 0:
             log.warning('Zero verts exported in file %s', targetPath)
-    except Exception as e:
-        log.error('Unable to open %s (%s)', targetPath, e)
-        return None
 
+        try:
+            if binary or packPath:
+                arrays = {'index': np.asarray(verts, dtype=np.uint32),
+                          'vector': data,
+                          'faces': np.asarray(obj.getFacesForVertices(verts), dtype=np.uint32)}
+                if packPath:
+                    pack.addTarget(targetPath, arrays)
+                else:
+                    pack = targetpack.TargetPackWriter(license=license, topology=topology)
+                    pack.addTarget(os.path.splitext(os.path.basename(targetPath))[0] + '.target', arrays)
+                    pack.write(targetPath)
+            else:
+                with io.open(targetPath, 'w') as fileDescriptor:
+                    fileDescriptor.write('%s\n\n\n' % getTargetLicenseHeader())
+                    fileDescriptor.write(formatTargetData(verts, data))
+        except Exception as e:
+            log.error('Unable to open %s (%s)', targetPath, e)
+            return None
+
+    if packPath:
+        try:
+            pack.write(packPath)
+        except Exception as e:
+            log.error('Unable to open %s (%s)', packPath, e)
+            return None
+
+def getTargetLicenseHeader():
+    """
+    The license comment lines written at the start of saved .target files.
+    """
+    license_str = str(defaultTargetLicense()).split('\n')
+    license_str.append('basemesh hm08')
+    return '\n'.join(['# ' + s for s in license_str])
+
+def formatTargetData(verts, data):
+    """
+    Format vertex indices and offset vectors as the lines of a .target file.
+    All lines are formatted in one operation instead of one write per vertex.
+    """
+    if not len(verts):
+        return ''
+    values = np.column_stack((verts, data)).ravel().tolist()
+    return ('%d %f %f %f\n' * len(verts)) % tuple(values)
 
 def resetObj(obj, update=None, calcNorm=None):
     """
@@ -65,12 +65,22 @@ is visible to the user through the GUI.
 """
 
 import os.path
+import io
+import json
+import struct
+from collections import OrderedDict
 import module3d
 import numpy as np
 import log
 import wavefront
 from getpath import isSubPath, getPath
 
+# Uncompressed, memory-mappable compiled mesh format
+MAPPED_MESH_EXTENSION = '.mhmesh'
+MAPPED_MESH_MAGIC = b'MHMESH\x00\x00'
+MAPPED_MESH_VERSION = 1
+MAPPED_MESH_ALIGNMENT = 64
+
 
 def packStringList(strings):
     text = ''
@@ -157,6 +167,143 @@ def loadBinaryMesh(obj, path):
     obj.updateIndexBuffer()
     #log.debug('loadBinaryMesh: built index buffer for rendering')
 
+def _alignMapped(offset):
+    return (offset + MAPPED_MESH_ALIGNMENT - 1) // MAPPED_MESH_ALIGNMENT * MAPPED_MESH_ALIGNMENT
+
+def saveMappedMesh(obj, path):
+    """
+    Save mesh in the uncompressed, memory-mappable binary format. Next to the
+    mesh data, it stores the data that is otherwise computed on load: the
+    vertex to face mapping (vface), the face, vertex normals and tangents and
+    the unwelded index buffer (vmap, tmap, r_faces).
+
+    File layout (the same as target packs): magic string (8 bytes), format
+    version and header size (2 x uint32, little endian), a JSON header with
+    properties and descriptors (offset, dtype, shape) of all arrays, padded to
+    the alignment, and the data of all arrays, each one starting at an
+    aligned offset relative to the end of the header.
+
+    The file is written to a temporary file first and then moved in place, so
+    that on POSIX systems processes that have the old file mapped keep a
+    consistent view. Windows does not allow replacing a file that is mapped
+    (by any process), in that case a RuntimeError is raised and the existing
+    file is left untouched.
+    """
+    if obj.vmap is None:
+        obj.updateIndexBuffer()
+    offsets, indices = obj.vface_csr
+
+    arrays = OrderedDict([
+        ('coord', obj.coord),
+        ('texco', obj.texco),
+        ('fvert', obj.fvert),
+        ('group', obj.group),
+        ('vface', obj.vface),
+        ('nfaces', obj.nfaces),
+        ('vface_offsets', offsets),
+        ('vface_indices', indices),
+        ('fnorm', obj.fnorm),
+        ('vnorm', obj.vnorm),
+        ('vtang', obj.vtang),
+        ('vmap', obj.vmap),
+        ('tmap', obj.tmap),
+        ('r_faces', obj.r_faces)])
+    if obj.has_uv:
+        arrays['fuvs'] = obj.fuvs
+
+    descriptors = OrderedDict()
+    size = 0
+    for name, array in list(arrays.items()):
+        array = np.ascontiguousarray(array)
+        offset = _alignMapped(size)
+        descriptors[name] = OrderedDict([('offset', offset),
+                                         ('dtype', array.dtype.str),
+                                         ('shape', list(array.shape))])
+        arrays[name] = array
+        size = offset + array.nbytes
+
+    header = OrderedDict([('version', MAPPED_MESH_VERSION),
+                          ('MAX_FACES', obj.MAX_FACES),
+                          ('vertsPerPrimitive', obj.vertsPerPrimitive),
+                          ('faceGroups', [fg.name for fg in obj._faceGroups]),
+                          ('arrays', descriptors)])
+    header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    headerSize = _alignMapped(len(MAPPED_MESH_MAGIC) + 8 + len(header)) - len(MAPPED_MESH_MAGIC) - 8
+    header += b' ' * (headerSize - len(header))
+
+    tmppath = path + '.tmp'
+    with io.open(tmppath, 'wb') as f:
+        f.write(MAPPED_MESH_MAGIC)
+        f.write(struct.pack('<II', MAPPED_MESH_VERSION, headerSize))
+        f.write(header)
+        pos = 0
+        for name, array in arrays.items():
+            offset = descriptors[name]['offset']
+            f.write(b'\x00' * (offset - pos))
+            f.write(array.tobytes())
+            pos = offset + array.nbytes
+    try:
+        os.replace(tmppath, path)
+    except OSError as e:
+        os.remove(tmppath)
+        raise RuntimeError('Unable to replace mapped mesh %s, it is in use (%s)' % (path, e))
+
+def loadMappedMesh(obj, path):
+    """
+    Load a mesh saved with saveMappedMesh(). The arrays are copy-on-write
+    views on the mapped file: pages are read from disk when accessed, and
+    only copied when the mesh modifies them. Normals and the index buffer are
+    not recomputed.
+    """
+    log.debug("Loading mapped mesh %s.", path)
+
+    with io.open(path, 'rb') as f:
+        if f.read(len(MAPPED_MESH_MAGIC)) != MAPPED_MESH_MAGIC:
+            raise RuntimeError('Not a compiled mesh file: %s' % path)
+        version, headerSize = struct.unpack('<II', f.read(8))
+        if version > MAPPED_MESH_VERSION:
+            raise RuntimeError('Unsupported compiled mesh version %s: %s' % (version, path))
+        header = json.loads(f.read(headerSize).decode('utf-8'))
+    if header['vertsPerPrimitive'] != obj.vertsPerPrimitive:
+        raise RuntimeError('Compiled mesh %s has %s verts per face instead of %s' % (path, header['vertsPerPrimitive'], obj.vertsPerPrimitive))
+
+    dataOffset = len(MAPPED_MESH_MAGIC) + 8 + headerSize
+    buffer = np.memmap(path, dtype=np.uint8, mode='c')
+    descriptors = header['arrays']
+
+    # Retrieve all arrays before modifying obj, so that a damaged file does
+    # not leave a partially loaded mesh
+    arrays = {}
+    for name, descriptor in descriptors.items():
+        dtype = np.dtype(descriptor['dtype'])
+        shape = tuple(descriptor['shape'])
+        start = dataOffset + descriptor['offset']
+        end = start + int(np.prod(shape)) * dtype.itemsize
+        if end > len(buffer):
+            raise RuntimeError('Compiled mesh file is truncated: %s' % path)
+        arrays[name] = np.asarray(buffer[start:end]).view(dtype).reshape(shape)
+    arrays.setdefault('fuvs', None)
+
+    obj.MAX_FACES = header['MAX_FACES']
+
+    obj.setCoords(arrays['coord'])
+    obj.setUVs(arrays['texco'])
+    obj.setFaces(arrays['fvert'], arrays['fuvs'], arrays['group'], skipUpdate=True)
+
+    obj.vface = arrays['vface']
+    obj.nfaces = arrays['nfaces']
+    obj._vface_csr = (arrays['vface_offsets'], arrays['vface_indices'])
+
+    for name in header['faceGroups']:
+        obj.createFaceGroup(name)
+
+    obj.fnorm[...] = arrays['fnorm']
+    obj.vnorm = arrays['vnorm']
+    obj.vtang = arrays['vtang']
+
+    obj.setIndexBuffer(arrays['vmap'], arrays['tmap'], arrays['r_faces'])
+    obj.updateIndexBufferFaces()
+
 def loadTextMesh(obj, path):
     """
     Parse and load a Wavefront OBJ file as mesh.
@@ -192,6 +339,15 @@ def loadMesh(path, loadColors=1, maxFaces=None, obj=None):
     obj.path = path
 
     try:
+        meshpath = os.path.splitext(path)[0] + MAPPED_MESH_EXTENSION
+        if os.path.isfile(meshpath) and \
+           not (os.path.isfile(path) and os.path.getmtime(path) > os.path.getmtime(meshpath)):
+            try:
+                loadMappedMesh(obj, meshpath)
+                return obj
+            except Exception as e:
+                log.warning("Problem loading mapped mesh: %s", e, exc_info=not isinstance(e, RuntimeError))
+
         npzpath = os.path.splitext(path)[0] + '.npz'
         try:
             if not os.path.isfile(npzpath):
@@ -213,6 +369,12 @@ def loadMesh(path, loadColors=1, maxFaces=None, obj=None):
                     log.notice('unable to save compiled mesh: %s', npzpath)
             else:
                 log.debug('Not writing compiled meshes to system paths (%s).', npzpath)
+
+        if isSubPath(meshpath, getPath('')):
+            try:
+                saveMappedMesh(obj, meshpath)
+            except Exception as e:
+                log.notice('unable to save mapped mesh: %s (%s)', meshpath, e)
     except:
         log.error('Unable to load obj file: %s', path, exc_info=True)
         return False
@@ -227,6 +227,7 @@ class MHApplication(gui3d.Application, mh.Application):
                 'invertMouseWheel': False,
                 'lowspeed': 1,
                 'preloadTargets': True,
+                'targetCacheSize': 0,
                 'cameraAutoZoom': False,
                 'language': 'english',
                 'highspeed': 5,
@@ -256,6 +257,7 @@ class MHApplication(gui3d.Application, mh.Application):
                 'sliderImages': True,
                 'guiTheme': 'makehuman',
                 'preloadTargets': False,
+                'targetCacheSize': 0,
                 'restoreWindowSize': True,
                 'windowGeometry': '',
                 'tagFilterMode': 'OR'
@@ -715,16 +717,18 @@ class MHApplication(gui3d.Application, mh.Application):
 
         self.backgroundGradient.setPosition([0, 0, -0.85*cam.farPlane])
 
-    def loadMacroTargets(self):
+    def loadMacroTargets(self, preload=True):
         """
-        Preload all target files belonging to group macrodetails and its child
-        groups.
+        Pin all target files belonging to group macrodetails and its child
+        groups in the target buffer, so that they are never evicted from it,
+        and preload them in the background if preload is True.
         """
         import targets
-        #import getpath
+        import targetprefetch
         for target in targets.getTargets().findTargets('macrodetails'):
-            #log.debug('Preloading target %s', getpath.getRelativePath(target.path))
-            algos3d.getTarget(self.selectedHuman.meshData, target.path)
+            algos3d.pinTarget(target.path)
+        if preload:
+            targetprefetch.getPrefetcher().prefetchGroups(self.selectedHuman.meshData, ['macrodetails'], cancelPending=False)
 
     def loadFinish(self):
         self.selectedHuman.updateMacroModifiers()
@@ -778,8 +782,7 @@ class MHApplication(gui3d.Application, mh.Application):
         self.loadFinish()
         
         progress.step('Loading macro targets')
-        if self.getSetting('preloadTargets'):
-            self.loadMacroTargets()
+        self.loadMacroTargets(preload = self.getSetting('preloadTargets'))
 
         progress.step('Loading done')
 
@@ -833,6 +836,9 @@ class MHApplication(gui3d.Application, mh.Application):
         self.startupSequence()
 
     def onStop(self, event):
+        import targetprefetch
+        targetprefetch.getPrefetcher().stop()
+
         if self.getSetting('restoreWindowSize'):
             self.setSetting('windowGeometry', self.mainwin.storeGeometry())
 
@@ -948,6 +954,10 @@ class MHApplication(gui3d.Application, mh.Application):
 
         gui.Slider.showImages(self.settings['sliderImages'])
 
+        # Target cache size is specified in MB, 0 means unlimited
+        cacheSize = int(self.settings.get('targetCacheSize', 0))
+        algos3d.setTargetCacheBudget(cacheSize * 1024 * 1024 if cacheSize > 0 else None)
+
         with inFile("shortcuts.ini") as f:
             shortcuts = {}
             for line in f:
@@ -37,6 +37,7 @@ TODO
 """
 
 import weakref
+import hashlib
 
 import numpy as np
 import unique # Bugfix for numpy.unique on older numpy versions
@@ -355,97 +356,112 @@ class Object3D(object):
         """
         Calculate per-vertex normals from the face normals for smooth shading
         the model. Requires face normals to be calculated first.
+        Vertex normals are summed from the face normals over the vertex to
+        face adjacency in compressed sparse row form (vface_csr). A partial
+        update (ix is a list of vertex indices) only gathers the faces of
+        those vertices.
         """
         self.markCoords(ix, norm=True)
-        if ix is None:
-            ix = np.s_[:]
+        offsets, faces = self.vface_csr
 
-        vface = self.vface[ix]
-        norms = self.fnorm[vface]
-        norms *= np.arange(self.MAX_FACES)[None,:,None] < self.nfaces[ix][:,None,None]
-        norms = np.sum(norms, axis=1)
-        norms /= np.sqrt(np.sum(norms ** 2, axis=-1))[:,None]
-        self.vnorm[ix] = norms
+        if ix is None:
+            # Sum face normals per vertex directly into vnorm
+            fnorm = self._getBuffer('fnorm', (len(faces), 3), self.fnorm.dtype)
+            np.take(self.fnorm, faces, axis=0, out=fnorm)
+            norms = sumRuns(fnorm, offsets[:-1], np.diff(offsets), out=self.vnorm)
+        else:
+            ix = np.asarray(ix)
+            if ix.dtype == bool:
+                ix = np.flatnonzero(ix)
+            faces, counts = gatherCSR(offsets, faces, ix)
+            norms = sumRuns(self.fnorm[faces], np.cumsum(counts) - counts, counts)
+
+        length = self._getBuffer('length', (len(norms),), norms.dtype)
+        np.einsum('ij,ij->i', norms, norms, out=length)
+        np.sqrt(length, out=length)
+        norms /= length[:,None]
+        if ix is not None:
+            self.vnorm[ix] = norms
+
+    def _getBuffer(self, name, shape, dtype=np.float32):
+        """
+        Scratch array of specified shape and type, reused between calls to
+        avoid allocating temporaries on every update. The contents are
+        undefined.
+        """
+        buf = self._buffers.get(name)
+        if buf is None or buf.dtype != dtype or buf.size < np.prod(shape):
+            buf = np.empty(int(np.prod(shape)), dtype=dtype)
+            self._buffers[name] = buf
+        return buf[:int(np.prod(shape))].reshape(shape)
 
     def calcVertexTangents(self, ix = None):
         """
         Calculate vertex tangents using Lengyel’s Method.
+        Requires vertex normals to be calculated first. A partial update (ix
+        is a list of vertex indices) only computes the tangent directions of
+        the faces around those vertices.
         """
         if not self.has_uv:
             return
         self.markCoords(ix, norm=True)
+        offsets, faces = self.vface_csr
+
         if ix is None:
-            ix = np.s_[:]
-            xLen = self.getVertexCount()
             f_ix = np.s_[:]
+            counts = np.diff(offsets)
+            starts = offsets[:-1]
         else:
-            xLen = len(ix)
-            f_ix = np.unique(self.vface[ix])
+            ix = np.asarray(ix)
+            if ix.dtype == bool:
+                ix = np.flatnonzero(ix)
+            faces, counts = gatherCSR(offsets, faces, ix)
+            starts = np.cumsum(counts) - counts
+            # Only the faces around the updated vertices, faces becomes an
+            # index into the compacted face arrays
+            f_ix = np.unique(faces)
+            faces = np.searchsorted(f_ix, faces)
 
         # This implementation is based on
         # http://www.terathon.com/code/tangent.html
 
-        tan = np.zeros((xLen, 2, 3), dtype=np.float32)
-
-        fvert = self.coord[self.fvert[f_ix]]
-        v1 = fvert[:,0,:]
-        v2 = fvert[:,1,:]
-        v3 = fvert[:,2,:]
+        fvert = self.coord[self.fvert[f_ix][:,:3]]
+        e1 = fvert[:,1,:] - fvert[:,0,:]
+        e2 = fvert[:,2,:] - fvert[:,0,:]
 
-        x1 = v2[:,0] - v1[:,0]
-        x2 = v3[:,0] - v1[:,0]
-        y1 = v2[:,1] - v1[:,1]
-        y2 = v3[:,1] - v1[:,1]
-        z1 = v2[:,2] - v1[:,2]
-        z2 = v3[:,2] - v1[:,2]
+        fuv = self.texco[self.fuvs[f_ix][:,:3]]
+        st1 = fuv[:,1,:] - fuv[:,0,:]
+        st2 = fuv[:,2,:] - fuv[:,0,:]
 
-        fuv = self.texco[self.fuvs[f_ix]]
-        w1 = fuv[:,0,:]
-        w2 = fuv[:,1,:]
-        w3 = fuv[:,2,:]
+        # Prevent NANs because of borked up UV coordinates  # TODO perhaps remove this
+        st1[st1 == 0.0] = 0.0000001
+        st2[st2 == 0.0] = 0.0000001
+        s1, t1 = st1[:,0,None], st1[:,1,None]
+        s2, t2 = st2[:,0,None], st2[:,1,None]
 
-        s1 = w2[:,0] - w1[:,0]
-        s2 = w3[:,0] - w1[:,0]
-        t1 = w2[:,1] - w1[:,1]
-        t2 = w3[:,1] = w1[:,1]
+        r = 1.0 / ( (s1 * t2) - (s2 * t1) )
+        sdir = ( (t2 * e1) - (t1 * e2) ) * r
+        tdir = ( (s1 * e2) - (s2 * e1) ) * r
 
-        # Prevent NANs because of borked up UV coordinates  # TODO perhaps remove this
-        s1[np.argwhere(np.equal(s1, 0.0))] = 0.0000001
-        s2[np.argwhere(np.equal(s2, 0.0))] = 0.0000001
-        t1[np.argwhere(np.equal(t1, 0.0))] = 0.0000001
-        t2[np.argwhere(np.equal(t2, 0.0))] = 0.0000001
-
-        r = np.repeat(1.0, len(s1)) / ( (s1 * t2) - (s2 * t1) )
-        sdir = np.zeros((self.getFaceCount(),3), dtype=np.float32)
-        tdir = np.zeros((self.getFaceCount(),3), dtype=np.float32)
-        sdir[f_ix] = np.column_stack( [ ( (t2 * x1) - (t1 * x2) ) * r,
-                                        ( (t2 * y1) - (t1 * y2) ) * r,
-                                        ( (t2 * z1) - (t1 * z2) ) * r  ] )
-        tdir[f_ix] = np.column_stack( [ ( (s1 * x2) - (s2 * x1) ) * r,
-                                        ( (s1 * y2) - (s2 * y1) ) * r,
-                                        ( (s1 * z2) - (s2 * z1) ) * r  ] )
-
-        tan[:,0] = np.sum(sdir[self.vface[ix]])
-        tan[:,1] = np.sum(tdir[self.vface[ix]])
+        # Sum face tangent directions per vertex
+        if ix is None:
+            tan1 = sumRuns(sdir[faces], starts, counts, out=self._getBuffer('tan1', (len(counts), 3), sdir.dtype))
+            tan2 = sumRuns(tdir[faces], starts, counts, out=self._getBuffer('tan2', (len(counts), 3), tdir.dtype))
+            vnorm = self.vnorm
+            ix = np.s_[:]
+        else:
+            tan1 = sumRuns(sdir[faces], starts, counts)
+            tan2 = sumRuns(tdir[faces], starts, counts)
+            vnorm = self.vnorm[ix]
 
         # Gramm-Schmidt orthogonalize
-        dotP = dot_v3(self.vnorm[ix], tan[:,0] )
-        # Duplicate dot product value in 3 columns because scalar * (n x 3)
-        # does not work
-        dotP = np.tile(dotP, (3,1)).transpose().reshape(len(tan),3)
-        self.vtang[ix,:3] = tan[:,0] - dotP * self.vnorm[ix]
+        tang = tan1 - dot_v3(vnorm, tan1)[:,None] * vnorm
         # Normalize
-        self.vtang[ix,:3] /= np.sqrt(np.sum(self.vtang[ix,:3] ** 2, axis=-1))[:,None]
+        tang /= np.sqrt(np.sum(tang ** 2, axis=-1))[:,None]
+        self.vtang[ix,:3] = tang
 
         # Determine Handedness as w parameter
-        self.vtang[ix, 3] = 1.0
-        indx = np.argwhere(np.less(dot_v3( \
-                                     np.cross( \
-                                           self.vnorm[ix], \
-                                           tan[:,0]), \
-                                     tan[:,1]), \
-                                   0.0))
-        self.vtang[ix,3][indx] = -1.0
+        self.vtang[ix,3] = np.where(dot_v3(np.cross(vnorm, tan1), tan2) < 0.0, -1.0, 1.0)
 
     def getObject(self):
         if self.__object:
@@ -494,8 +510,10 @@ class Object3D(object):
         self.color = []         # Vertex colors (idx = vertex idx)
         self.vface = []         # References the faces that a vertex belongs to (limited to MAX_FACES) (idx = vertex idx)
         self.nfaces = 0         # Polycount
+        self._vface_csr = None  # Cached (offsets, indices) of faces per vertex, the unpadded form of vface
+        self._buffers = {}      # Scratch arrays reused by normal calculation
 
-        self.ucoor = False      # Update flags for updating to OpenGL renderbuffers
+        self.ucoor = False      # Update flags for updating to OpenGL renderbuffers (False, True or a list of updated index arrays)
         self.unorm = False
         self.utang = False
         self.ucolr = False
@@ -510,6 +528,9 @@ class Object3D(object):
         self.tmap = None        # Maps unwelded vertex texture (UV) coordinates back to original ones (idx = unwelded vertex idx)
 
         self._inverse_vmap = None   # Cached inverse of vmap: maps original welded vert idx (coord) to one or multiple unwelded vert idxs (r_coord)
+        self._inverse_vmap_csr = None   # Cached inverse of vmap in compressed sparse row form (offsets, unwelded vert idxs)
+        self._inverse_tmap_csr = None   # Cached inverse of tmap in compressed sparse row form (offsets, unwelded vert idxs)
+        self._topologyHash = None   # Cached result of getTopologyHash()
 
         # Unwelded vertex buffers used by OpenGL
         if hasattr(self, 'r_coord'): del self.r_coord
@@ -527,6 +548,7 @@ class Object3D(object):
         self.color = np.zeros((nverts, 4), dtype=np.uint8) + 255
         self.vface = np.zeros((nverts, self.MAX_FACES), dtype=np.uint32)
         self.nfaces = np.zeros(nverts, dtype=np.uint8)
+        self._vface_csr = None
 
         self.orig_coord = self.coord.copy() # Keep a copy of the original coordinates
 
@@ -554,38 +576,21 @@ class Object3D(object):
         return self.vnorm[indices]
 
     def markCoords(self, indices = None, coor = False, norm = False, colr = False):
-        if isinstance(indices, tuple):
-            indices = indices[0]
-
+        """
+        Mark vertex attributes (of the specified vertices, or all) as updated,
+        so that the next sync copies them to the unwelded vertex buffers.
+        """
         nverts = len(self.coord)
 
         if coor:
-            if indices is None:
-                self.ucoor = True
-            else:
-                if self.ucoor is False:
-                    self.ucoor = np.zeros(nverts, dtype=bool)
-                if self.ucoor is not True:
-                    self.ucoor[indices] = True
+            self.ucoor = _markUpdated(self.ucoor, indices, nverts)
 
         if norm:
-            if indices is None:
-                self.unorm = self.utang = True
-            else:
-                if self.unorm is False:
-                    self.unorm = self.utang = np.zeros(nverts, dtype=bool)
-                if self.unorm is not True:
-                    self.unorm[indices] = True
-                    self.utang[indices] = True
+            self.unorm = _markUpdated(self.unorm, indices, nverts)
+            self.utang = _markUpdated(self.utang, indices, nverts)
 
         if colr:
-            if indices is None:
-                self.ucolr = True
-            else:
-                if self.ucolr is False:
-                    self.ucolr = np.zeros(nverts, dtype=bool)
-                if self.ucolr is not True:
-                    self.ucolr[indices] = True
+            self.ucolr = _markUpdated(self.ucolr, indices, nverts)
 
     def changeCoords(self, coords, indices = None):
         self.markCoords(indices, coor=True)
@@ -607,18 +612,7 @@ class Object3D(object):
         return self.texco[indices]
 
     def markUVs(self, indices = None):
-        if isinstance(indices, tuple):
-            indices = indices[0]
-
-        ntexco = len(self.texco)
-
-        if indices is None:
-            self.utexc = True
-        else:
-            if self.utexc is False:
-                self.utexc = np.zeros(ntexco, dtype=bool)
-            if self.utexc is not True:
-                self.utexc[indices] = True
+        self.utexc = _markUpdated(self.utexc, indices, len(self.texco))
 
     def setFaces(self, verts, uvs = None, groups = None, skipUpdate = False):
         nfaces = len(verts)
@@ -637,6 +631,8 @@ class Object3D(object):
                 self.group[...] = groups
 
         self.has_uv = uvs is not None
+        self._topologyHash = None
+        self._vface_csr = None
 
         if not skipUpdate:
             self._update_faces()
@@ -675,37 +671,71 @@ class Object3D(object):
         The inverse of vmap: a mapping of original welded (relating to UVs) 
         vertex (coord indices) to a set of unwelded vertices that represent the 
         same coordinate (r_coord indices).
+        Only contains the vertices that are used by faces. Prefer
+        inverse_vmap_csr or getUnweldedVertices() for array operations.
         """
         if self._inverse_vmap is None:
-            # TODO this loop is quite slow and could benefit from numpy optimization
-            originalToUnweldedMap = {}
-            for unweldedIdx, originalIdx in enumerate(self.vmap):
-                if originalIdx not in originalToUnweldedMap:
-                    originalToUnweldedMap[originalIdx] = []
-                originalToUnweldedMap[originalIdx].append(unweldedIdx)
-            self._inverse_vmap = originalToUnweldedMap
+            offsets, unwelded = self.inverse_vmap_csr
+            used = np.flatnonzero(offsets[1:] > offsets[:-1]).tolist()
+            offsets = offsets.tolist()
+            unwelded = unwelded.tolist()
+            self._inverse_vmap = dict((i, unwelded[offsets[i]:offsets[i+1]]) for i in used)
         return self._inverse_vmap
 
+    @property
+    def inverse_vmap_csr(self):
+        """
+        The inverse of vmap in compressed sparse row form: a tuple of offsets
+        (nverts + 1) and a flat array of unwelded vertex indices (r_coord
+        indices), the unwelded vertices of original vertex i are
+        indices[offsets[i]:offsets[i+1]], in increasing order.
+        """
+        if self._inverse_vmap_csr is None:
+            self._inverse_vmap_csr = invertIndexMap(self.vmap[:,None], self.getVertexCount())
+        return self._inverse_vmap_csr
+
+    def getUnweldedVertices(self, indices, return_counts=False):
+        """
+        The unwelded vertex indices (r_coord indices) of the specified
+        original vertices (coord indices), concatenated in the order of the
+        specified indices. If return_counts is True, also returns the number
+        of unwelded vertices of each specified vertex (0 for vertices that
+        are not used by any face).
+        """
+        offsets, unwelded = self.inverse_vmap_csr
+        result, counts = gatherCSR(offsets, unwelded, indices)
+        if return_counts:
+            return result, counts
+        return result
+
+    @property
+    def vface_csr(self):
+        """
+        The faces that each vertex belongs to in compressed sparse row form: a
+        tuple of offsets (nverts + 1) and a flat array of face indices, the
+        faces of vertex i are indices[offsets[i]:offsets[i+1]]. Contains the
+        same faces as vface and nfaces, without padding.
+        """
+        if self._vface_csr is None:
+            # Derive from vface (eg. when it was loaded from a compiled mesh)
+            nfaces = np.asarray(self.nfaces, dtype=np.int64)
+            offsets = np.zeros(len(nfaces) + 1, dtype=np.int64)
+            np.cumsum(nfaces, out=offsets[1:])
+            valid = np.arange(self.MAX_FACES)[None,:] < nfaces[:,None]
+            self._vface_csr = (offsets, self.vface[valid])
+        return self._vface_csr
+
     def _update_faces(self):
         # Construct vface: arrange face indices for same v_idx in different columns
         # Every row in the vface matrix contains a variable number of valid columns
         # (the number of valid columns for each row is stored in the nfaces array)
-        map_ = np.argsort(self.fvert.flat)
-        vi = self.fvert.flat[map_]
-        # Map v_idx entries to row numbers of fvert (face_idx)
-        fi = np.mgrid[:self.fvert.shape[0],:self.fvert.shape[1]][0].flat[map_].astype(np.uint32)
-        del map_
-        ix, first = np.unique(vi, return_index=True)
-        n = first[1:] - first[:-1]    # entry-skip count, or the number of occurences of every idx
-        n_last = len(vi) - first[-1]  # Number of occurences of last idx
-        n = np.hstack((n, np.array([n_last])))  # Append last to complete n
-
-        # Store number of valid columns per line in vface
-        self.nfaces[ix] = n.astype(np.uint8)
         try:
-            for i in range(len(ix)):
-                # Unfortunately these type of slices require a python loop
-                self.vface[ix[i],:n[i]] = fi[first[i]:][:n[i]]
+            offsets, fi = invertIndexMap(self.fvert, len(self.vface))
+            self._vface_csr = (offsets, fi)
+
+            # Store number of valid columns per line in vface
+            self.nfaces[:] = np.diff(offsets)
+            fillPaddedMap(offsets, fi, self.vface)
         except Exception as e:
             import log
             log.error("Failed to index faces of mesh %s, you are probably loading a mesh with mixed nb of verts per face (do not mix tris and quads). Or your mesh has too many faces attached to one vertex (the maximum is %s-poles). In the second case, either increase MAX_FACES for this mesh, or improve the mesh topology. Original error message: (%s) %s", self.name, self.MAX_FACES, type(e), format(str(e)))
@@ -763,14 +793,24 @@ class Object3D(object):
 
         unwelded = u[:,None] >> np.array([[32,0]], dtype=np.uint64)
         unwelded = unwelded.astype(np.uint32)
-        nverts = len(unwelded)
         iverts = rev.reshape(self.fvert.shape)
         del rev, u
 
-        self.vmap = unwelded[:,0]
-        self.tmap = unwelded[:,1]
+        self.setIndexBuffer(unwelded[:,0], unwelded[:,1], iverts)
+
+    def setIndexBuffer(self, vmap, tmap, r_faces):
+        """
+        Set the unwelded vertices (as computed by updateIndexBufferVerts(), or
+        loaded from a compiled mesh) and allocate the unwelded vertex buffers.
+        """
+        nverts = len(vmap)
+
+        self.vmap = vmap
+        self.tmap = tmap
         self._inverse_vmap = None
-        del unwelded
+        self._inverse_tmap_csr = None
+        # Unwelded vertices per vertex, for syncing updated vertices
+        self._inverse_vmap_csr = invertIndexMap(self.vmap[:,None], self.getVertexCount())
 
         self.r_coord = np.empty((nverts, 3), dtype=np.float32)
         self.r_texco = np.empty((nverts, 2), dtype=np.float32)
@@ -778,7 +818,7 @@ class Object3D(object):
         self.r_vtang = np.zeros((nverts, 4), dtype=np.float32)
         self.r_color = np.zeros((nverts, 4), dtype=np.uint8) + 255
 
-        self.r_faces = np.array(iverts, dtype=np.uint32)
+        self.r_faces = np.asarray(r_faces, dtype=np.uint32)
 
     def updateIndexBufferFaces(self):
         index = self.r_faces[self.face_mask]
@@ -810,15 +850,37 @@ class Object3D(object):
         self.utexc = True
         self.sync_all()
 
+    @property
+    def inverse_tmap_csr(self):
+        """
+        The inverse of tmap in compressed sparse row form: a tuple of offsets
+        (ntexco + 1) and a flat array of unwelded vertex indices, the
+        unwelded vertices with UV coordinate i are
+        indices[offsets[i]:offsets[i+1]].
+        """
+        if self._inverse_tmap_csr is None:
+            self._inverse_tmap_csr = invertIndexMap(self.tmap[:,None], self.getUVCount())
+        return self._inverse_tmap_csr
+
+    def _syncUnwelded(self, updated, values, r_values, map_, inverse_csr):
+        """
+        Copy the updated values (update flag True or a list of updated index
+        arrays) to the unwelded buffer r_values. Only the unwelded rows of the
+        updated indices are copied.
+        """
+        if updated is True:
+            r_values[...] = values[map_]
+        else:
+            offsets, unwelded = inverse_csr
+            rows = gatherCSR(offsets, unwelded, np.unique(np.concatenate(updated)))[0]
+            r_values[rows] = values[map_[rows]]
+
     def sync_coord(self):
         if self.ucoor is False:
             return
         if self.vmap is None or len(self.vmap) == 0:
             return
-        if self.ucoor is True:
-            self.r_coord[...] = self.coord[self.vmap]
-        else:
-            self.r_coord[self.ucoor[self.vmap]] = self.coord[self.vmap][self.ucoor[self.vmap]]
+        self._syncUnwelded(self.ucoor, self.coord, self.r_coord, self.vmap, self.inverse_vmap_csr)
         self.ucoor = False
 
     def sync_norms(self):
@@ -826,10 +888,7 @@ class Object3D(object):
             return
         if self.vmap is None or len(self.vmap) == 0:
             return
-        if self.unorm is True:
-            self.r_vnorm[...] = self.vnorm[self.vmap]
-        else:
-            self.r_vnorm[self.unorm[self.vmap]] = self.vnorm[self.vmap][self.unorm[self.vmap]]
+        self._syncUnwelded(self.unorm, self.vnorm, self.r_vnorm, self.vmap, self.inverse_vmap_csr)
         self.unorm = False
 
     def sync_tangents(self):
@@ -839,10 +898,7 @@ class Object3D(object):
             return
         if self.vmap is None or len(self.vmap) == 0:
             return
-        if self.utang is True:
-            self.r_vtang[...] = self.vtang[self.vmap]
-        else:
-            self.r_vtang[self.utang[self.vmap]] = self.vtang[self.vmap][self.utang[self.vmap]]
+        self._syncUnwelded(self.utang, self.vtang, self.r_vtang, self.vmap, self.inverse_vmap_csr)
         self.utang = False
 
     def sync_color(self):
@@ -850,10 +906,7 @@ class Object3D(object):
             return
         if self.vmap is None or len(self.vmap) == 0:
             return
-        if self.ucolr is True:
-            self.r_color[...] = self.color[self.vmap]
-        else:
-            self.r_color[self.ucolr[self.vmap]] = self.color[self.vmap][self.ucolr[self.vmap]]
+        self._syncUnwelded(self.ucolr, self.color, self.r_color, self.vmap, self.inverse_vmap_csr)
         self.ucolr = False
         self._r_color_diff = None
 
@@ -864,10 +917,7 @@ class Object3D(object):
             return
         if self.tmap is None or len(self.tmap) == 0:
             return
-        if self.utexc is True:
-            self.r_texco[...] = self.texco[self.tmap]
-        else:
-            self.r_texco[self.utexc[self.tmap]] = self.texco[self.tmap][self.utexc[self.tmap]]
+        self._syncUnwelded(self.utexc, self.texco, self.r_texco, self.tmap, self.inverse_tmap_csr)
         self.utexc = False
 
     def sync_all(self):
@@ -1102,6 +1152,20 @@ class Object3D(object):
     def getFacesForVertices(self, verts):
         return np.argwhere(self.getFaceMaskForVertices(verts))[...,0]
 
+    def getTopologyHash(self):
+        """
+        Hash identifying the topology (vertex count and faces) of this mesh,
+        such as a revision of the base mesh. Data derived from the topology,
+        like the face lists stored with compiled targets, can be reused for
+        meshes with the same hash.
+        """
+        if self._topologyHash is None:
+            h = hashlib.sha1()
+            h.update(np.asarray([self.getVertexCount()], dtype=np.uint32).tobytes())
+            h.update(np.ascontiguousarray(self.fvert, dtype=np.uint32).tobytes())
+            self._topologyHash = h.hexdigest()
+        return self._topologyHash
+
     def setCameraProjection(self, cameraMode):
         """
         This method sets the camera mode used to visualize this object (fixed or movable).
@@ -1177,6 +1241,98 @@ class Object3D(object):
     def __str__(self):
         return 'object3D Mesh named: %s, nverts: %s, nfaces: %s' % (self.name, self.getVertexCount(), self.getFaceCount())
 
+def invertIndexMap(indices, count):
+    """
+    Invert a (n, m) array that maps rows to indices (such as the vertices of
+    faces) to a map from index to the rows that reference it, in compressed
+    sparse row form. Returns offsets (count + 1) and a flat array of row
+    numbers, ordered by index: the rows referencing index i are
+    rows[offsets[i]:offsets[i+1]], in increasing order. A row that references
+    the same index multiple times is listed that many times.
+    """
+    flat = np.asarray(indices).reshape(-1)
+    order = np.argsort(flat, kind='stable')
+    rows = (order // max(1, np.shape(indices)[-1])).astype(np.uint32)
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(flat, minlength=count), out=offsets[1:])
+    return offsets, rows
+
+def fillPaddedMap(offsets, rows, output, offset=0):
+    """
+    Fill a padded (count, maxcols) array with an inverted index map in
+    compressed sparse row form (see invertIndexMap()), the rows of index i
+    (plus offset) are stored in the first columns of output[i]. Raises an
+    IndexError if an index has more rows than output has columns.
+    """
+    counts = np.diff(offsets)
+    if len(rows) == 0:
+        return
+    if counts.max() > output.shape[1]:
+        raise IndexError('%s entries do not fit in %s columns' % (counts.max(), output.shape[1]))
+    keys = np.repeat(np.arange(len(counts)), counts)
+    columns = np.arange(len(rows)) - offsets[keys]
+    output[keys, columns] = rows + offset if offset else rows
+
+def _markUpdated(updated, indices, count):
+    """
+    Add indices (None for all) to an update flag: False (nothing updated),
+    True (everything updated) or a list of updated index arrays. Returns the
+    new flag. Once a quarter of all count elements is listed, the flag
+    becomes True, as syncing everything is then cheaper.
+    """
+    if indices is None or updated is True:
+        return True
+    if isinstance(indices, tuple):
+        indices = indices[0]
+    if isinstance(indices, slice):
+        indices = np.arange(count)[indices]
+    indices = np.asarray(indices)
+    if indices.dtype == bool:
+        indices = np.flatnonzero(indices)
+    else:
+        # Copy, the caller may modify its index array before the next sync
+        indices = np.array(indices, dtype=np.intp).reshape(-1)
+    if updated is False:
+        updated = []
+    updated.append(indices)
+    if sum(len(ix) for ix in updated) > count // 4:
+        return True
+    return updated
+
+def gatherCSR(offsets, values, keys):
+    """
+    Gather the rows of the specified keys from a map in compressed sparse row
+    form (offsets and a flat array of values), concatenated in the order of
+    keys. Returns the gathered values and the number of values of each key.
+    """
+    keys = np.asarray(keys, dtype=np.intp)
+    starts = offsets[keys]
+    counts = offsets[keys+1] - starts
+    # Position of every result entry in values: start of its row, plus its
+    # position within the row
+    runStarts = np.cumsum(counts) - counts
+    positions = np.arange(counts.sum()) + np.repeat(starts - runStarts, counts)
+    return values[positions], counts
+
+def sumRuns(values, starts, counts, out=None):
+    """
+    Sum consecutive runs of rows of values, the runs start at starts and have
+    the specified lengths (as the rows of a map in compressed sparse row
+    form). Empty runs sum to zero. The result is written to out, if
+    specified.
+    """
+    if out is None:
+        out = np.empty((len(counts),) + values.shape[1:], dtype=values.dtype)
+    nonempty = counts > 0
+    if len(values) == 0:
+        out[...] = 0
+    elif nonempty.all():
+        np.add.reduceat(values, starts, axis=0, out=out)
+    else:
+        out[nonempty] = np.add.reduceat(values, starts[nonempty], axis=0)
+        out[~nonempty] = 0
+    return out
+
 def dot_v3(v3_arr1, v3_arr2):
     """
     Numpy Ufunc'ed implementation of a series of dot products of two vector3 
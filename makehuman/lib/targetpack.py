@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compiled target pack
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           MakeHuman Team
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Uncompressed binary archive containing many compiled targets, designed to be
+memory-mapped so that target data can be used directly without decompressing
+or copying it.
+
+File layout:
+
+  - magic string (8 bytes)
+  - format version and header size (2 x uint32, little endian)
+  - header: JSON table describing all targets, padded to the alignment
+  - data: all arrays, each one starting at an aligned offset
+
+Every target in the header table is a dict that maps array names (such as
+"index" and "vector") to a descriptor with the offset (relative to the start
+of the data section), dtype and shape of the array. Other entries in the
+target dict are plain (JSON) properties, such as a custom license.
+Vectors are stored as float32 offsets in mesh units, so that they need no
+further scaling when loaded. An optional "faces" array lists the faces of the
+base mesh affected by the target, valid for the base mesh topology whose hash
+is stored in the header (see Object3D.getTopologyHash()).
+"""
+
+import os
+import io
+import json
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+PACK_FILENAME = 'targets.mhpack'
+PACK_EXTENSION = '.mhpack'
+
+MAGIC = b'MHTPACK\x00'
+VERSION = 1
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def _isArrayDescriptor(value):
+    return isinstance(value, dict) and 'dtype' in value and 'offset' in value
+
+
+class TargetPack(object):
+    """
+    Read-only, memory-mapped target pack file.
+    Arrays retrieved from the pack are views on the mapped file, pages are only
+    read from disk when the data is accessed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dirname = os.path.dirname(path)
+        self.mtime = os.path.getmtime(path)
+
+        with io.open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise RuntimeError('Not a target pack file: %s' % path)
+            version, headerSize = struct.unpack('<II', f.read(8))
+            if version > VERSION:
+                raise RuntimeError('Unsupported target pack version %s: %s' % (version, path))
+            header = json.loads(f.read(headerSize).decode('utf-8'), object_pairs_hook=OrderedDict)
+
+        self.version = version
+        self.header = header
+        self.entries = header['targets']
+        self._dataOffset = len(MAGIC) + 8 + headerSize
+        self._buffer = np.memmap(path, dtype=np.uint8, mode='r')
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def names(self):
+        return list(self.entries.keys())
+
+    @property
+    def license(self):
+        """
+        Properties of the license that applies to all targets in this pack
+        that do not specify their own license, or None.
+        """
+        return self.header.get('license')
+
+    def getEntry(self, name):
+        return self.entries[name]
+
+    def getProperties(self, name):
+        """
+        The plain (non-array) properties stored for the target with specified
+        name, as a dict.
+        """
+        return dict((key, value)
+                    for key, value in self.entries[name].items()
+                    if not _isArrayDescriptor(value))
+
+    def getArray(self, descriptor):
+        """
+        Retrieve the array referenced by the specified descriptor as a
+        (read-only) view on the mapped file.
+        """
+        dtype = np.dtype(descriptor['dtype'])
+        shape = tuple(descriptor['shape'])
+        start = self._dataOffset + descriptor['offset']
+        end = start + int(np.prod(shape)) * dtype.itemsize
+        return np.asarray(self._buffer[start:end]).view(dtype).reshape(shape)
+
+    def getArrays(self, name):
+        """
+        All arrays stored for the target with specified name, as a dict.
+        """
+        return dict((key, self.getArray(value))
+                    for key, value in self.entries[name].items()
+                    if _isArrayDescriptor(value))
+
+    def close(self):
+        self._buffer = None
+
+
+class TargetPackWriter(object):
+    """
+    Collects compiled targets and writes them to a target pack file.
+    Additional keyword arguments are stored as properties in the header of
+    the pack.
+    """
+
+    def __init__(self, license=None, **properties):
+        self.license = license
+        self.properties = properties
+        self.entries = OrderedDict()
+        self._arrays = []
+        self._size = 0
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def addTarget(self, name, arrays, **properties):
+        """
+        Add target with specified name (a path relative to the folder of the
+        pack file), arrays is a dict of named arrays to store. Additional
+        keyword arguments are stored as properties of the target, and need to
+        be serializable to JSON.
+        """
+        entry = OrderedDict((key, value) for key, value in properties.items() if value is not None)
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            offset = _align(self._size)
+            entry[key] = OrderedDict([('offset', offset),
+                                      ('dtype', array.dtype.str),
+                                      ('shape', list(array.shape))])
+            self._arrays.append((offset, array))
+            self._size = offset + array.nbytes
+        self.entries[name] = entry
+
+    def write(self, path):
+        """
+        Write pack file. The file is written to a temporary file first and then
+        moved in place, so that on POSIX systems processes that have the old
+        pack mapped keep a consistent view. Windows does not allow replacing a
+        file that is mapped (by any process), in that case a RuntimeError is
+        raised and the existing pack is left untouched.
+        """
+        header = OrderedDict([('version', VERSION),
+                              ('license', self.license)])
+        header.update(sorted(self.properties.items()))
+        header['targets'] = self.entries
+        header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        headerSize = _align(len(MAGIC) + 8 + len(header)) - len(MAGIC) - 8
+        header += b' ' * (headerSize - len(header))
+
+        tmppath = path + '.tmp'
+        with io.open(tmppath, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<II', VERSION, headerSize))
+            f.write(header)
+            pos = 0
+            for offset, array in self._arrays:
+                f.write(b'\x00' * (offset - pos))
+                f.write(array.tobytes())
+                pos = offset + array.nbytes
+        try:
+            os.replace(tmppath, path)
+        except OSError as e:
+            os.remove(tmppath)
+            raise RuntimeError('Unable to replace target pack %s, it is in use (%s)' % (path, e))
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Background target prefetching
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           MakeHuman Team
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Loads targets into the target buffer (algos3d._targetBuffer) in a background
+thread, before they are first needed. Targets are requested by group (as
+known to targets.getTargets()), for example all targets of the modifiers in a
+modifier task view when that view is shown, so that the first slider drag does
+not have to wait for its targets to load.
+
+Prefetching never evicts targets from the target buffer: when a prefetched
+target does not fit in its budget, the remaining requests are dropped. Pending requests can be
+cancelled at any time, a target that is being loaded at that moment is still
+completed.
+"""
+
+import threading
+from collections import deque
+
+import log
+import algos3d
+import targets
+from getpath import canonicalPath
+
+
+class TargetPrefetcher(object):
+    """
+    Background thread that loads queued targets into the target buffer.
+    The thread is started on the first request.
+    """
+
+    def __init__(self):
+        self._queue = deque()
+        self._queued = set()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._current = None    # Path of the target that is being loaded
+        self.loaded = 0
+
+    def prefetchGroups(self, obj, groups, cancelPending=True):
+        """
+        Queue all targets in the specified groups (group names such as
+        'armslegs' or 'macrodetails-height') for loading onto mesh obj.
+        Unless cancelPending is False, requests that are still pending are
+        cancelled first, so that the most recent request is served first.
+        """
+        paths = []
+        for group in groups:
+            paths.extend(t.path for t in targets.getTargets().findTargets(group))
+        self.prefetch(obj, paths, cancelPending)
+
+    def prefetch(self, obj, targetPaths, cancelPending=True):
+        """
+        Queue the specified target files for loading onto mesh obj.
+        Targets that are already buffered are skipped.
+        """
+        with self._cond:
+            if cancelPending:
+                self._clear()
+            for path in targetPaths:
+                path = canonicalPath(path)
+                if path in self._queued or path in algos3d._targetBuffer:
+                    continue
+                self._queue.append((obj, path))
+                self._queued.add(path)
+            if self._queue:
+                self._start()
+                self._cond.notify()
+
+    def cancel(self):
+        """
+        Drop all pending requests.
+        """
+        with self._cond:
+            self._clear()
+
+    def stop(self):
+        """
+        Cancel all pending requests and stop the background thread.
+        """
+        with self._cond:
+            self._clear()
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def isBusy(self):
+        return len(self._queue) > 0 or self._current is not None
+
+    def wait(self):
+        """
+        Block until all pending requests are processed (for testing and
+        batch use).
+        """
+        with self._cond:
+            while self._queue or self._current is not None:
+                self._cond.wait()
+
+    def _clear(self):
+        self._queue.clear()
+        self._queued.clear()
+        self._cond.notify_all()
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='TargetPrefetcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                obj, path = self._queue.popleft()
+                self._queued.discard(path)
+                self._current = path
+
+            try:
+                if path not in algos3d._targetBuffer:
+                    self._load(obj, path)
+            except Exception as e:
+                log.warning('Failed to prefetch target %s (%s)', path, e)
+            finally:
+                with self._cond:
+                    self._current = None
+                    self._cond.notify_all()
+
+    def _load(self, obj, path):
+        cache = algos3d._targetBuffer
+        target = algos3d.Target(obj, path)
+        if cache.budget is not None and cache.nbytes + target.nbytes > cache.budget:
+            # Do not evict targets that were actually used for prefetched ones
+            log.debug('Target buffer full, dropping %d prefetch requests', len(self._queue) + 1)
+            self.cancel()
+            return
+        cache.setdefault(path, target)
+        self.loaded += 1
+
+
+_prefetcher = None
+
+def getPrefetcher():
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = TargetPrefetcher()
+    return _prefetcher
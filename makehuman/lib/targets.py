@@ -40,6 +40,7 @@ import os
 import zipfile
 from getpath import getSysDataPath, canonicalPath
 import log
+import targetpack
 
 # TODO share with algos3d
 TARGETS_NPZ_PATH = getSysDataPath('targets.npz')
@@ -319,14 +320,9 @@ class ZippedTargetsCrawler(TargetsCrawler):
                 add_file(dir[head], tail)
 
         # Add targets in npz archive to file list
-        with zipfile.ZipFile(self.npzPath, 'r') as npzfile:
-            for file_ in npzfile.infolist():
-                name = file_.filename
-                if not name.endswith('.index.npy'):
-                    continue
-                name = name[:-len('.index.npy')] + '.target'
-                path = name.split('/')
-                add_file(self._files, path)
+        for name in self.listArchivedTargets():
+            path = name.split('/')
+            add_file(self._files, path)
 
         # Walk file path (not .npz archive) to find images to add to file list
         import io
@@ -347,6 +343,31 @@ class ZippedTargetsCrawler(TargetsCrawler):
                     _debug_print(vals, pre+'    ')
         #_debug_print(self._files)
 
+    def listArchivedTargets(self):
+        """
+        Paths of all .target files contained in the archive, relative to the
+        data path.
+        """
+        result = []
+        with zipfile.ZipFile(self.npzPath, 'r') as npzfile:
+            for file_ in npzfile.infolist():
+                name = file_.filename
+                if not name.endswith('.index.npy'):
+                    continue
+                result.append(name[:-len('.index.npy')] + '.target')
+        return result
+
+
+class PackedTargetsCrawler(ZippedTargetsCrawler):
+    """
+    Finds targets packed in a memory-mapped target pack (see targetpack).
+    """
+    def __init__(self, dataPath, packFile):
+        super(PackedTargetsCrawler, self).__init__(dataPath, packFile)
+
+    def listArchivedTargets(self):
+        return targetpack.TargetPack(self.npzPath).names()
+
 
 class Targets(object):
     def __init__(self, dataPath):
@@ -402,18 +423,26 @@ class Targets(object):
 
     def walk(self, dataPath):
         try:
-            # Load cached targets from .npz file
-            log.debug("Attempting to load targets from NPZ file.")
-            targetFinder = ZippedTargetsCrawler(dataPath, 'targets.npz')
+            # Load compiled targets from target pack
+            log.debug("Attempting to load targets from target pack.")
+            targetFinder = PackedTargetsCrawler(dataPath, targetpack.PACK_FILENAME)
             targetFinder.findTargets()
-            log.debug("%s targets loaded from NPZ file succesfully.", len(targetFinder.targets))
+            log.debug("%s targets loaded from target pack succesfully.", len(targetFinder.targets))
         except Exception as e:
-            # Load targets from .target files
-            log.debug("Could not load targets from NPZ, loading individual files from %s (Error message: %s)", dataPath, e, exc_info=False)
-
-            targetFinder = FilesTargetsCrawler(dataPath)
-            targetFinder.findTargets()
-            log.debug("%s targets loaded from .target files.", len(targetFinder.targets))
+            log.debug("Could not load targets from target pack (Error message: %s)", e, exc_info=False)
+            try:
+                # Load cached targets from .npz file
+                log.debug("Attempting to load targets from NPZ file.")
+                targetFinder = ZippedTargetsCrawler(dataPath, 'targets.npz')
+                targetFinder.findTargets()
+                log.debug("%s targets loaded from NPZ file succesfully.", len(targetFinder.targets))
+            except Exception as e:
+                # Load targets from .target files
+                log.debug("Could not load targets from NPZ, loading individual files from %s (Error message: %s)", dataPath, e, exc_info=False)
+
+                targetFinder = FilesTargetsCrawler(dataPath)
+                targetFinder.findTargets()
+                log.debug("%s targets loaded from .target files.", len(targetFinder.targets))
 
         self.targets = targetFinder.targets
         self.groups = targetFinder.groups
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MakeHuman morph evaluation server entry-point.
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           MakeHuman Team
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Abstract
+--------
+
+Long-running headless process that evaluates humans from modifier values.
+The base mesh, the target index, the modifiers and the target buffer stay
+loaded between requests, so that requests do not pay the startup cost of
+MakeHuman. No GUI, Qt or OpenGL is used.
+
+Usage::
+
+    python3 makehuman_server.py --socket /tmp/makehuman.sock --workers 4
+    python3 makehuman_server.py --port 12345
+
+The server does not authenticate clients: anyone who can connect can make it
+evaluate requests. By default it only listens on the loopback interface
+(127.0.0.1), only pass another address with --host on a trusted network.
+Unix sockets are protected by their file permissions.
+
+Protocol: a client sends requests as one line of JSON each, and may send
+several requests over the same connection. A request contains either the
+text of an MHM file::
+
+    {"mhm": "version v1.1.1\\nmodifier macrodetails/Gender 1.000000\\n...",
+     "format": "obj"}
+
+or a dict of modifier values (modifiers not mentioned keep their default)::
+
+    {"modifiers": {"macrodetails/Gender": 1.0, "macrodetails/Age": 0.8},
+     "format": "npz"}
+
+Only the modifier values of an MHM file are used, other properties (proxies,
+skeleton, pose, ...) are ignored. The server answers every request with one
+line of JSON, followed by the result data if the request succeeded::
+
+    {"status": "ok", "format": "npz", "size": 229974}\\n<229974 bytes>
+    {"status": "error", "message": "..."}\\n
+
+Format "npz" returns a numpy .npz archive with the rest coordinates in an
+array named "coord" (nverts x 3, float32), format "obj" returns a Wavefront
+OBJ file of the base mesh (including helper geometry).
+"""
+
+import sys
+import os
+import io
+import json
+import socket
+import socketserver
+import queue
+
+import makehuman
+
+FORMATS = ['obj', 'npz']
+
+
+class _ObjBuffer(io.StringIO):
+    """
+    String buffer that stays readable after wavefront.writeObjFile closed it.
+    """
+    def close(self):
+        pass
+
+
+class MorphServerState(object):
+    """
+    Warm state shared by all connections: a pool of batch generators, each
+    one with its own headless human, which are handed out to one request at
+    a time. All generators share the target buffer.
+    """
+
+    def __init__(self, workers=1):
+        import humanbatch
+
+        self.generators = queue.Queue()
+        for _ in range(max(1, workers)):
+            generator = humanbatch.BatchGenerator([])
+            # Private mesh with the evaluated coordinates, for OBJ export
+            generator.exportMesh = generator.mesh.clone(1, filterMaskedVerts=False)
+            self.generators.put(generator)
+
+    def warmUp(self):
+        """
+        Load the targets of all modifiers into the target buffer, in the
+        background. Loading stops when the target buffer budget is reached.
+        """
+        import targetprefetch
+
+        generator = self.generators.queue[0]
+        paths = [target[0] for modifier in generator.human.modifiers for target in modifier.targets]
+        targetprefetch.getPrefetcher().prefetch(generator.mesh, paths, cancelPending=False)
+
+    def evaluate(self, request):
+        """
+        Evaluate a request (dict) to a tuple of format and result data (bytes).
+        """
+        import humanbatch
+        import log
+
+        fmt = request.get('format', 'npz').lower()
+        if fmt not in FORMATS:
+            raise ValueError('Unsupported format "%s"' % fmt)
+        if 'mhm' not in request and 'modifiers' not in request:
+            raise ValueError('Request contains no "mhm" or "modifiers"')
+
+        generator = self.generators.get()
+        try:
+            knownModifiers = set(generator.human.getModifierNames())
+            if 'mhm' in request:
+                # Like loading an MHM file, skip unknown modifiers
+                modifierValues = humanbatch.parseMHMModifiers(request['mhm'])
+                for name in list(modifierValues.keys()):
+                    if name not in knownModifiers:
+                        log.warning('Unknown modifier in MHM request: %s', name)
+                        del modifierValues[name]
+            else:
+                modifierValues = request['modifiers']
+                for name in modifierValues:
+                    if name not in knownModifiers:
+                        raise ValueError('Unknown modifier "%s"' % name)
+
+            coords = generator.generateFromModifiers(modifierValues)
+            if fmt == 'obj':
+                return fmt, self._toObj(generator.exportMesh, coords)
+            return fmt, self._toNpz(coords)
+        finally:
+            self.generators.put(generator)
+
+    def _toNpz(self, coords):
+        import numpy as np
+        buf = io.BytesIO()
+        np.savez(buf, coord=coords)
+        return buf.getvalue()
+
+    def _toObj(self, mesh, coords):
+        import wavefront
+        mesh.changeCoords(coords)
+        mesh.calcNormals()
+        buf = _ObjBuffer()
+        wavefront.writeObjFile(buf, mesh, writeMTL=False, filterMaskedFaces=False)
+        return buf.getvalue().encode('utf-8')
+
+
+class MorphRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Serves the requests of one client connection.
+    """
+
+    def handle(self):
+        import log
+
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                fmt, data = self.server.state.evaluate(json.loads(line.decode('utf-8')))
+            except Exception as e:
+                log.warning('Morph server request failed', exc_info=True)
+                self._reply({'status': 'error', 'message': str(e)})
+                continue
+            self._reply({'status': 'ok', 'format': fmt, 'size': len(data)}, data)
+
+    def _reply(self, header, data=b''):
+        self.wfile.write(json.dumps(header).encode('utf-8') + b'\n')
+        self.wfile.write(data)
+        self.wfile.flush()
+
+
+class ThreadingTCPMorphServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class ThreadingUnixMorphServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    ThreadingUnixMorphServer = None
+
+
+def createServer(state, socketPath=None, host='127.0.0.1', port=0):
+    """
+    Create a server for the specified state, listening on a Unix socket if
+    socketPath is given, on a TCP port otherwise.
+    """
+    if socketPath:
+        if ThreadingUnixMorphServer is None:
+            raise RuntimeError('Unix sockets are not supported on this platform')
+        if os.path.exists(socketPath):
+            os.remove(socketPath)
+        server = ThreadingUnixMorphServer(socketPath, MorphRequestHandler)
+    else:
+        server = ThreadingTCPMorphServer((host, port), MorphRequestHandler)
+    server.state = state
+    return server
+
+
+def sendRequest(address, request):
+    """
+    Client helper: send one request (dict) to a server listening at address,
+    a Unix socket path or a (host, port) tuple. Returns the result data
+    (bytes), raises RuntimeError if the server reported an error.
+    """
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    with sock:
+        sock.connect(address)
+        f = sock.makefile('rwb')
+        f.write(json.dumps(request).encode('utf-8') + b'\n')
+        f.flush()
+        header = json.loads(f.readline().decode('utf-8'))
+        if header['status'] != 'ok':
+            raise RuntimeError(header.get('message', 'Unknown error'))
+        return f.read(header['size'])
+
+
+def parse_arguments():
+    import argparse
+    parser = argparse.ArgumentParser(description='MakeHuman morph evaluation server')
+    parser.add_argument('--socket', default=None, help='Path of Unix socket to listen on')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on for TCP connections (default: 127.0.0.1). The server is unauthenticated, only listen on other addresses on a trusted network')
+    parser.add_argument('--port', type=int, default=12345, help='TCP port to listen on if no socket is specified (default: 12345)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of requests evaluated concurrently')
+    parser.add_argument('--cache-size', type=int, default=0, help='Target buffer budget in MB (0: unlimited)')
+    parser.add_argument('--no-warmup', action='store_true', help='Do not preload all targets on startup')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+
+    makehuman.set_sys_path()
+    makehuman.make_user_dir()
+    makehuman.init_logging()
+
+    from core import G
+    G.app = None
+
+    import numpy
+    numpy.seterr(all = 'ignore')
+
+    import log
+    import algos3d
+    algos3d.setTargetCacheBudget(args.cache_size * 1024 * 1024 if args.cache_size > 0 else None)
+
+    state = MorphServerState(args.workers)
+    if not args.no_warmup:
+        state.warmUp()
+
+    server = createServer(state, args.socket, args.host, args.port)
+    log.message('Morph server listening on %s', args.socket or '%s:%s' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == '__main__':
+    main()
@@ -64,7 +64,7 @@ class RandomizeAction(gui3d.Action):
                 self.human.getModifier(mName).setValue(val)
             except:
                 pass
-        self.human.applyAllTargets()
+        self.human.applyAllTargets(incremental=True)
         self.human.symmetryModeEnabled = _tmp
 
 class RandomTaskView(gui3d.TaskView):
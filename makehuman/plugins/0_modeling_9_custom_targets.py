@@ -48,6 +48,7 @@ import humanmodifier
 import modifierslider
 import gui
 import algos3d
+import targetpack
 from core import G
 
 class FolderButton(gui.RadioButton):
@@ -103,7 +104,11 @@ class CustomTargetsTaskView(gui3d.TaskView):
 
             # TODO allow creating more complex modifiers (or we could also require the user to create a modifier .json file)
             for f in files:
-                if f.endswith(".target"):
+                name, ext = os.path.splitext(f)
+                if ext == targetpack.PACK_EXTENSION and name + '.target' in files:
+                    # Compiled version of a target that is listed itself
+                    continue
+                if ext in ['.target', targetpack.PACK_EXTENSION]:
                     self.createTargetControls(groupBox, os.path.join(root, f))
                     folderGroup.targetCount += 1
 
@@ -67,7 +67,16 @@ info_message = """Save target saves the current state of all targets applied to
  which can transform the first model into the second one. The resulting global diff target is absolutely specific to the\
  first model and will not work on any other model.\n\nThe default license of the saved global targets will be AGPL3.\
  The license can be changed by the user if the global target only contains data from custom targets, though licenses\
- from other custom targets need to be taken into account."""
+ from other custom targets need to be taken into account.\n\nTargets saved with the .mhpack extension are written in\
+ compiled (binary) form, as a target pack containing only this target. These load faster and can be used like .target\
+ files."""
+
+targetExtensions = ('.target', '.mhpack')
+targetFilter = 'MakeHuman Target ( *.target *.mhpack )'
+
+
+def isTargetPath(path):
+    return path.lower().endswith(targetExtensions)
 
 
 class SaveTargetsTaskView(gui3d.TaskView):
@@ -109,7 +118,7 @@ class SaveTargetsTaskView(gui3d.TaskView):
 
         self.saveAsButton = gui.BrowseButton(label='Save As ...', mode='save')
         self.saveAsButton.path = os.path.join(self.dirName,  self.fileName)
-        self.saveAsButton.setFilter('MakeHuman Target ( *.target )')
+        self.saveAsButton.setFilter(targetFilter)
         self.saveBox.addWidget(self.saveAsButton)
 
         self.saveDiffBox = gui.GroupBox('Save Diff Target')
@@ -129,7 +138,7 @@ class SaveTargetsTaskView(gui3d.TaskView):
 
         self.saveDiffAsButton = gui.BrowseButton(label='Save As ...', mode='save')
         self.saveDiffAsButton.path = os.path.join(self.diffDirName, self.diffFileName)
-        self.saveDiffAsButton.setFilter('MakeHuman Target ( *.target )')
+        self.saveDiffAsButton.setFilter(targetFilter)
         self.saveDiffBox.addWidget(self.saveDiffAsButton)
 
         self.clearButton = gui.Button(label='Clear Cache')
@@ -162,11 +171,11 @@ class SaveTargetsTaskView(gui3d.TaskView):
         @self.saveAsButton.mhEvent
         def onClicked(path):
             if os.path.exists(path):
-                if not path.lower().endswith('.target'):
-                    error_msg = 'Cannot save target to file: {0:s}\nExpected a path to a .target file'.format(path)
+                if not isTargetPath(path):
+                    error_msg = 'Cannot save target to file: {0:s}\nExpected a path to a .target or .mhpack file'.format(path)
                     dialog = gui.Dialog()
                     dialog.prompt(title='Error', text=error_msg, button1Label='OK')
-                    log.error('Cannot save targets to %s. Not a .target file.', path)
+                    log.error('Cannot save targets to %s. Not a .target or .mhpack file.', path)
                     return
                 else:
                     self.saveTargets(path, self.stripBaseTargets.selected)
@@ -195,10 +204,10 @@ class SaveTargetsTaskView(gui3d.TaskView):
                 overwrite = True
                 dialog = gui.Dialog()
 
-                if not path.lower().endswith('.target'):
-                    error_msg = 'Cannot save target to file: {0:s}\nExpected a path to a .target file'.format(path)
+                if not isTargetPath(path):
+                    error_msg = 'Cannot save target to file: {0:s}\nExpected a path to a .target or .mhpack file'.format(path)
                     dialog.prompt(title='Error', text=error_msg, button1Label='OK')
-                    log.error('Cannot save targets to %s. Not a .target file.', path)
+                    log.error('Cannot save targets to %s. Not a .target or .mhpack file.', path)
                     return
                 else:
                     if os.path.exists(path):
@@ -222,8 +231,8 @@ class SaveTargetsTaskView(gui3d.TaskView):
                     dialog.prompt(title='Error', text=error_msg, button1Label='OK')
                     log.warning(error_msg)
                 else:
-                    if not path.lower().endswith('.target'):
-                        error_msg = 'Cannot save diff target to file: {0:s}\nExpected a path to a .target file'.format(path)
+                    if not isTargetPath(path):
+                        error_msg = 'Cannot save diff target to file: {0:s}\nExpected a path to a .target or .mhpack file'.format(path)
                         dialog = gui.Dialog()
                         dialog.prompt(title='Error', text=error_msg, button1Label='OK')
                         return
@@ -254,10 +263,10 @@ class SaveTargetsTaskView(gui3d.TaskView):
         overwrite = True
         dialog = gui.Dialog()
 
-        if not path.lower().endswith('.target'):
-            error_msg = 'Cannot save target to file: {0:s}\nExpected a path to a .target file'.format(path)
+        if not isTargetPath(path):
+            error_msg = 'Cannot save target to file: {0:s}\nExpected a path to a .target or .mhpack file'.format(path)
             dialog.prompt(title='Error', text=error_msg, button1Label='OK')
-            log.error('Cannot save targets to %s. Not a .target file.', path)
+            log.error('Cannot save targets to %s. Not a .target or .mhpack file.', path)
             return
         else:
             if os.path.exists(path):
@@ -289,7 +298,8 @@ class SaveTargetsTaskView(gui3d.TaskView):
         if strip:
             self.stripTargets(human.meshData)
 
-        algos3d.saveTranslationTarget(human.meshData, path)
+        binary = path.lower().endswith('.mhpack')
+        algos3d.saveTranslationTarget(human.meshData, path, binary=binary)
         log.message('Saving target to %s', path)
         self.fileName = os.path.basename(path)
         self.dirName = os.path.dirname(path)
@@ -571,7 +571,7 @@ class Scripting():
     def applyTarget(self,targetName,power):
         log.message("SCRIPT: applyTarget(" + targetName + ", " + str(power) + ")")
         self.human.setDetail(mh.getSysDataPath("targets/" + targetName + ".target"), power)
-        self.human.applyAllTargets()
+        self.human.applyAllTargets(incremental=True)
         mh.redraw()
 
     def saveModel(self,name,path = mh.getPath('models')):
@@ -645,7 +645,7 @@ class Scripting():
         log.message("SCRIPT: updateModelingParameter(parameterName, value)")
         modifier = self.human.getModifier(parameterName)
         modifier.setValue(value)
-        self.human.applyAllTargets()
+        self.human.applyAllTargets(incremental=True)
         mh.redraw()
 
     def updateModelingParameters(self, dictOfParameterNameAndValue):
@@ -653,14 +653,14 @@ class Scripting():
         for key, value in dictOfParameterNameAndValue.items():
             modifier = self.human.getModifier(key)
             modifier.setValue(value)
-        self.human.applyAllTargets()
+        self.human.applyAllTargets(incremental=True)
         mh.redraw()
 
     def setHeadSquareness(self, squareness):
         log.message("SCRIPT: setHeadSquareness(" + str(squareness) + ")")
         modifier = self.human.getModifier('head/head-square')
         modifier.setValue(squareness)
-        self.human.applyAllTargets()
+        self.human.applyAllTargets(incremental=True)
         mh.redraw()
 
     def setPositionX(self,xpos):
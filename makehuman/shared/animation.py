@@ -1089,7 +1089,7 @@ class AnimatedMesh(object):
         # TODO this is way too slow for realtime animation, but good for posing. For animation, update the r_ verts directly, as well as the r_vnorm members
         # TODO use this mapping to directly update the opengl data for animation
         # Remap vertex weights to the unwelded vertices of the object (mesh.coord to mesh.r_coord)
-        #originalToUnweldedMap = mesh.inverse_vmap
+        #offsets, unweldedVerts = mesh.inverse_vmap_csr
 
         mesh.changeCoords(verts[:,:3])
         mesh.calcNormals()  # TODO this is too slow for animation
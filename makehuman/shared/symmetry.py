@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           MakeHuman Team
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Vertex level symmetry of the base mesh.
+
+The mirror map of the base mesh lists for every vertex the index of the vertex
+on the opposite side of the YZ plane (vertices on the plane map to
+themselves). It is compiled from the mapping maintained with the MakeTarget
+blender tools (blendertools/maketarget/symmetry_map.py) into a small binary
+file by compile_symmetry.py.
+
+With the mirror map, coordinate offsets (of a modified mesh, or of a target)
+are symmetrized or mirrored with a single gather, instead of per modifier.
+Directions follow Human.symmetrize(): 'r' copies the left side (positive x)
+to the right side, 'l' copies the right side to the left side, and 'm' swaps
+both sides.
+
+This module is an API for scripts and plugins that need to symmetrize meshes
+or targets directly. Human.symmetrize() and the symmetry mode of the
+modifiers do not use it: they symmetrize modifier values, so that the result
+is stored in MHM files and survives reapplying the targets.
+"""
+
+import os
+import numpy as np
+
+import log
+from getpath import getSysDataPath
+
+MIRROR_MAP_FILE = '3dobjs/base.mirror.npz'
+SYMMETRY_MAP_SOURCE = '../blendertools/maketarget/symmetry_map.py'
+
+DIRECTIONS = ['r', 'l', 'm']
+
+
+class MirrorMap(object):
+    """
+    Mirror relation between the vertices of a symmetric mesh.
+    """
+
+    def __init__(self, left, right, mid):
+        """
+        left and right are arrays of equal length with the indices of
+        mirrored vertex pairs (left[i] is the mirror of right[i]), mid lists
+        the vertices that lie on the symmetry plane.
+        """
+        self.left = np.asarray(left, dtype=np.uint32)
+        self.right = np.asarray(right, dtype=np.uint32)
+        self.mid = np.asarray(mid, dtype=np.uint32)
+
+        self.vertexCount = len(self.left) + len(self.right) + len(self.mid)
+        self.mirror = np.arange(self.vertexCount, dtype=np.uint32)
+        self.mirror[self.left] = self.right
+        self.mirror[self.right] = self.left
+
+        self._gathers = {}
+
+    @staticmethod
+    def fromFile(path):
+        data = np.load(path)
+        return MirrorMap(data['left'], data['right'], data['mid'])
+
+    def toFile(self, path):
+        np.savez(path, left=self.left, right=self.right, mid=self.mid)
+
+    def getGather(self, direction='r'):
+        """
+        The source vertex index and the per-axis factor for every vertex, so
+        that offsets[src] * factor are the symmetrized offsets for the
+        specified direction.
+        """
+        if direction not in self._gathers:
+            if direction not in DIRECTIONS:
+                raise ValueError('Unknown symmetry direction %s' % direction)
+            src = np.arange(self.vertexCount, dtype=np.uint32)
+            factor = np.ones((self.vertexCount, 3), dtype=np.float32)
+            if direction == 'r':
+                dst = self.right
+                src[dst] = self.left
+            elif direction == 'l':
+                dst = self.left
+                src[dst] = self.right
+            else:
+                dst = np.arange(self.vertexCount)
+                src = self.mirror
+            factor[dst, 0] = -1
+            if direction != 'm':
+                # Vertices on the plane stay on the plane
+                factor[self.mid, 0] = 0
+            self._gathers[direction] = (src, factor)
+        return self._gathers[direction]
+
+    def symmetrizeOffsets(self, offsets, direction='r'):
+        """
+        Symmetrize an (nverts, 3) array of offsets (or directions), returns a
+        new array.
+        """
+        src, factor = self.getGather(direction)
+        return offsets[src] * factor
+
+    def symmetrizeTarget(self, verts, data, direction='r'):
+        """
+        Symmetrize sparse target offsets (vertex indices and (n, 3) offsets).
+        Returns the vertex indices and offsets of the symmetrized target,
+        leaving out vertices that end up without offset.
+        """
+        offsets = np.zeros((self.vertexCount, 3), dtype=np.float32)
+        offsets[verts] = data
+        offsets = self.symmetrizeOffsets(offsets, direction)
+        verts = np.flatnonzero(np.any(offsets != 0, axis=1)).astype(np.uint32)
+        return verts, offsets[verts]
+
+
+def getSymmetryMapSourcePath():
+    """
+    Path of the MakeTarget symmetry map, which is only available in a source
+    checkout of MakeHuman.
+    """
+    programDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.normpath(os.path.join(programDir, SYMMETRY_MAP_SOURCE))
+
+def buildMirrorMap(sourcePath=None):
+    """
+    Build the mirror map of the base mesh from the MakeTarget symmetry map
+    (a python module with Left2Right and Mid2Mid dicts).
+    """
+    import runpy
+    if sourcePath is None:
+        sourcePath = getSymmetryMapSourcePath()
+    symmetryMap = runpy.run_path(sourcePath)
+    left2right = symmetryMap['Left2Right']
+    left = np.fromiter(left2right.keys(), dtype=np.uint32, count=len(left2right))
+    right = np.fromiter(left2right.values(), dtype=np.uint32, count=len(left2right))
+    mid = np.fromiter(symmetryMap['Mid2Mid'].keys(), dtype=np.uint32)
+    return MirrorMap(left, right, mid)
+
+
+_baseMirrorMap = None
+
+def getBaseMirrorMap():
+    """
+    The mirror map of the base mesh, loaded from the compiled file (or built
+    from the MakeTarget symmetry map if it is not compiled).
+    """
+    global _baseMirrorMap
+    if _baseMirrorMap is None:
+        path = getSysDataPath(MIRROR_MAP_FILE)
+        if os.path.isfile(path):
+            _baseMirrorMap = MirrorMap.fromFile(path)
+        else:
+            log.debug('Compiled mirror map %s missing, building it from %s', path, SYMMETRY_MAP_SOURCE)
+            _baseMirrorMap = buildMirrorMap()
+    return _baseMirrorMap
+
+
+def symmetrizeMesh(obj, direction='r', restCoord=None, mirrorMap=None, update=True):
+    """
+    Symmetrize the offsets of the coordinates of obj from its rest
+    coordinates (obj.orig_coord unless restCoord is specified). obj is
+    expected to have the topology of the base mesh, unless another mirror map
+    is specified.
+    """
+    if mirrorMap is None:
+        mirrorMap = getBaseMirrorMap()
+    if obj.getVertexCount() != mirrorMap.vertexCount:
+        raise RuntimeError('Mesh %s does not match the mirror map (%s vertices instead of %s)' % (obj.name, obj.getVertexCount(), mirrorMap.vertexCount))
+    if restCoord is None:
+        restCoord = obj.orig_coord
+    offsets = mirrorMap.symmetrizeOffsets(obj.coord[:,:3] - restCoord[:,:3], direction)
+    obj.changeCoords(restCoord[:,:3] + offsets)
+    obj.calcNormals()
+    if update:
+        obj.update()
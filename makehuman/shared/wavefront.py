@@ -38,6 +38,7 @@ Abstract
 """
 
 import os
+import re
 import module3d
 import codecs
 import math
@@ -49,96 +50,52 @@ def loadObjFile(path, obj = None):
     Parse and load a Wavefront OBJ file as mesh.
     Parser does not support normals, and assumes all objects should be smooth
     shaded. Use duplicate vertices for achieving hard edges.
+
+    The records of each type are extracted from the whole file at once, and
+    converted to arrays in bulk.
     """
     if obj == None:
         name = os.path.splitext( os.path.basename(path) )[0]
         obj = module3d.Object3D(name)
 
     objFile = io.open(path, 'rU', encoding="utf-8")
+    text = objFile.read()
+    objFile.close()
 
-    fg = None
-    mtl = None
-
-    verts = []
-    uvs = []
-    fverts = []
-    fuvs = []
+    # Faces per face group, in order of appearance ('usemtl' materials are
+    # ignored)
+    fLines = []
     groups = []
-    has_uv = False
-    materials = {}
     faceGroups = {}
-
-    for objData in objFile:
-
-        lineData = objData.split()
-        if len(lineData) > 0:
-
-            command = lineData[0]
-
-            # Vertex coordinate
-            if command == 'v':
-                verts.append((float(lineData[1]), float(lineData[2]), float(lineData[3])))
-
-            # Vertex texture (UV) coordinate
-            elif command == 'vt':
-                uvs.append((float(lineData[1]), float(lineData[2])))
-
-            # Face definition (reference to vertex attributes)
-            elif command == 'f':
-                if not fg:
-                    if 0 not in faceGroups:
-                        faceGroups[0] = obj.createFaceGroup('default-dummy-group')
-                    fg = faceGroups[0]
-
-                uvIndices = []
-                vIndices = []
-                for faceData in lineData[1:]:
-                    vInfo = faceData.split('/')
-                    vIdx = int(vInfo[0]) - 1  # -1 because obj is 1 based list
-                    vIndices.append(vIdx)
-
-                    # If there are other data (uv, normals, etc)
-                    if len(vInfo) > 1 and vInfo[1] != '':
-                        uvIndex = int(vInfo[1]) - 1  # -1 because obj is 1 based list
-                        uvIndices.append(uvIndex)
-
-                if len(vIndices) == 3:
-                    vIndices.append(vIndices[0])
-                fverts.append(tuple(vIndices))
-
-                if len(uvIndices) > 0:
-                    if len(uvIndices) == 3:
-                        uvIndices.append(uvIndices[0])
-                    has_uv = True
-                if len(uvIndices) < 4:
-                    uvIndices = [0, 0, 0, 0]
-                fuvs.append(tuple(uvIndices))
-
-                groups.append(fg.idx)
-
-            elif command == 'g':
-                fgName = lineData[1]
-                if fgName not in faceGroups:
-                    faceGroups[fgName] = obj.createFaceGroup(fgName)
-                fg =  faceGroups[fgName]
-
-            elif command == 'usemtl':
-                pass # ignore materials
-
-            elif command == 'o':
-
-                obj.name = lineData[1]
-
-    objFile.close()
+    chunks = _GROUP_RECORD.split(text)
+    for i in range(0, len(chunks), 2):
+        faces = _FACE_RECORD.findall(chunks[i])
+        if i > 0:
+            fgName = chunks[i-1]
+            if fgName not in faceGroups:
+                faceGroups[fgName] = obj.createFaceGroup(fgName)
+            fg = faceGroups[fgName]
+        elif faces:
+            fg = faceGroups[0] = obj.createFaceGroup('default-dummy-group')
+        fLines.extend(faces)
+        groups.append(np.full(len(faces), fg.idx if faces else 0, dtype=np.uint16))
+    del chunks
+
+    objNames = _OBJECT_RECORD.findall(text)
+    if objNames:
+        obj.name = objNames[-1]
+
+    verts = _parseFloatRecords(_VERTEX_RECORD.findall(text), 3, path)
+    uvs = _parseFloatRecords(_UV_RECORD.findall(text), 2, path)
+    del text
+    fverts, fuvs, has_uv = _parseFaceRecords(fLines, len(verts), len(uvs), path)
+    groups = np.concatenate(groups)
 
     # Sanity check for loose vertices
-    strayVerts = []
-    referencedVerts = set([ v for fvert in fverts for v in fvert ])
-    for vIdx in range(len(verts)):
-        if vIdx not in referencedVerts:
-            strayVerts.append(vIdx)
+    strayVerts = np.flatnonzero(np.bincount(fverts.reshape(-1), minlength=len(verts))[:len(verts)] == 0)
     if len(strayVerts) > 0:
         import log
+        strayVerts = strayVerts.tolist()
         msg = "Error loading OBJ file %s: Contains loose vertices, not connected to a face (%s)"
         log.error(msg, path, strayVerts)
         raise RuntimeError(msg % (path, strayVerts))
@@ -152,6 +109,90 @@ def loadObjFile(path, obj = None):
 
     return obj
 
+def _recordPattern(command, data=r'(.*)'):
+    return re.compile(r'^[ \t]*%s[ \t]+%s$' % (command, data), re.M)
+
+_VERTEX_RECORD = _recordPattern('v')
+_UV_RECORD = _recordPattern('vt')
+_FACE_RECORD = _recordPattern('f')
+_GROUP_RECORD = _recordPattern('g', r'(\S+).*')
+_OBJECT_RECORD = _recordPattern('o', r'(\S+).*')
+
+# Vertex attributes of a face record: v/vt/vn with optional vt and vn
+_FACE_VN = re.compile(r'(/-?\d*)/\S*')
+_FACE_NO_VT = re.compile(r'(?<![/\d-])(-?\d+)(?![\d/])')
+
+def _parseFloatRecords(lines, columns, path):
+    """
+    Convert the data of vertex or UV records to a (len(lines), columns)
+    float32 array, ignoring additional values on a line (such as w
+    coordinates or vertex colors). Raises a RuntimeError for records with
+    fewer values.
+    """
+    if all(len(line.split()) == columns for line in lines):
+        values = np.fromstring(' '.join(lines), dtype=np.float32, sep=' ')
+        if len(values) == len(lines) * columns:
+            return values.reshape((-1, columns))
+    # Records with additional values (such as vertex colors on some lines)
+    result = np.empty((len(lines), columns), dtype=np.float32)
+    for i, line in enumerate(lines):
+        values = line.split()[:columns]
+        if len(values) < columns:
+            raise RuntimeError('Error loading OBJ file %s: Expected %s values in record "%s"' % (path, columns, line))
+        result[i] = values
+    return result
+
+def _parseFaceRecords(lines, nverts, nuvs, path):
+    """
+    Convert the data of face records (triangles or quads, with or without UV
+    indices) to (nfaces, 4) arrays of vertex and UV indices. Triangles are
+    padded to quads by repeating their first vertex, faces without UV indices
+    get UV indices 0. Returns vertex indices, UV indices and whether any face
+    has UV indices. Raises a RuntimeError for indices that do not refer to
+    one of the nverts vertices or nuvs UVs (relative, negative, indices are
+    not supported).
+    """
+    counts = np.fromiter((len(line.split()) for line in lines), dtype=np.intp, count=len(lines))
+    text = ' '.join(lines)
+    ntokens = int(counts.sum())
+    if np.any((counts < 3) | (counts > 4)):
+        raise RuntimeError('Error loading OBJ file %s: Only triangles and quads are supported (found face with %s vertices)' % (path, counts[(counts < 3) | (counts > 4)][0]))
+
+    # Rewrite the vertex attributes (v, v/vt, v/vt/vn or v//vn) to v and vt
+    # pairs, with vt 0 if omitted
+    text = _FACE_VN.sub(r'\1', text.replace('//', '/0/'))
+    if text.count('/') != ntokens:
+        text = _FACE_NO_VT.sub(r'\1/0', text)
+    try:
+        values = np.fromstring(text.replace('/', ' '), dtype=np.int64, sep=' ')
+    except ValueError:
+        values = ()
+    if len(values) != 2 * ntokens:
+        raise RuntimeError('Error loading OBJ file %s: Invalid face definition' % path)
+    values = values.reshape((ntokens, 2)) - 1
+    vIndices = values[:,0]
+    uvIndices = values[:,1]
+
+    # Omitted UV indices are -1
+    invalid = (vIndices < 0) | (vIndices >= nverts)
+    if np.any(invalid):
+        raise RuntimeError('Error loading OBJ file %s: Invalid vertex index %s (the file has %s vertices)' % (path, vIndices[invalid][0] + 1, nverts))
+    invalid = (uvIndices < -1) | (uvIndices >= nuvs)
+    if np.any(invalid):
+        raise RuntimeError('Error loading OBJ file %s: Invalid UV index %s (the file has %s UVs)' % (path, uvIndices[invalid][0] + 1, nuvs))
+
+    # Gather quads, repeat the first vertex of triangles
+    starts = np.cumsum(counts) - counts
+    index = starts[:,None] + np.arange(4)[None,:]
+    index[counts == 3, 3] = starts[counts == 3]
+    fverts = vIndices[index].astype(np.uint32)
+
+    nuvs = np.add.reduceat((uvIndices >= 0).astype(np.intp), starts) if len(starts) else np.zeros(0, dtype=np.intp)
+    has_uv = bool(np.any(nuvs > 0))
+    fuvs = uvIndices[index]
+    fuvs[nuvs != counts] = 0
+    return fverts, fuvs.astype(np.uint32), has_uv
+
 
 def writeObjFile(path, meshes, writeMTL=True, config=None, filterMaskedFaces=True):
     if not isinstance(meshes, list):
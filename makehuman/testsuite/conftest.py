@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pytest fixtures
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Pytest configuration and fixtures for the unit tests of the core, run with
+"python -m pytest testsuite" from the MakeHuman program directory.
+The tests run headless (without Qt or OpenGL), on small synthetic meshes
+and targets, so that they do not depend on the downloaded assets.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+_programDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(_programDir)
+sys.path[:0] = [os.path.join(_programDir, p) for p in ['', 'lib', 'apps', 'shared', 'apps/gui', 'core']]
+
+# The blender tests need blender executables, they are run with runAll()
+collect_ignore = ['test_blender.py', 'blender_initTest.py']
+
+
+def createGridMesh(size=6, name='grid'):
+    """
+    Flat mesh of (size-1)^2 quads with UV coordinates, split in a left and
+    right face group.
+    """
+    import module3d
+
+    obj = module3d.Object3D(name)
+    x, y = np.meshgrid(np.arange(size, dtype=np.float32), np.arange(size, dtype=np.float32))
+    coords = np.column_stack([x.reshape(-1), y.reshape(-1), np.zeros(size*size, dtype=np.float32)])
+    idx = np.arange(size*size).reshape((size, size))
+    faces = np.dstack([idx[:-1,:-1], idx[:-1,1:], idx[1:,1:], idx[1:,:-1]]).reshape((-1, 4))
+    left = obj.createFaceGroup('left')
+    right = obj.createFaceGroup('right')
+    groups = np.where((faces % size).min(axis=1) < (size-1)//2, left.idx, right.idx)
+
+    obj.setCoords(coords)
+    obj.setUVs(coords[:,:2] / (size-1))
+    obj.setFaces(faces, faces, groups)
+    obj.updateIndexBuffer()
+    obj.calcNormals()
+    return obj
+
+
+@pytest.fixture
+def grid():
+    return createGridMesh()
+
+
+class _HeadlessApp(object):
+    def progress(self, *args, **kwargs):
+        pass
+
+@pytest.fixture
+def app():
+    """
+    Minimal replacement of the application, for code that reports progress.
+    """
+    from core import G
+    oldApp = G.app
+    G.app = _HeadlessApp()
+    yield G.app
+    G.app = oldApp
+
+
+@pytest.fixture
+def addTarget():
+    """
+    Returns a function that adds a random target for a mesh to the target
+    buffer, and returns its canonical path. The targets are removed from the
+    buffer again after the test.
+    """
+    import algos3d
+    from getpath import canonicalPath
+
+    rng = np.random.RandomState(1234)
+    paths = []
+
+    def _addTarget(obj, nverts=8, name=None):
+        target = algos3d.Target(obj, None)
+        target.verts = np.sort(rng.choice(obj.getVertexCount(), nverts, replace=False)).astype(np.uint32)
+        target.data = rng.uniform(-1, 1, (nverts, 3)).astype(np.float32)
+        target.faces = obj.getFacesForVertices(target.verts)
+        path = canonicalPath('data/targets/test/%s.target' % (name or 'target-%d' % len(paths)))
+        algos3d._targetBuffer[path] = target
+        paths.append(path)
+        return path
+
+    yield _addTarget
+
+    for path in paths:
+        if path in algos3d._targetBuffer:
+            del algos3d._targetBuffer[path]
+
+
+@pytest.fixture
+def modifierHuman(grid, app):
+    """
+    Human on the grid mesh with the shipped modeling modifiers.
+    """
+    import human
+    import humanmodifier
+    result = human.Human(grid)
+    humanmodifier.loadModifiers('data/modifiers/modeling_modifiers.json', result)
+    return result
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compiled mesh tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Abstract
+--------
+
+Tests of saving and loading meshes in the memory-mapped compiled format.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import files3d
+import module3d
+
+
+def test_mapped_mesh_roundtrip(tmp_path, grid):
+    path = str(tmp_path / ('grid' + files3d.MAPPED_MESH_EXTENSION))
+    files3d.saveMappedMesh(grid, path)
+    assert not os.path.exists(path + '.tmp')
+
+    obj = module3d.Object3D('grid')
+    files3d.loadMappedMesh(obj, path)
+    for name in ['coord', 'texco', 'fvert', 'fuvs', 'group', 'vface', 'nfaces',
+                 'fnorm', 'vnorm', 'vtang', 'vmap', 'tmap', 'r_faces']:
+        np.testing.assert_array_equal(getattr(obj, name), getattr(grid, name), err_msg=name)
+    for expected, loaded in zip(grid.vface_csr, obj.vface_csr):
+        np.testing.assert_array_equal(loaded, expected)
+    assert [fg.name for fg in obj.faceGroups] == [fg.name for fg in grid.faceGroups]
+    assert obj.getTopologyHash() == grid.getTopologyHash()
+
+    # Modifying the loaded mesh does not change the file
+    obj.changeCoords(obj.coord + 1.0)
+    obj2 = module3d.Object3D('grid')
+    files3d.loadMappedMesh(obj2, path)
+    np.testing.assert_array_equal(obj2.coord, grid.coord)
+
+
+def test_mapped_mesh_in_use(tmp_path, grid, monkeypatch):
+    path = str(tmp_path / ('grid' + files3d.MAPPED_MESH_EXTENSION))
+
+    def replace(src, dst):
+        raise PermissionError('in use')
+    monkeypatch.setattr(os, 'replace', replace)
+
+    with pytest.raises(RuntimeError):
+        files3d.saveMappedMesh(grid, path)
+    assert not os.path.exists(path + '.tmp')
+    assert not os.path.exists(path)
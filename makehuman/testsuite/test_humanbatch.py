@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Batch generation tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Tests of the helpers of the headless batch generation API.
+"""
+
+import numpy as np
+
+from makehuman import getShortVersion
+
+import humanbatch
+
+
+def test_parse_mhm_modifiers():
+    text = ("version %s\n"
+            "tags test\n"
+            "modifier macrodetails/Gender 1.000000\n"
+            "modifier breast/BreastSize 0.250000\n"
+            "skeleton default.mhskel\n" % getShortVersion(noSub=True))
+    modifiers = humanbatch.parseMHMModifiers(text)
+    assert list(modifiers.items()) == [('macrodetails/Gender', 1.0), ('breast/BreastSize', 0.25)]
+
+
+def test_parse_old_mhm_modifiers():
+    # Modifiers of MakeHuman 1.0 files are mapped like Human.load() does
+    text = ("version v1.0.1\n"
+            "macro Gender 1.000000\n"
+            "gendered BreastSize 0.250000\n"
+            "torso torso-scale-depth-decr-incr 0.300000\n")
+    modifiers = humanbatch.parseMHMModifiers(text)
+    assert modifiers['macrodetails/Gender'] == 1.0
+    assert modifiers['breast/BreastSize'] == 0.25
+    assert modifiers['torso/torso-scale-depth-decr|incr'] == 0.3
+
+
+def getReferenceDetailStack(human, modifiers, values):
+    # Setting the modifiers the way Human.load() does
+    human.setDefaultValues()
+    human.targetsDetailStack = {}
+    human.blockEthnicUpdates = True
+    for modifier, value in zip(modifiers, values):
+        modifier.setValue(value, skipDependencies=True)
+    human.blockEthnicUpdates = False
+    human._setEthnicVals()
+    human.updateMacroModifiers()
+    return dict(human.targetsDetailStack)
+
+
+def test_detail_stack(modifierHuman, monkeypatch):
+    import human
+
+    rng = np.random.RandomState(0)
+    generator = humanbatch.BatchGenerator([m.fullName for m in modifierHuman.modifiers], human=modifierHuman)
+    rows = [[rng.uniform(m.getMin(), m.getMax()) if rng.uniform() < 0.5 else m.getDefaultValue()
+             for m in generator.modifiers] for _ in range(5)]
+    expected = [getReferenceDetailStack(modifierHuman, generator.modifiers, row) for row in rows]
+
+    # Target paths are canonicalized once, not per sample
+    calls = []
+    def canonicalPath(path):
+        calls.append(path)
+        return path
+    monkeypatch.setattr(human, 'canonicalPath', canonicalPath)
+    monkeypatch.setattr(humanbatch, 'canonicalPath', canonicalPath)
+
+    for row, stack in zip(rows, expected):
+        assert generator.getDetailStack(row) == stack
+    assert not calls
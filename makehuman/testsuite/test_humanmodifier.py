@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Modifier tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Abstract
+--------
+
+Tests of the modifiers, on a headless human with the shipped modifier
+definitions.
+"""
+
+import numpy as np
+import pytest
+
+import humanmodifier
+
+
+def assertWeightsEqual(weights, expected):
+    assert list(weights.keys()) == list(expected.keys())
+    np.testing.assert_allclose(list(weights.values()), list(expected.values()), rtol=1e-12, atol=1e-15)
+
+
+def test_compiled_target_weights(modifierHuman):
+    human = modifierHuman
+    rng = np.random.RandomState(0)
+    modifiers = list(human.modifiers)
+    modifiers.append(humanmodifier.SimpleModifier('test', 'data/targets', 'test/simple.target'))
+    types = set(type(m).__name__ for m in modifiers)
+    assert types == set(['SimpleModifier', 'UniversalModifier', 'MacroModifier', 'EthnicModifier'])
+
+    for _ in range(5):
+        # Random macro variables, that the factors of all modifiers depend on
+        for m in human.getModifiersByType(humanmodifier.MacroModifier):
+            getattr(human, m.setter)(rng.uniform(), updateModifier=False)
+
+        for m in modifiers:
+            value = rng.uniform(m.getMin(), m.getMax())
+            factors = m.getFactors(value)
+            assertWeightsEqual(m.getTargetWeights(factors, value),
+                               humanmodifier.getTargetWeights(m.targets, factors, value))
+
+            # Missing factors
+            compiled = humanmodifier.CompiledTargetWeights(m.targets)
+            partial = dict((name, factor) for name, factor in factors.items() if rng.uniform() < 0.5)
+            assertWeightsEqual(compiled.getWeights(partial, value, ignoreNotfound=True),
+                               humanmodifier.getTargetWeights(m.targets, partial, value, ignoreNotfound=True))
+
+
+def test_macro_dependencies(modifierHuman, monkeypatch):
+    human = modifierHuman
+    rng = np.random.RandomState(0)
+    for m in human.modifiers:
+        if m.isMacro():
+            getattr(human, m.setter)(rng.uniform(), updateModifier=False)
+        elif rng.uniform() < 0.2:
+            m.setValue(rng.uniform(m.getMin(), m.getMax()), skipDependencies=True)
+    human.updateMacroModifiers()
+
+    updated = []
+    setValue = humanmodifier.Modifier.setValue
+    def recordSetValue(self, value, skipDependencies=False):
+        updated.append(self.groupName)
+        setValue(self, value, skipDependencies)
+    monkeypatch.setattr(humanmodifier.Modifier, 'setValue', recordSetValue)
+
+    gender = human.getModifier('macrodetails/Gender')
+    gender.setValue(0.8)
+    monkeypatch.undo()
+
+    # Only the groups that directly depend on gender are recomputed, once
+    directDependents = human.getModifiersAffectedBy(gender)
+    assert updated[0] == gender.groupName
+    assert sorted(updated[1:]) == sorted(set(directDependents))
+    assert not human._dirtyModifierGroups
+
+    # Same detail stack as setting all modifiers again
+    stack = dict(human.targetsDetailStack)
+    values = [(m, m.getValue()) for m in human.modifiers]
+    human.targetsDetailStack = {}
+    for m, value in values:
+        m.setValue(value, skipDependencies=True)
+    human.updateMacroModifiers()
+    assert sorted(stack.keys()) == sorted(human.targetsDetailStack.keys())
+    for path, weight in stack.items():
+        assert weight == pytest.approx(human.targetsDetailStack[path], abs=1e-12)
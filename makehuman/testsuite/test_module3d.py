@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Mesh tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Abstract
+--------
+
+Tests of the vectorized mesh topology and shading updates of module3d,
+compared with straightforward per-vertex and per-face reference versions.
+"""
+
+import numpy as np
+
+import module3d
+
+
+def getFacesPerVertex(obj):
+    result = [[] for _ in range(obj.getVertexCount())]
+    for f, verts in enumerate(obj.fvert):
+        for v in verts:
+            result[v].append(f)
+    return result
+
+
+def test_update_faces(grid):
+    # Vertex 3 is used twice by the last face, the last vertex by none
+    coords = np.vstack([grid.coord, [[0.0, 0.0, 1.0]]])
+    fvert = np.vstack([grid.fvert, [[0, 1, 3, 3]]])
+    obj = module3d.Object3D('test')
+    obj.setCoords(coords)
+    obj.setFaces(fvert)
+
+    expected = getFacesPerVertex(obj)
+    offsets, faces = obj.vface_csr
+    for v, vfaces in enumerate(expected):
+        assert obj.nfaces[v] == len(vfaces)
+        assert obj.vface[v, :len(vfaces)].tolist() == vfaces
+        assert faces[offsets[v]:offsets[v+1]].tolist() == vfaces
+
+    # Derived from the padded form, as for compiled meshes
+    obj._vface_csr = None
+    offsets2, faces2 = obj.vface_csr
+    np.testing.assert_array_equal(offsets2, offsets)
+    np.testing.assert_array_equal(faces2, faces)
+
+
+def createSeamMesh():
+    """
+    Two quads sharing an edge, with separate UVs on both sides of the edge,
+    and an unused vertex.
+    """
+    obj = module3d.Object3D('seam')
+    obj.setCoords([[0, 0, 0], [1, 0, 0], [2, 0, 0], [0, 1, 0], [1, 1, 0], [2, 1, 0], [5, 5, 5]])
+    obj.setUVs([[0, 0], [0.4, 0], [0.4, 1], [0, 1], [0.6, 0], [1, 0], [1, 1], [0.6, 1]])
+    obj.setFaces([[0, 1, 4, 3], [1, 2, 5, 4]], [[0, 1, 2, 3], [4, 5, 6, 7]])
+    obj.updateIndexBuffer()
+    return obj
+
+
+def test_inverse_vmap():
+    obj = createSeamMesh()
+    expected = dict()
+    for unwelded, original in enumerate(obj.vmap):
+        expected.setdefault(int(original), []).append(unwelded)
+    assert len(expected[1]) == len(expected[4]) == 2
+
+    offsets, unwelded = obj.inverse_vmap_csr
+    for v in range(obj.getVertexCount()):
+        assert unwelded[offsets[v]:offsets[v+1]].tolist() == expected.get(v, [])
+    assert obj.inverse_vmap == expected
+
+    indices = [4, 6, 0, 1]
+    rows, counts = obj.getUnweldedVertices(indices, return_counts=True)
+    assert rows.tolist() == sum((expected.get(v, []) for v in indices), [])
+    assert counts.tolist() == [len(expected.get(v, [])) for v in indices]
+
+
+def perturb(obj, seed=0):
+    rng = np.random.RandomState(seed)
+    obj.changeCoords(obj.coord + rng.uniform(-0.3, 0.3, obj.coord.shape).astype(np.float32))
+
+
+def test_vertex_normals(grid):
+    perturb(grid)
+    grid.calcFaceNormals()
+    grid.calcVertexNormals()
+
+    expected = np.zeros_like(grid.vnorm)
+    for v, vfaces in enumerate(getFacesPerVertex(grid)):
+        n = grid.fnorm[vfaces].sum(axis=0)
+        expected[v] = n / np.linalg.norm(n)
+    np.testing.assert_allclose(grid.vnorm, expected, atol=1e-5)
+
+    # Partial update of the vertices around moved ones
+    grid.changeCoords(grid.coord[:8] + [0.0, 0.0, 0.5], np.arange(8))
+    ix = np.unique(grid.fvert[grid.getFacesForVertices(np.arange(8))])
+    grid.calcFaceNormals()
+    grid.calcVertexNormals(ix)
+    partial = grid.vnorm.copy()
+    grid.calcVertexNormals()
+    np.testing.assert_allclose(partial, grid.vnorm, atol=1e-5)
+
+
+def getReferenceTangents(obj):
+    tan1 = np.zeros((obj.getVertexCount(), 3))
+    tan2 = np.zeros((obj.getVertexCount(), 3))
+    for verts, uvs in zip(obj.fvert, obj.fuvs):
+        v0, v1, v2 = obj.coord[verts[:3]].astype(np.float64)
+        (s0, t0), (s1, t1), (s2, t2) = obj.texco[uvs[:3]].astype(np.float64)
+        e1, e2 = v1 - v0, v2 - v0
+        s1, t1, s2, t2 = s1 - s0, t1 - t0, s2 - s0, t2 - t0
+        r = 1.0 / (s1 * t2 - s2 * t1)
+        for v in verts:
+            tan1[v] += (t2 * e1 - t1 * e2) * r
+            tan2[v] += (s1 * e2 - s2 * e1) * r
+    n = obj.vnorm
+    tang = tan1 - np.sum(n * tan1, axis=-1)[:,None] * n
+    tang /= np.linalg.norm(tang, axis=-1)[:,None]
+    w = np.where(np.sum(np.cross(n, tan1) * tan2, axis=-1) < 0, -1.0, 1.0)
+    return np.column_stack([tang, w])
+
+
+def test_vertex_tangents(grid):
+    perturb(grid)
+    grid.calcNormals()
+    np.testing.assert_allclose(grid.vtang, getReferenceTangents(grid), atol=1e-4)
+
+    grid.changeCoords(grid.coord[:8] + [0.0, 0.0, 0.5], np.arange(8))
+    ix = np.unique(grid.fvert[grid.getFacesForVertices(np.arange(8))])
+    grid.calcFaceNormals()
+    grid.calcVertexNormals(ix)
+    grid.calcVertexTangents(ix)
+    partial = grid.vtang.copy()
+    grid.calcVertexTangents()
+    np.testing.assert_allclose(partial, grid.vtang, atol=1e-5)
+    np.testing.assert_allclose(partial, getReferenceTangents(grid), atol=1e-4)
+
+
+def test_sync_dirty_indices(grid):
+    obj = grid
+    obj.sync_all()
+    assert obj.ucoor is False
+
+    indices = np.array([1, 5])
+    obj.changeCoords(obj.coord[indices] + 1.0, indices)
+    indices[:] = 0      # Modified by the caller before syncing
+    assert isinstance(obj.ucoor, list)
+    obj.sync_coord()
+    assert obj.ucoor is False
+    np.testing.assert_array_equal(obj.r_coord, obj.coord[obj.vmap])
+
+    obj.markCoords(np.arange(obj.getVertexCount()) == 4, norm=True)
+    obj.vnorm[4] = [0.0, 1.0, 0.0]
+    obj.sync_norms()
+    np.testing.assert_array_equal(obj.r_vnorm, obj.vnorm[obj.vmap])
+
+    # Marking most vertices syncs everything
+    obj.markCoords(np.arange(10), coor=True)
+    assert obj.ucoor is True
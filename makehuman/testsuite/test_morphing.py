@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Morphing tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Tests of the optimized ways of applying the targets detail stack, which
+should give the same result as applying every target one by one.
+"""
+
+import numpy as np
+import pytest
+
+import algos3d
+
+
+def applyTargetsReference(obj, detailStack):
+    coord = obj.coord.copy()
+    for path, morphFactor in detailStack.items():
+        target = algos3d._targetBuffer[path]
+        coord[target.verts] += morphFactor * target.data
+    return coord
+
+
+def test_target_basis(grid, addTarget):
+    detailStack = dict((addTarget(grid), w) for w in [0.5, -0.25, 1.0, 0.0])
+    expected = applyTargetsReference(grid, detailStack)
+
+    basis = algos3d.TargetBasis(grid)
+    basis.apply(grid, detailStack)
+
+    np.testing.assert_allclose(grid.coord, expected, atol=1e-5)
+    for path, morphFactor in detailStack.items():
+        assert algos3d._targetBuffer[path].morphFactor == morphFactor
+
+
+def test_target_basis_rebuild(grid, addTarget):
+    paths = [addTarget(grid) for _ in range(4)]
+    basis = algos3d.TargetBasis(grid)
+    basis.apply(grid, dict((path, 1.0) for path in paths))
+
+    # Dropping most targets compacts the matrix, replacing one rebuilds it
+    grid.changeCoords(np.zeros_like(grid.coord))
+    addTarget(grid, name='target-0')
+    detailStack = {paths[0]: 0.5}
+    expected = applyTargetsReference(grid, detailStack)
+    basis.apply(grid, detailStack)
+
+    np.testing.assert_allclose(grid.coord, expected, atol=1e-5)
+    assert basis.paths == [paths[0]]
+    assert basis.targets[0] is algos3d._targetBuffer[paths[0]]
+
+
+@pytest.fixture
+def human(grid, app):
+    import human
+    return human.Human(grid)
+
+
+def test_incremental_apply(human, addTarget):
+    mesh = human.meshData
+    paths = [addTarget(mesh) for _ in range(5)]
+    for path in paths[:3]:
+        human.setDetail(path, 0.5)
+    human.applyAllTargets()
+
+    human.setDetail(paths[0], 0.2)
+    human.setDetail(paths[1], 0.0)
+    human.setDetail(paths[3], 1.0)
+    # Reloaded target (as happens with warp targets)
+    addTarget(mesh, name='target-2')
+    human.applyAllTargets(incremental=True)
+    assert human._incrementalUpdates == 1
+    incremental = mesh.coord.copy()
+
+    human.applyAllTargets()
+    np.testing.assert_allclose(incremental, mesh.coord, atol=1e-5)
+    for path in paths[:4]:
+        assert algos3d._targetBuffer[path].morphFactor == human.getDetail(path)
+
+
+def test_quantized_target(grid, addTarget):
+    target = algos3d._targetBuffer[addTarget(grid)]
+    data = target.getData().copy()
+    nbytes = target.nbytes
+
+    error = target.quantize(np.int16)
+    assert target.isQuantized()
+    assert target.nbytes < nbytes
+    assert np.all(np.abs(target.getData() - data) <= error[None,:] + 1e-7)
+
+    expected = grid.coord.copy()
+    expected[target.verts] += 0.5 * data
+    target.apply(grid, 0.5)
+    np.testing.assert_allclose(grid.coord, expected, atol=error.max())
+
+
+def test_lowrank_error_bound(tmp_path, grid, caplog):
+    rng = np.random.RandomState(0)
+    paths = []
+    for i in range(4):
+        paths.append(str(tmp_path / ('target-%d.mhpack' % i)))
+        offsets = rng.uniform(-1, 1, grid.coord.shape).astype(np.float32)
+        algos3d.saveTranslationTargets(grid, [grid.coord + offsets], [paths[-1]], binary=True)
+
+    basis = algos3d.LowRankTargetBasis.factorize(grid, paths, maxRank=2)
+    assert basis.rank == 2
+    assert basis.error == basis.residuals.max() > basis.tolerance
+    # Not meeting the tolerance is reported
+    assert 'does not meet tolerance' in caplog.text
+    assert ('%g' % basis.error) in caplog.text
+
+    caplog.clear()
+    exact = algos3d.LowRankTargetBasis.factorize(grid, paths)
+    assert exact.rank == 4 and exact.error <= exact.tolerance
+    assert 'does not meet tolerance' not in caplog.text
+
+    weights = np.asarray([1.0, -0.5, 0.75, 1.0], dtype=np.float32)
+    exact = np.zeros((grid.getVertexCount(), 3), dtype=np.float32)
+    for path, weight in zip(paths, weights):
+        target = algos3d.Target(grid, path)
+        exact[target.verts] += weight * target.getData()
+    error = np.abs(basis.dot(weights) - exact[basis.verts]).max()
+    assert error <= basis.getErrorBound(weights) + 1e-5
+
+
+def test_quantization_error_bound():
+    import compile_targets
+
+    rng = np.random.RandomState(0)
+    for i in range(200):
+        data = (rng.standard_normal((50, 3)) * 10 ** rng.uniform(-4, 1)).astype(np.float32)
+        for dtype in [np.int16, np.int8]:
+            vector, scale = algos3d.quantizeVectors(data, dtype)
+            errorBound, error = compile_targets.getQuantizationError(data, vector, scale)
+            assert np.all(errorBound >= error)
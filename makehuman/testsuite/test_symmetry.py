@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Symmetry tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Tests of the vertex mirror map.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import symmetry
+
+
+@pytest.fixture
+def mirrorMap():
+    # Row of vertices at x = 2, 1, 0, -1, -2
+    return symmetry.MirrorMap(left=[0, 1], right=[4, 3], mid=[2])
+
+
+def symmetrizeReference(mirrorMap, offsets, direction):
+    result = offsets.copy()
+    pairs = list(zip(mirrorMap.left, mirrorMap.right))
+    for l, r in pairs:
+        if direction == 'r':
+            result[r] = offsets[l] * [-1, 1, 1]
+        elif direction == 'l':
+            result[l] = offsets[r] * [-1, 1, 1]
+        else:
+            result[l] = offsets[r] * [-1, 1, 1]
+            result[r] = offsets[l] * [-1, 1, 1]
+    for m in mirrorMap.mid:
+        result[m, 0] = -offsets[m, 0] if direction == 'm' else 0
+    return result
+
+
+@pytest.mark.parametrize('direction', symmetry.DIRECTIONS)
+def test_symmetrize_offsets(mirrorMap, direction):
+    offsets = np.random.RandomState(0).randn(5, 3).astype(np.float32)
+    np.testing.assert_array_equal(mirrorMap.symmetrizeOffsets(offsets, direction),
+                                  symmetrizeReference(mirrorMap, offsets, direction))
+
+
+def test_symmetrize_target(mirrorMap):
+    verts, data = mirrorMap.symmetrizeTarget([0, 2], [[0.5, 1.0, 0.0], [1.0, 0.0, 2.0]], 'r')
+    np.testing.assert_array_equal(verts, [0, 2, 4])
+    np.testing.assert_array_equal(data, [[0.5, 1.0, 0.0], [0.0, 0.0, 2.0], [-0.5, 1.0, 0.0]])
+
+
+def test_base_mirror_map():
+    sourcePath = symmetry.getSymmetryMapSourcePath()
+    if not os.path.isfile(sourcePath):
+        pytest.skip('MakeTarget symmetry map not available')
+    mirrorMap = symmetry.buildMirrorMap()
+    assert np.array_equal(mirrorMap.mirror[mirrorMap.mirror], np.arange(mirrorMap.vertexCount))
+    assert len(np.unique(np.concatenate([mirrorMap.left, mirrorMap.right, mirrorMap.mid]))) == mirrorMap.vertexCount
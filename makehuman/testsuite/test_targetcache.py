@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Target cache tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Tests of the bounded target buffer.
+"""
+
+import numpy as np
+
+import algos3d
+
+
+class FakeTarget(object):
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+def test_eviction():
+    cache = algos3d.TargetCache(budget=250)
+    for key in 'abc':
+        cache[key] = FakeTarget(100)
+    assert cache.keys() == ['b', 'c']
+    assert cache.nbytes == 200
+    assert cache.evictions == 1
+
+    # Requesting a target makes it the most recently used one
+    cache['b']
+    cache['d'] = FakeTarget(100)
+    assert cache.keys() == ['b', 'd']
+    assert 'c' not in cache
+    assert cache.get('c') is None
+    assert cache.getStatistics()['hits'] == 1
+
+
+def test_pins():
+    cache = algos3d.TargetCache(budget=150)
+    cache.pin('a')
+    cache['a'] = FakeTarget(100)
+    cache['b'] = FakeTarget(100)
+    cache['c'] = FakeTarget(100)
+    assert cache.keys() == ['a', 'c']
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+    assert not cache.isPinned('a')
+
+
+def test_mapped_targets_size(tmp_path, grid):
+    grid.changeCoords(grid.coord + [0.0, 1.0, 0.0])
+    path = str(tmp_path / 'offset.mhpack')
+    algos3d.saveTranslationTarget(grid, path, binary=True)
+
+    target = algos3d.Target(grid, path)
+    assert algos3d.isMemoryMapped(target.verts)
+    assert target.nbytes == 0
+    target.data = target.getData().copy()
+    assert target.nbytes == target.getData().nbytes
+
+
+def test_update_size():
+    cache = algos3d.TargetCache(budget=250)
+    cache['a'] = FakeTarget(100)
+    cache['b'] = FakeTarget(100)
+
+    # Eg. posed data cached by a target
+    cache['b'].nbytes = 200
+    cache.updateSize('b')
+    assert cache.keys() == ['b']
+    assert cache.nbytes == 200
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Target pack tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Tests of writing and reading memory-mapped target packs.
+"""
+
+import os
+
+import numpy as np
+
+import algos3d
+import targetpack
+
+
+def test_pack_roundtrip(tmp_path):
+    rng = np.random.RandomState(0)
+    targets = {}
+    writer = targetpack.TargetPackWriter(license={'author': 'test'}, topology='abc')
+    for i in range(3):
+        arrays = {'index': np.sort(rng.choice(100, 10 + i, replace=False)).astype(np.uint32),
+                  'vector': rng.randn(10 + i, 3).astype(np.float32)}
+        name = 'targets/test/target-%d.target' % i
+        writer.addTarget(name, arrays, scale=None if i else [1.0, 2.0, 3.0])
+        targets[name] = arrays
+    path = str(tmp_path / targetpack.PACK_FILENAME)
+    writer.write(path)
+    assert not os.path.exists(path + '.tmp')
+
+    pack = targetpack.TargetPack(path)
+    assert pack.names() == list(targets.keys())
+    assert pack.license == {'author': 'test'}
+    assert pack.header['topology'] == 'abc'
+    assert pack.getProperties('targets/test/target-0.target') == {'scale': [1.0, 2.0, 3.0]}
+    assert pack.getProperties('targets/test/target-1.target') == {}
+    for name, arrays in targets.items():
+        loaded = pack.getArrays(name)
+        assert sorted(loaded.keys()) == sorted(arrays.keys())
+        for key, array in arrays.items():
+            assert loaded[key].dtype == array.dtype
+            np.testing.assert_array_equal(loaded[key], array)
+            assert loaded[key].ctypes.data % targetpack.ALIGNMENT == 0
+
+
+def test_load_target_from_pack_file(tmp_path, grid):
+    grid.changeCoords(grid.coord + [0.0, 0.0, 1.0])
+    path = str(tmp_path / 'offset.mhpack')
+    algos3d.saveTranslationTarget(grid, path, binary=True)
+
+    target = algos3d.Target(grid, path)
+    np.testing.assert_array_equal(target.verts, np.arange(grid.getVertexCount()))
+    np.testing.assert_allclose(target.data, [[0.0, 0.0, 1.0]] * grid.getVertexCount())
+
+
+def test_save_translation_targets_to_pack(tmp_path, grid):
+    path = str(tmp_path / targetpack.PACK_FILENAME)
+    coords = [grid.coord + [0.0, 0.0, 1.0], grid.coord]
+    algos3d.saveTranslationTargets(grid, coords, ['moved.target', 'unchanged.target'], packPath=path)
+
+    pack = targetpack.TargetPack(path)
+    assert pack.names() == ['moved.target', 'unchanged.target']
+    assert pack.license is not None
+    assert pack.getProperties('moved.target') == {}
+    assert len(pack.getArrays('moved.target')['index']) == grid.getVertexCount()
+    assert len(pack.getArrays('unchanged.target')['index']) == 0
+    pack.close()
+
+
+def test_save_no_translation_targets_to_pack(tmp_path, grid):
+    path = str(tmp_path / targetpack.PACK_FILENAME)
+    algos3d.saveTranslationTargets(grid, [], [], packPath=path)
+
+    pack = targetpack.TargetPack(path)
+    assert len(pack) == 0
+    pack.close()
+
+
+def test_pack_file_license(tmp_path, grid):
+    license = algos3d.defaultTargetLicense().asDict()
+    license['author'] = 'Test author'
+    writer = targetpack.TargetPackWriter(license=license)
+    writer.addTarget('custom.target', {'index': np.arange(3, dtype=np.uint32),
+                                       'vector': np.ones((3, 3), dtype=np.float32)})
+    path = str(tmp_path / 'custom.mhpack')
+    writer.write(path)
+
+    target = algos3d.Target(grid, path)
+    assert target.license.author == 'Test author'
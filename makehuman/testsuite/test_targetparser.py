@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Target parser tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Abstract
+--------
+
+Tests of the vectorized ASCII .target parser against a straightforward
+line by line parser.
+"""
+
+import os
+import io
+import glob
+
+import numpy as np
+import pytest
+
+import algos3d
+
+
+def parseTargetReference(text):
+    comments = []
+    verts = []
+    data = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#'):
+            comments.append(line)
+            continue
+        values = line.split()
+        if len(values) != 4:
+            continue
+        verts.append(int(values[0]))
+        data.append([float(v) for v in values[1:]])
+    return comments, np.asarray(verts, dtype=np.uint32), np.asarray(data, dtype=np.float32).reshape((-1, 3))
+
+
+def checkParser(text):
+    comments, body = algos3d.splitTargetComments(text)
+    verts, data = algos3d.parseTargetData(body)
+    refComments, refVerts, refData = parseTargetReference(text)
+    assert comments == refComments
+    np.testing.assert_array_equal(verts, refVerts)
+    np.testing.assert_array_equal(data, refData)
+
+
+def test_regular_target():
+    checkParser("# license cc0\n# author test\n"
+                "0 0.1 0.2 0.3\n"
+                "17 -1.5e-3 2 -0.000001\n"
+                "19000 1 1 1\n")
+
+
+@pytest.mark.parametrize('text', [
+    "",
+    "# comments only\n",
+    "\n\n1 0.1 0.2 0.3\n\n\n2 0.4 0.5 0.6\n\n",
+    "1 0.1 0.2 0.3\r\n2 0.4 0.5 0.6\r\n",
+    "1 0.1 0.2 0.3\n  # indented comment\n2 0.4 0.5 0.6",
+    "1 0.1 0.2\n2 0.4 0.5 0.6\n3 0.7 0.8 0.9 1.0\n",
+    "1 0.1 0.2 0.3 # trailing comment\n2 0.4 0.5 0.6\n",
+])
+def test_irregular_target(text):
+    checkParser(text)
+
+
+def test_invalid_target():
+    with pytest.raises(ValueError):
+        algos3d.parseTargetData("1 0.1 0.2 0.3\nnot a target line\n")
+
+
+def test_shipped_targets():
+    paths = sorted(glob.glob('data/targets/*/*.target'))[::50]
+    if not paths:
+        pytest.skip('targets not downloaded')
+    for path in paths:
+        with io.open(path, 'r', encoding='utf-8') as f:
+            checkParser(f.read())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Target prefetcher tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Abstract
+--------
+
+Tests of loading targets in the background with the target prefetcher. The
+targets are generated in memory instead of loaded from disk, and loading can
+be held back to test requests that arrive while a target is loading.
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+import algos3d
+import targetprefetch
+from getpath import canonicalPath
+
+
+class _Loader(object):
+    """
+    Replacement of algos3d.Target for the prefetcher, records the order in
+    which targets are loaded. While blocked, loading waits until release().
+    """
+
+    def __init__(self):
+        self.order = []
+        self.started = threading.Event()
+        self._released = threading.Event()
+        self._released.set()
+        self._targetClass = algos3d.Target
+
+    def block(self):
+        self._released.clear()
+
+    def release(self):
+        self._released.set()
+
+    def __call__(self, obj, path):
+        if path is None:
+            # Empty target, as created by the addTarget fixture
+            return self._targetClass(obj, None)
+        self.order.append(path)
+        self.started.set()
+        assert self._released.wait(10)
+        target = self._targetClass(obj, None)
+        target.verts = np.arange(8, dtype=np.uint32)
+        target.data = np.ones((8, 3), dtype=np.float32)
+        target.faces = np.zeros(0, dtype=np.uint32)
+        return target
+
+
+def getPath(name):
+    return canonicalPath('data/targets/test/%s.target' % name)
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    loader = _Loader()
+    monkeypatch.setattr(algos3d, 'Target', loader)
+    yield loader
+    loader.release()
+    for path in loader.order:
+        if path in algos3d._targetBuffer:
+            del algos3d._targetBuffer[path]
+
+
+@pytest.fixture
+def prefetcher(loader):
+    prefetcher = targetprefetch.TargetPrefetcher()
+    yield prefetcher
+    loader.release()
+    prefetcher.stop()
+
+
+def test_prefetch_skips_buffered(grid, addTarget, loader, prefetcher):
+    buffered = addTarget(grid)
+    prefetcher.prefetch(grid, [buffered, getPath('a'), getPath('a'), getPath('b')])
+    prefetcher.wait()
+
+    assert loader.order == [getPath('a'), getPath('b')]
+    assert prefetcher.loaded == 2
+    assert getPath('a') in algos3d._targetBuffer
+
+    # Buffered meanwhile
+    prefetcher.prefetch(grid, [getPath('a')])
+    prefetcher.wait()
+    assert prefetcher.loaded == 2
+
+
+@pytest.mark.parametrize('cancelPending', [True, False])
+def test_prefetch_cancel_pending(grid, loader, prefetcher, cancelPending):
+    loader.block()
+    prefetcher.prefetch(grid, [getPath(name) for name in 'abc'])
+    assert loader.started.wait(10)
+
+    # The target that is loading is completed, pending ones are dropped
+    prefetcher.prefetch(grid, [getPath(name) for name in 'dc'], cancelPending)
+    loader.release()
+    prefetcher.wait()
+
+    expected = 'adc' if cancelPending else 'abcd'
+    assert loader.order == [getPath(name) for name in expected]
+
+
+def test_prefetch_budget(grid, loader, prefetcher):
+    size = loader(grid, getPath('size')).nbytes
+    loader.order = []
+    cache = algos3d._targetBuffer
+    oldBudget = cache.budget
+    cache.setBudget(cache.nbytes + size + size // 2)
+    try:
+        prefetcher.prefetch(grid, [getPath(name) for name in 'abcd'])
+        prefetcher.wait()
+    finally:
+        cache.setBudget(oldBudget)
+
+    # Loading b exceeds the budget, c and d are dropped without loading
+    assert loader.order == [getPath('a'), getPath('b')]
+    assert getPath('a') in cache and getPath('b') not in cache
+    assert prefetcher.loaded == 1
+    assert not prefetcher.isBusy()
+
+
+def test_prefetch_stop(grid, loader, prefetcher):
+    # Stopping and waiting without requests returns immediately
+    prefetcher.wait()
+    prefetcher.stop()
+
+    loader.block()
+    prefetcher.prefetch(grid, [getPath(name) for name in 'abc'])
+    assert loader.started.wait(10)
+
+    waiter = threading.Thread(target=prefetcher.wait)
+    waiter.start()
+    stopper = threading.Thread(target=prefetcher.stop)
+    stopper.start()
+    loader.release()
+    waiter.join(10)
+    stopper.join(10)
+    assert not waiter.is_alive() and not stopper.is_alive()
+    assert loader.order == [getPath('a')]
+    assert not prefetcher.isBusy()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Wavefront OBJ parser tests
+
+**Project Name:**      MakeHuman
+
+**Product Home Page:** http://www.makehuman.org/
+
+**Code Home Page:**    https://bitbucket.org/MakeHuman/makehuman/
+
+**Authors:**           Jonas Hauquier
+
+**Copyright(c):**      MakeHuman Team 2001-2017
+
+**Licensing:**         AGPL3
+
+    This file is part of MakeHuman (www.makehuman.org).
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Abstract
+--------
+
+Tests of the bulk parsing of Wavefront OBJ records, on synthetic lines.
+"""
+
+import numpy as np
+import pytest
+
+import wavefront
+
+
+def parseFaces(text, nverts=8, nuvs=8):
+    return wavefront._parseFaceRecords(wavefront._FACE_RECORD.findall(text), nverts, nuvs, 'test.obj')
+
+
+def test_parse_vertex_records():
+    lines = wavefront._VERTEX_RECORD.findall('v 1 2 3\nvt 0.5 0.5\n  v\t-1.5 0 2e-1 1.0\n')
+    np.testing.assert_allclose(wavefront._parseFloatRecords(lines, 3, 'test.obj'), [[1, 2, 3], [-1.5, 0, 0.2]])
+
+
+def test_parse_mixed_width_records():
+    lines = wavefront._VERTEX_RECORD.findall('v 1 2 3 0.5 0.5 0.5\nv 4 5 6\nv 7 8 9 1.0\n')
+    np.testing.assert_array_equal(wavefront._parseFloatRecords(lines, 3, 'test.obj'), [[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+    lines = wavefront._UV_RECORD.findall('vt 0.5 0.25 0\nvt 0.75 1\n')
+    np.testing.assert_array_equal(wavefront._parseFloatRecords(lines, 2, 'test.obj'), [[0.5, 0.25], [0.75, 1]])
+
+    # The total number of values matches, but not the values per record
+    lines = wavefront._UV_RECORD.findall('vt 0.5 0.25 0\nvt 0.75 1\nvt 0.1\n')
+    with pytest.raises(RuntimeError, match='test.obj'):
+        wavefront._parseFloatRecords(lines, 2, 'test.obj')
+
+
+def test_parse_face_records_whitespace():
+    # A trailing space on one line and tabs on another
+    fverts, fuvs, has_uv = parseFaces('f 1 2 3 \nf 1\t2 3 4\n')
+    assert fverts.tolist() == [[0, 1, 2, 0], [0, 1, 2, 3]]
+
+
+def test_parse_face_records():
+    fverts, fuvs, has_uv = parseFaces('f 1/1 2/2 3/3 4/4\nf 5/5/1 6/6/2 7/7/3\n')
+    assert fverts.tolist() == [[0, 1, 2, 3], [4, 5, 6, 4]]
+    assert fuvs.tolist() == [[0, 1, 2, 3], [4, 5, 6, 4]]
+    assert has_uv
+
+    fverts, fuvs, has_uv = parseFaces('f 1//1 2//2 3//3\nf  1 2 3  4\n')
+    assert fverts.tolist() == [[0, 1, 2, 0], [0, 1, 2, 3]]
+    assert fuvs.tolist() == [[0, 0, 0, 0], [0, 0, 0, 0]]
+    assert not has_uv
+
+
+@pytest.mark.parametrize('text', ['f -3 -2 -1\n', 'f 1 2 9\n', 'f 0 1 2\n', 'f 1/1 2/9 3/3\n',
+                                  'f 1/-2 2/1 3/1\n', 'f 1 2\n', 'f 1 2 x\n'])
+def test_invalid_face_records(text):
+    with pytest.raises(RuntimeError, match='test.obj'):
+        parseFaces(text)